@@ -3,13 +3,1675 @@ Connection to Azure Data Lake Storage (ADLS) Gen2 using the Azure SDK for Python
 This module provides classes and functions to connect to ADLS, read blob content, and validate configurations
 """
 # %% Libraries]
+import io
 import os
-import dotenv
-from pydantic import BaseModel, Field
-from azure.storage.blob import BlobServiceClient
-from azure.identity import DefaultAzureCredential
-
-# %% Load environment variables
-dotenv.load_dotenv()
-ADLS_URL = os.getenv("ADLS_URL")
-AZURE_STORAGE_CONTAINER_NAME = os.getenv("AZURE_STORAGE_CONTAINER_NAME")
+import json
+import uuid
+import atexit
+import base64
+import hashlib
+import logging
+import importlib
+import itertools
+import threading
+import contextvars
+from collections import OrderedDict
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, replace
+from typing import Dict, Hashable, Iterable, Iterator, List, Literal, Optional, Tuple
+
+from pydantic import BaseModel, Field, SecretStr, field_validator, model_validator
+
+from instrumentation import Instrumentation, TimedCredential, get_instrumentation
+from read_policy import RETRYABLE_STATUS, LatencyTracker, ReadPolicy
+from routing import FAILOVER_STATUS, Endpoint, EndpointState, Route, RoutingTable
+from single_flight import AsyncSingleFlight, SingleFlight
+from storage_backends import LocalBackend, MemoryBackend, StorageBackend, shared_memory_backend
+
+# %% Deferred imports
+# The Azure SDK, requests, python-dotenv and asyncio take most of a cold start to import, so
+# they are bound into this module on first use. Importing the module has no side effects:
+# .env is only loaded when a configuration is read from the environment.
+_LAZY_IMPORTS = {
+    "asyncio": ("asyncio", None),
+    "dotenv": ("dotenv", None),
+    "requests": ("requests", None),
+    "HTTPAdapter": ("requests.adapters", "HTTPAdapter"),
+    "MatchConditions": ("azure.core", "MatchConditions"),
+    "ContentSettings": ("azure.storage.blob", "ContentSettings"),
+    "HttpResponseError": ("azure.core.exceptions", "HttpResponseError"),
+    "BlobServiceClient": ("azure.storage.blob", "BlobServiceClient"),
+    "DefaultAzureCredential": ("azure.identity", "DefaultAzureCredential"),
+    "AsyncBlobServiceClient": ("azure.storage.blob.aio", "BlobServiceClient"),
+    "AsyncDefaultAzureCredential": ("azure.identity.aio", "DefaultAzureCredential"),
+}
+
+
+def _load_sdk(*names: str) -> None:
+    """Bind deferred imports into the module namespace, keeping names already bound (e.g. patched)."""
+    namespace = globals()
+    for name in names:
+        if name not in namespace:
+            module_name, attribute = _LAZY_IMPORTS[name]
+            module = importlib.import_module(module_name)
+            namespace.setdefault(name, module if attribute is None else getattr(module, attribute))
+
+
+def __getattr__(name: str):
+    if name in _LAZY_IMPORTS:
+        _load_sdk(name)
+        return globals()[name]
+    if name in ("ADLS_URL", "AZURE_STORAGE_CONTAINER_NAME"):
+        _load_sdk("dotenv")
+        dotenv.load_dotenv()
+        return os.getenv(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# %% Configuration
+class ADLSConfig(BaseModel):
+    """Validated configuration for an ADLS connection."""
+
+    adls_url: Optional[str] = Field(default=None, description="Azure Data Lake Storage URL")
+    container_name: str = Field(..., description="Azure Storage Container Name")
+    backend: Literal["adls", "local", "memory"] = Field(
+        default="adls",
+        description="Where blobs are read from: the ADLS account, a local directory or process memory",
+    )
+    local_root: Optional[str] = Field(
+        default=None,
+        description="Directory standing in for the container when backend is 'local'",
+    )
+    max_connections: int = Field(
+        default=10,
+        ge=1,
+        description="Size of the HTTPS connection pool shared by every connection to this account",
+    )
+    max_concurrency: int = Field(
+        default=16,
+        ge=1,
+        description="Maximum number of downloads an async connection runs at the same time",
+    )
+    max_workers: int = Field(
+        default=8,
+        ge=1,
+        description="Thread pool size used by ADLSConnection.read_many and upload_many (keep at or below max_connections)",
+    )
+    chunk_size: int = Field(
+        default=4 * 1024 * 1024,
+        ge=1,
+        description="Bytes fetched per ranged request by the streaming readers",
+    )
+    download_concurrency: int = Field(
+        default=4,
+        ge=1,
+        description="Parallel sub-range requests filling each streaming window (sub-ranges are at least 256 KiB)",
+    )
+    upload_block_size: int = Field(
+        default=8 * 1024 * 1024,
+        ge=1,
+        le=4000 * 1024 * 1024,
+        description="Bytes per block staged by uploads larger than max_single_upload_size",
+    )
+    max_single_upload_size: int = Field(
+        default=8 * 1024 * 1024,
+        ge=0,
+        le=5000 * 1024 * 1024,
+        description="Largest payload written with a single Put Blob request; larger ones are staged in blocks",
+    )
+    upload_concurrency: int = Field(
+        default=4,
+        ge=1,
+        description="Blocks of one upload staged in parallel, which also bounds the blocks held in memory",
+    )
+    coalesce_reads: bool = Field(
+        default=True,
+        description="Share one in-flight download between concurrent reads of the same blob",
+    )
+    adaptive_reads: bool = Field(
+        default=True,
+        description="Time out stalled read attempts from observed latencies and retry them with jittered backoff",
+    )
+    hedge_reads: bool = Field(
+        default=True,
+        description="Send a duplicate request when a read runs past the hedge quantile of its size class",
+    )
+    hedge_quantile: float = Field(
+        default=0.95,
+        gt=0,
+        lt=1,
+        description="Latency quantile of the blob's size class after which a read is hedged",
+    )
+    latency_window: int = Field(
+        default=256,
+        ge=1,
+        description="Recent read latencies kept per blob size class",
+    )
+    min_latency_samples: int = Field(
+        default=20,
+        ge=1,
+        description="Reads observed before hedging and adaptive timeouts take effect",
+    )
+    attempt_timeout_factor: float = Field(
+        default=4.0,
+        gt=0,
+        description="Per-attempt timeout as a multiple of the p99 read latency of the size class",
+    )
+    min_attempt_timeout: float = Field(
+        default=1.0,
+        gt=0,
+        description="Lower bound of the per-attempt timeout, in seconds",
+    )
+    max_attempt_timeout: float = Field(
+        default=30.0,
+        gt=0,
+        description="Upper bound of the per-attempt timeout, in seconds",
+    )
+    max_read_attempts: int = Field(
+        default=3,
+        ge=1,
+        description="Attempts per read, including the first, under the adaptive policy",
+    )
+    retry_backoff: float = Field(
+        default=0.1,
+        ge=0,
+        description="Base in seconds of the full-jitter exponential backoff between attempts",
+    )
+
+    routes: List[Route] = Field(
+        default_factory=list,
+        description="Document prefixes and hash shards served by other accounts or containers than adls_url/container_name",
+    )
+    region: Optional[str] = Field(
+        default=None,
+        description="Region of this process; route replicas in the same region are read first",
+    )
+    throttle_cooldown: float = Field(
+        default=5.0,
+        ge=0,
+        description="Seconds a replica that answered 503 is tried only after the other replicas",
+    )
+
+    account_key: Optional[SecretStr] = Field(
+        default=None,
+        description="Shared account key used instead of DefaultAzureCredential (e.g. for Azurite)",
+    )
+    allow_insecure_http: bool = Field(
+        default=False,
+        description="Accept an http:// URL, for local emulators and test servers only",
+    )
+
+    @field_validator('adls_url')
+    @classmethod
+    def validate_adls_url(cls, v):
+        if v is None:
+            return v
+        if not v or not v.startswith(('https://', 'http://')):
+            raise ValueError('ADLS URL must be a valid HTTPS URL')
+        return v
+
+    @model_validator(mode='after')
+    def validate_backend(self):
+        if self.backend == 'adls' and self.adls_url is None:
+            raise ValueError('ADLS URL is required by the adls backend')
+        if self.adls_url and self.adls_url.startswith('http://') and not self.allow_insecure_http:
+            raise ValueError('ADLS URL must be a valid HTTPS URL')
+        if self.backend == 'local' and not self.local_root:
+            raise ValueError('local_root is required by the local backend')
+        if self.min_attempt_timeout > self.max_attempt_timeout:
+            raise ValueError('min_attempt_timeout cannot exceed max_attempt_timeout')
+        if self.routes and self.backend != 'adls':
+            raise ValueError('routes are only supported by the adls backend')
+        for route in self.routes:
+            for endpoint in route.endpoints:
+                if endpoint.adls_url.startswith('http://') and not self.allow_insecure_http:
+                    raise ValueError('ADLS URL must be a valid HTTPS URL')
+        return self
+
+    @field_validator('container_name')
+    @classmethod
+    def validate_container_name(cls, v):
+        if not v or not v.strip():
+            raise ValueError('Container name cannot be empty')
+        return v.strip()
+
+
+# %% Shared client registry
+def _credential_identity(account_key: Optional[str] = None) -> Hashable:
+    """Identity of the credential a client authenticates with."""
+    if account_key:
+        return ("shared-key", hashlib.sha256(account_key.encode("utf-8")).hexdigest())
+    return (
+        "default",
+        os.getenv("AZURE_TENANT_ID"),
+        os.getenv("AZURE_CLIENT_ID"),
+    )
+
+
+def _pooled_session(max_connections: int) -> "requests.Session":
+    """Build a requests session whose connection pool holds ``max_connections`` sockets."""
+    _load_sdk("requests", "HTTPAdapter")
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=max_connections, pool_maxsize=max_connections)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class ClientRegistry:
+    """
+    Thread-safe, process-wide cache of credentials, blob service clients, latency trackers
+    and routed endpoint states.
+
+    Credentials are shared per identity and clients per (account URL, identity), so every
+    connection to the same account reuses one HTTPS connection pool. Access tokens are cached
+    by the bearer token policy of the shared client pipeline, which refreshes them before they
+    expire instead of probing the credential chain on every read. Read latencies are tracked
+    per account, so short-lived connections still hedge from the account's recent history.
+    The concurrency cap and throttling cooldown of a routed endpoint are per (account URL,
+    container), so they hold across every connection of the process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._credentials: Dict[Hashable, "DefaultAzureCredential"] = {}
+        self._clients: Dict[Tuple[str, Hashable], "BlobServiceClient"] = {}
+        self._trackers: Dict[str, LatencyTracker] = {}
+        self._endpoints: Dict[Tuple[str, str], EndpointState] = {}
+
+    def get_client(
+        self,
+        account_url: str,
+        max_connections: int = 10,
+        account_key: Optional[str] = None,
+    ) -> "BlobServiceClient":
+        """
+        Return the shared client for an account, creating it on first use.
+
+        Args:
+            account_url: Storage account URL
+            max_connections: Pool size used when the client is first created
+            account_key: Shared key to authenticate with instead of DefaultAzureCredential
+
+        Returns:
+            BlobServiceClient: Client shared by every caller with the same account and identity
+        """
+        identity = _credential_identity(account_key)
+        key = (account_url, identity)
+        instrumentation = get_instrumentation()
+        with self._lock:
+            client = self._clients.get(key)
+            instrumentation.count("adls_client_pool_total", result="hit" if client is not None else "miss")
+            if client is None:
+                with instrumentation.span("client", account=account_url):
+                    _load_sdk("BlobServiceClient", "DefaultAzureCredential")
+                    credential = account_key or self._credentials.get(identity)
+                    if credential is None:
+                        credential = DefaultAzureCredential()
+                        if instrumentation.enabled:
+                            credential = TimedCredential(credential)
+                        self._credentials[identity] = credential
+                    client = BlobServiceClient(
+                        account_url=account_url,
+                        credential=credential,
+                        session=_pooled_session(max_connections),
+                    )
+                self._clients[key] = client
+            return client
+
+    def latency_tracker(self, account_url: str, window: int = 256) -> LatencyTracker:
+        """Latency tracker of an account, created on first use with ``window`` samples per size class."""
+        with self._lock:
+            tracker = self._trackers.get(account_url)
+            if tracker is None:
+                tracker = self._trackers[account_url] = LatencyTracker(window)
+            return tracker
+
+    def endpoint_state(self, endpoint: Endpoint) -> EndpointState:
+        """State of a routed endpoint, created on first use with the endpoint's ``max_concurrency``."""
+        with self._lock:
+            state = self._endpoints.get(endpoint.key)
+            if state is None:
+                state = self._endpoints[endpoint.key] = EndpointState(endpoint.max_concurrency)
+            return state
+
+    def close(self) -> None:
+        """Close every shared client and credential and forget latencies. Later lookups build new ones."""
+        with self._lock:
+            clients = list(self._clients.values())
+            credentials = list(self._credentials.values())
+            self._clients.clear()
+            self._credentials.clear()
+            self._trackers.clear()
+            self._endpoints.clear()
+        for resource in clients + credentials:
+            try:
+                resource.close()
+            except Exception as e:
+                logging.warning(f"Error closing shared ADLS resource: {e}")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._clients)
+
+
+_client_registry = ClientRegistry()
+# Shared by every ADLSConnection, so reads coalesce even across connections (e.g. legacy calls)
+_single_flight = SingleFlight()
+
+
+def close_shared_clients() -> None:
+    """Shut down the process-wide ADLS clients and credentials."""
+    _client_registry.close()
+
+
+atexit.register(close_shared_clients)
+
+
+# %% Helpers
+def _config_from_env() -> ADLSConfig:
+    """Build the configuration from environment variables, loading .env first."""
+    _load_sdk("dotenv")
+    dotenv.load_dotenv()
+    adls_url = os.getenv("ADLS_URL")
+    container_name = os.getenv("AZURE_STORAGE_CONTAINER_NAME")
+    backend = os.getenv("ADLS_STORAGE_BACKEND", "adls")
+    if backend != "adls":
+        if not container_name:
+            raise ValueError("AZURE_STORAGE_CONTAINER_NAME must be set in environment variables")
+        return ADLSConfig(
+            adls_url=adls_url or None,
+            container_name=container_name,
+            backend=backend,
+            local_root=os.getenv("ADLS_LOCAL_ROOT"),
+        )
+    if not adls_url or not container_name:
+        raise ValueError("ADLS_URL and AZURE_STORAGE_CONTAINER_NAME must be set in environment variables")
+    routes = os.getenv("ADLS_ROUTES")
+    return ADLSConfig(
+        adls_url=adls_url,
+        container_name=container_name,
+        routes=json.loads(routes) if routes else [],
+        region=os.getenv("ADLS_REGION") or None,
+    )
+
+
+def _blob_name(blob_path: str, file_extension: str) -> str:
+    """Path of a document inside the container."""
+    return f"quant/{blob_path}.{file_extension}"
+
+
+@dataclass(frozen=True)
+class BlobReadResult:
+    """Outcome of one read in a batch: either the decoded content or the error raised."""
+
+    index: int
+    blob_path: str
+    file_extension: str
+    content: Optional[str] = None
+    error: Optional[Exception] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@dataclass(frozen=True)
+class BlobWriteResult:
+    """Outcome of one upload: the new ETag and how it was written, or the error raised."""
+
+    index: int
+    blob_path: str
+    file_extension: str
+    etag: Optional[str] = None
+    size: int = 0
+    blocks: int = 0
+    error: Optional[Exception] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def _read_block(source, block_size: int) -> bytes:
+    """Read up to ``block_size`` bytes from a file object, short only at end of stream."""
+    parts = []
+    remaining = block_size
+    while remaining:
+        part = source.read(remaining)
+        if not part:
+            break
+        if isinstance(part, str):
+            # Text streams count characters, so their blocks may run somewhat over block_size
+            part = part.encode("utf-8")
+        parts.append(part)
+        remaining = max(0, remaining - len(part))
+    return parts[0] if len(parts) == 1 else b"".join(parts)
+
+
+def _iter_blocks(data, block_size: int) -> Iterator[bytes]:
+    """
+    Split a payload into blocks of ``block_size`` bytes (the last may be shorter).
+
+    ``data`` is bytes-like, a string (encoded as UTF-8), a file object or an iterable of
+    byte/string chunks. File objects and iterables are consumed lazily, one block at a time.
+    """
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        view = memoryview(data).cast("B")
+        for start in range(0, len(view), block_size):
+            yield view[start:start + block_size]
+        return
+    if hasattr(data, "read"):
+        while True:
+            block = _read_block(data, block_size)
+            if not block:
+                return
+            yield block
+    buffer = bytearray()
+    for chunk in data:
+        buffer += chunk.encode("utf-8") if isinstance(chunk, str) else chunk
+        while len(buffer) >= block_size:
+            yield bytes(buffer[:block_size])
+            del buffer[:block_size]
+    if buffer:
+        yield bytes(buffer)
+
+
+# Smallest sub-range a streaming window is split into; below it a request costs more than it saves
+MIN_SUBRANGE_SIZE = 256 * 1024
+
+
+def _total_size(properties) -> int:
+    """Full blob size of a (possibly ranged) download, taken from its Content-Range."""
+    content_range = getattr(properties, "content_range", None)
+    if content_range and "/" in content_range:
+        total = content_range.rsplit("/", 1)[1]
+        if total.isdigit():
+            return int(total)
+    return properties.size
+
+
+class BlobReader(io.RawIOBase):
+    """
+    Seekable, read-only file object over a blob, fetched one ranged window at a time.
+
+    Windows are aligned to ``chunk_size`` and each is split into up to ``max_concurrency``
+    sub-ranges of at least ``MIN_SUBRANGE_SIZE`` bytes, downloaded in parallel (the first window
+    of a blob starts with one sub-range, which learns its size and ETag). Only the ``max_windows`` most recently used windows are held
+    in memory: one suits sequential reads, a few dozen small ones suit parsers that jump between
+    the end and the body of a file. Reads after the first are pinned to the ETag seen on open,
+    so a blob replaced mid-read raises instead of returning mixed versions.
+    """
+
+    def __init__(
+        self,
+        blob_client,
+        chunk_size: int,
+        max_concurrency: int = 1,
+        max_windows: int = 1,
+        slot=nullcontext,
+        options: Optional[dict] = None,
+    ):
+        """
+        Open the blob and fetch its first window.
+
+        Args:
+            blob_client: Client of the blob to read
+            chunk_size: Bytes per window
+            max_concurrency: Parallel sub-range downloads per window
+            max_windows: Windows kept in memory, least recently used dropped first
+            slot: Context manager factory held around each request and its body, e.g. the
+                slot of a routed endpoint's concurrency cap
+            options: SDK keyword arguments of the opening request
+        """
+        super().__init__()
+        if max_windows < 1:
+            raise ValueError("max_windows must be at least 1")
+        _load_sdk("MatchConditions", "HttpResponseError")
+        self._blob_client = blob_client
+        self.chunk_size = chunk_size
+        self.max_concurrency = max_concurrency
+        self.max_windows = max_windows
+        self.size: Optional[int] = None
+        self.etag: Optional[str] = None
+        self.bytes_fetched = 0
+        self.fetch_count = 0
+        self._position = 0
+        self._windows: "OrderedDict[int, bytes]" = OrderedDict()
+        self._slot = slot
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._fetch(0, **(options or {}))
+
+    def _fetch(self, offset: int, **options) -> bytes:
+        # Make room first so no more than max_windows are alive at a time
+        while len(self._windows) >= self.max_windows:
+            self._windows.popitem(last=False)
+        part_size = max(MIN_SUBRANGE_SIZE, -(-self.chunk_size // self.max_concurrency))
+        end = offset + self.chunk_size
+        parts = []
+        if self.size is None:
+            # The opening request learns the size and ETag that the other sub-ranges depend on
+            try:
+                first, properties = self._fetch_range(offset, min(part_size, self.chunk_size), options)
+            except HttpResponseError as e:
+                # The service rejects any range on an empty blob; read its properties instead
+                if e.status_code != 416:
+                    raise
+                with self._slot():
+                    properties = self._blob_client.get_blob_properties(**options)
+                self.size = properties.size
+                self.etag = properties.etag
+                return b""
+            self.size = _total_size(properties)
+            self.etag = properties.etag
+            parts.append(first)
+            offset += len(first)
+        ranges = [(start, min(part_size, end - start)) for start in range(offset, min(end, self.size), part_size)]
+        if len(ranges) > 1:
+            parts.extend(
+                data for data, _ in self._executor().map(lambda r: self._fetch_range(*r, options), ranges)
+            )
+        elif ranges:
+            parts.append(self._fetch_range(*ranges[0], options)[0])
+        window = b"".join(parts)
+        self.bytes_fetched += len(window)
+        self.fetch_count += 1
+        self._windows[end - self.chunk_size] = window
+        return window
+
+    def _fetch_range(self, offset: int, length: int, options: dict):
+        """Bytes and properties of one ranged request, pinned to the ETag once it is known."""
+        conditions = {}
+        if self.etag:
+            conditions = {"etag": self.etag, "match_condition": MatchConditions.IfNotModified}
+        with self._slot():
+            downloader = self._blob_client.download_blob(offset=offset, length=length, **conditions, **options)
+            return downloader.readall(), downloader.properties
+
+    def _executor(self) -> ThreadPoolExecutor:
+        """Threads downloading the sub-ranges of a window, created on first use."""
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="adls-window")
+        return self._pool
+
+    def _current_window(self) -> Tuple[int, bytes]:
+        """Start and bytes of the window holding the current position, fetching it if needed."""
+        start = self._position - self._position % self.chunk_size
+        window = self._windows.get(start)
+        if window is None:
+            window = self._fetch(start)
+        else:
+            self._windows.move_to_end(start)
+        return start, window
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        if position < 0:
+            raise ValueError("Negative seek position")
+        self._position = position
+        return position
+
+    def readinto(self, buffer) -> int:
+        if self.closed:
+            raise ValueError("I/O operation on closed blob reader")
+        if self._position >= self.size:
+            return 0
+        start, window = self._current_window()
+        view = memoryview(window)[self._position - start:]
+        count = min(len(buffer), len(view))
+        memoryview(buffer).cast("B")[:count] = view[:count]
+        self._position += count
+        return count
+
+    def read(self, size: int = -1) -> bytes:
+        """Read up to ``size`` bytes, spanning windows as needed (short only at end of blob)."""
+        if size is None or size < 0:
+            return self.readall()
+        buffer = bytearray(size)
+        view = memoryview(buffer)
+        filled = 0
+        while filled < size:
+            count = self.readinto(view[filled:])
+            if not count:
+                break
+            filled += count
+        return bytes(view[:filled])
+
+    def readall(self) -> bytes:
+        return b"".join(self.iter_chunks())
+
+    def iter_chunks(self) -> Iterator[bytes]:
+        """Yield the rest of the blob one window at a time."""
+        while self._position < self.size:
+            start, window = self._current_window()
+            chunk = window if start == self._position else memoryview(window)[self._position - start:].tobytes()
+            self._position += len(chunk)
+            yield chunk
+
+    def close(self) -> None:
+        self._windows.clear()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+        super().close()
+
+
+# %% Connection
+class ADLSConnection:
+    """Connection to an ADLS container that reads documents stored under ``quant/``."""
+
+    def __init__(
+        self,
+        config: Optional[ADLSConfig] = None,
+        registry: Optional[ClientRegistry] = None,
+        cache=None,
+        manifest=None,
+        backend: Optional[StorageBackend] = None,
+        instrumentation: Optional[Instrumentation] = None,
+        single_flight: Optional[SingleFlight] = None,
+        read_policy: Optional[ReadPolicy] = None,
+    ):
+        """
+        Initialize the connection.
+
+        Args:
+            config: Explicit configuration. When omitted it is read from the environment (.env)
+            registry: Client registry to draw the shared client from (defaults to the process-wide one)
+            cache: Optional read cache (see ``blob_cache.BlobCache``) consulted before downloading
+            manifest: Optional ``manifest.BlobManifest`` used to resolve extensions and reject
+                unknown documents without a network round trip
+            backend: Storage to read from instead of the one selected by ``config.backend``; an
+                explicit local or in-memory backend ignores ``config.routes``
+            instrumentation: Receiver of spans and counters (defaults to the process-wide one)
+            single_flight: Group coalescing concurrent reads (defaults to the process-wide one)
+            read_policy: Hedging and timeout policy of whole-blob reads (defaults to one built from
+                ``config``; None when ``config.adaptive_reads`` is off or the backend is local)
+        """
+        if config is None:
+            config = _config_from_env()
+        _load_sdk("MatchConditions", "HttpResponseError")
+
+        self.config = config
+        self.registry = registry if registry is not None else _client_registry
+        self.blob_service_client = None
+        if backend is None:
+            if config.backend == "local":
+                backend = LocalBackend(config.local_root)
+            elif config.backend == "memory":
+                backend = shared_memory_backend(config.container_name)
+            else:
+                self.blob_service_client = self.registry.get_client(
+                    config.adls_url,
+                    max_connections=config.max_connections,
+                    account_key=config.account_key.get_secret_value() if config.account_key else None,
+                )
+                backend = self.blob_service_client
+        self.backend = backend
+        self._local_backend = isinstance(backend, (LocalBackend, MemoryBackend))
+        self.routing = None
+        if config.routes and not self._local_backend:
+            self.routing = RoutingTable(config.routes, region=config.region)
+        self.cache = cache
+        self.manifest = manifest
+        self._instrumentation = instrumentation
+        self.single_flight = single_flight if single_flight is not None else _single_flight
+        # Reads only coalesce between connections to the same container with the same identity
+        self._flight_prefix = (
+            config.adls_url,
+            config.container_name,
+            _credential_identity(config.account_key.get_secret_value() if config.account_key else None),
+        )
+        if read_policy is None and config.adaptive_reads and not self._local_backend:
+            read_policy = ReadPolicy(
+                tracker=self.registry.latency_tracker(config.adls_url, config.latency_window),
+                hedge=config.hedge_reads,
+                hedge_quantile=config.hedge_quantile,
+                min_samples=config.min_latency_samples,
+                timeout_factor=config.attempt_timeout_factor,
+                min_timeout=config.min_attempt_timeout,
+                max_timeout=config.max_attempt_timeout,
+                max_attempts=config.max_read_attempts,
+                backoff=config.retry_backoff,
+            )
+        self.read_policy = read_policy
+        # Set by prefetch.Prefetcher, which is told about every read to track its accuracy
+        self.prefetcher = None
+
+    @property
+    def instrumentation(self) -> Instrumentation:
+        return self._instrumentation if self._instrumentation is not None else get_instrumentation()
+
+    def read_blob_content(self, blob_path: str, file_extension: Optional[str] = "pdf") -> Optional[str]:
+        """
+        Read a blob from the ``quant/`` folder of the container.
+
+        Args:
+            blob_path: Name of the document without extension
+            file_extension: File extension of the document, or None to let the manifest pick one
+
+        Returns:
+            Optional[str]: Decoded content, or None if the blob could not be read
+        """
+        try:
+            return self._read_text(blob_path, file_extension)
+        except Exception as e:
+            logging.error(f"Error reading blob {blob_path}.{file_extension}: {e}")
+            return None
+
+    def read_many(self, blob_paths: Iterable[str], extension: str = "pdf") -> List[BlobReadResult]:
+        """
+        Read several blobs in parallel on a thread pool of ``config.max_workers`` threads.
+
+        Args:
+            blob_paths: Names of the documents without extension
+            extension: File extension shared by the documents
+
+        Returns:
+            List[BlobReadResult]: One result per name, in input order
+        """
+        return sorted(self.iter_read_many(blob_paths, extension), key=lambda result: result.index)
+
+    def iter_read_many(self, blob_paths: Iterable[str], extension: str = "pdf") -> Iterator[BlobReadResult]:
+        """
+        Read several blobs in parallel and yield each result as soon as its download finishes.
+
+        Args:
+            blob_paths: Names of the documents without extension
+            extension: File extension shared by the documents
+
+        Yields:
+            BlobReadResult: Results in completion order; ``index`` gives the input position
+        """
+        blob_paths = list(blob_paths)
+        if not blob_paths:
+            return
+        executor = ThreadPoolExecutor(
+            max_workers=min(self.config.max_workers, len(blob_paths)),
+            thread_name_prefix="adls-read",
+        )
+        try:
+            # Each download runs in a copy of the caller's context so its spans nest under the caller's
+            futures = {
+                executor.submit(contextvars.copy_context().run, self._read_text, blob_path, extension):
+                    (index, blob_path)
+                for index, blob_path in enumerate(blob_paths)
+            }
+            for future in as_completed(futures):
+                index, blob_path = futures[future]
+                try:
+                    yield BlobReadResult(index, blob_path, extension, content=future.result())
+                except Exception as e:
+                    yield BlobReadResult(index, blob_path, extension, error=e)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def open_blob(
+        self,
+        blob_path: str,
+        file_extension: str = "pdf",
+        chunk_size: Optional[int] = None,
+        max_windows: int = 1,
+    ) -> BlobReader:
+        """
+        Open a blob as a seekable binary file object that streams from the service.
+
+        Memory use is bounded by ``chunk_size * max_windows`` rather than the blob size; reads
+        bypass the cache. A routed blob is opened on the first replica that is not throttled,
+        and every later window is read from that replica within its concurrency cap, since
+        the reader is pinned to an ETag only that account knows.
+
+        Args:
+            blob_path: Name of the document without extension
+            file_extension: File extension of the document
+            chunk_size: Bytes per ranged request (defaults to ``config.chunk_size``)
+            max_windows: Windows kept in memory; raise it with a small ``chunk_size`` for random access
+
+        Returns:
+            BlobReader: Reader positioned at the start of the blob
+        """
+        blob_name = self._resolve_blob_name(blob_path, file_extension)
+        instrumentation = self.instrumentation
+
+        def open_reader(endpoint: Optional[Endpoint], options: dict, slot) -> BlobReader:
+            return BlobReader(
+                self._blob_client_at(endpoint, blob_name),
+                chunk_size=chunk_size or self.config.chunk_size,
+                max_concurrency=self.config.download_concurrency,
+                max_windows=max_windows,
+                slot=slot,
+                options=options,
+            )
+
+        return self._on_replicas(self._replicas(blob_name), open_reader, {}, instrumentation)
+
+    def iter_blob_chunks(
+        self,
+        blob_path: str,
+        file_extension: str = "pdf",
+        chunk_size: Optional[int] = None,
+    ) -> Iterator[bytes]:
+        """
+        Stream a blob as raw byte chunks of at most ``chunk_size`` bytes.
+
+        Args:
+            blob_path: Name of the document without extension
+            file_extension: File extension of the document
+            chunk_size: Bytes per chunk (defaults to ``config.chunk_size``)
+
+        Yields:
+            bytes: Consecutive chunks of the blob
+        """
+        with self.open_blob(blob_path, file_extension, chunk_size) as reader:
+            yield from reader.iter_chunks()
+
+    def read_blob_range(
+        self,
+        blob_path: str,
+        file_extension: Optional[str] = "pdf",
+        offset: int = 0,
+        length: Optional[int] = None,
+        etag: Optional[str] = None,
+    ) -> bytes:
+        """
+        Download a byte range of a document with a single ranged request.
+
+        Ranges running past the end are clipped, and ranges starting at or past the end (or on
+        an empty blob) return no bytes. Range reads bypass the cache and the read policy. Reads
+        pinned to an ``etag`` do not fail over to another replica, whose ETags differ.
+
+        Args:
+            blob_path: Name of the document without extension
+            file_extension: File extension of the document, or None to let the manifest pick one
+            offset: First byte to read
+            length: Number of bytes to read (to the end of the blob when None)
+            etag: When set, the read fails with 412 if the blob is no longer this version
+
+        Returns:
+            bytes: The bytes of the range
+        """
+        if offset < 0 or (length is not None and length < 0):
+            raise ValueError("offset and length must not be negative")
+        if length == 0:
+            return b""
+        blob_name = self._resolve_blob_name(blob_path, file_extension)
+        instrumentation = self.instrumentation
+        conditions = {}
+        if etag:
+            conditions = {"etag": etag, "match_condition": MatchConditions.IfNotModified}
+
+        def download(endpoint: Optional[Endpoint], options: dict, slot) -> bytes:
+            with slot():
+                try:
+                    downloader = self._blob_client_at(endpoint, blob_name).download_blob(
+                        offset=offset,
+                        length=length,
+                        max_concurrency=self.config.download_concurrency,
+                        **conditions,
+                        **options
+                    )
+                except HttpResponseError as e:
+                    if e.status_code != 416:
+                        raise
+                    return b""
+                return bytes(downloader.readall())
+
+        with instrumentation.span("download", blob=blob_name, offset=offset) as span:
+            blob_data = self._on_replicas(
+                self._replicas(blob_name), download, self._request_options(instrumentation), instrumentation,
+                failover=not etag,
+            )
+            span.set_attribute("bytes", len(blob_data))
+        instrumentation.count("adls_bytes_transferred_total", len(blob_data))
+        return blob_data
+
+    def get_blob_properties(self, blob_path: str, file_extension: Optional[str] = "pdf"):
+        """
+        Fetch the properties (size, ETag, last-modified) of a document without downloading it.
+
+        Args:
+            blob_path: Name of the document without extension
+            file_extension: File extension of the document
+
+        Returns:
+            BlobProperties: Properties returned by the service
+        """
+        blob_name = self._resolve_blob_name(blob_path, file_extension)
+        instrumentation = self.instrumentation
+
+        def get_properties(endpoint: Optional[Endpoint], options: dict, slot):
+            with slot():
+                return self._blob_client_at(endpoint, blob_name).get_blob_properties(**options)
+
+        return self._on_replicas(
+            self._replicas(blob_name), get_properties, self._request_options(instrumentation), instrumentation
+        )
+
+    def list_blobs(self, prefix: str = "quant/") -> Iterator:
+        """
+        List the blobs under a prefix of the container.
+
+        With ``config.routes`` the listing also covers every routed shard, from its first replica
+        that is not throttled, and each blob is listed only from the endpoint it is routed to.
+        Each page of a shard is fetched within the endpoint's concurrency cap.
+
+        Args:
+            prefix: Blob name prefix
+
+        Yields:
+            BlobProperties: Name, size, ETag and last-modified time of each blob
+        """
+        container_client = self.backend.get_container_client(self.config.container_name)
+        routing = self.routing
+        if routing is None:
+            yield from container_client.list_blobs(name_starts_with=prefix)
+            return
+        for blob in container_client.list_blobs(name_starts_with=prefix):
+            if routing.locate(blob.name) is None:
+                yield blob
+        instrumentation = self.instrumentation
+        options = self._request_options(instrumentation)
+        for route, location, replicas in routing.shards():
+            route_prefix = f"quant/{route.prefix}"
+            if not (route_prefix.startswith(prefix) or prefix.startswith(route_prefix)):
+                continue
+            name_prefix = max(prefix, route_prefix, key=len)
+
+            def first_page(endpoint: Endpoint, request_options: dict, slot):
+                container_client = self._endpoint_client(endpoint).get_container_client(endpoint.container_name)
+                pages = container_client.list_blobs(name_starts_with=name_prefix, **request_options).by_page()
+                with slot():
+                    blobs = list(next(pages))
+                return container_client, slot, blobs, pages.continuation_token
+
+            # Only the first page fails over: continuation tokens belong to the account that issued them
+            container_client, slot, blobs, token = self._on_replicas(replicas, first_page, options, instrumentation)
+            while True:
+                for blob in blobs:
+                    if routing.locate(blob.name) == location:
+                        yield blob
+                if not token:
+                    break
+                pages = container_client.list_blobs(name_starts_with=name_prefix, **options).by_page(token)
+                with slot():
+                    blobs = list(next(pages))
+                token = pages.continuation_token
+
+    def cache_blob(self, blob_path: str, file_extension: Optional[str] = "pdf") -> int:
+        """
+        Download a blob into the read cache without decoding it, ahead of an expected read.
+
+        The download is shared with concurrent reads of the blob like any other read. Blobs
+        already in the cache are left alone, and local backends are read in place, so neither
+        costs a request.
+
+        Args:
+            blob_path: Name of the document without extension
+            file_extension: File extension of the document, or None to let the manifest pick one
+
+        Returns:
+            int: Bytes downloaded into the cache (0 when nothing had to be fetched)
+        """
+        if self.cache is None:
+            raise ValueError("cache_blob requires a connection with a read cache")
+        blob_name = self._resolve_blob_name(blob_path, file_extension)
+        if self._local_backend or self._cache_key(blob_name) in self.cache:
+            return 0
+        return len(self._shared_download(blob_name))
+
+    def upload_blob(
+        self,
+        blob_path: str,
+        data,
+        file_extension: str = "txt",
+        overwrite: bool = True,
+        content_type: Optional[str] = None,
+        metadata: Optional[Dict[str, str]] = None,
+    ) -> BlobWriteResult:
+        """
+        Write a document to the ``quant/`` folder of the container.
+
+        Payloads up to ``config.max_single_upload_size`` are sent with one request. Larger ones
+        are split into ``config.upload_block_size`` blocks, staged ``config.upload_concurrency``
+        at a time and committed with a block list, so readers see either the previous version
+        or the complete new one. File objects and generators are read one block at a time, so
+        memory use stays around ``upload_concurrency`` blocks whatever the payload size.
+
+        A routed blob is written to the first endpoint of its shard, within the endpoint's
+        concurrency cap; while that endpoint is throttled the write goes to the next replica. A
+        single-request upload that gets a 503 moves on to the next replica at once, while staged
+        uploads stay on the endpoint holding their blocks.
+
+        Args:
+            blob_path: Name of the document without extension
+            data: Bytes, text, a binary or text file object, or an iterable of byte/string chunks
+            file_extension: File extension of the document
+            overwrite: Replace an existing blob; when False an existing blob fails with 409
+            content_type: Content type stored with the blob
+            metadata: Metadata stored with the blob
+
+        Returns:
+            BlobWriteResult: ETag, size and number of staged blocks (0 for a single request)
+        """
+        blob_name = _blob_name(blob_path, file_extension)
+        config = self.config
+        instrumentation = self.instrumentation
+        replicas = self._replicas(blob_name, write=True)
+        options = dict(self._request_options(instrumentation))
+        if content_type:
+            _load_sdk("ContentSettings")
+            options["content_settings"] = ContentSettings(content_type=content_type)
+        if metadata:
+            options["metadata"] = metadata
+
+        blocks = _iter_blocks(data, config.upload_block_size)
+        try:
+            with instrumentation.span("upload", blob=blob_name) as span:
+                # Buffer up to the single-request limit to find out whether the payload fits in one
+                head, head_size = [], 0
+                for block in blocks:
+                    head.append(block)
+                    head_size += len(block)
+                    if head_size > config.max_single_upload_size:
+                        break
+                else:
+                    payload = bytes(head[0]) if len(head) == 1 else b"".join(head)
+
+                    def put(endpoint: Optional[Endpoint], request_options: dict, slot):
+                        with slot():
+                            return self._blob_client_at(endpoint, blob_name).upload_blob(
+                                payload, overwrite=overwrite, **request_options
+                            )
+
+                    response = self._on_replicas(replicas, put, options, instrumentation)
+                    result = BlobWriteResult(0, blob_path, file_extension, etag=response.get("etag"), size=head_size)
+                    self._uploaded(blob_name, result, span, instrumentation)
+                    return result
+
+                def drain_head() -> Iterator:
+                    while head:
+                        yield head.pop(0)
+
+                def stage_and_commit(endpoint: Optional[Endpoint], request_options: dict, slot):
+                    blob_client = self._blob_client_at(endpoint, blob_name)
+                    block_ids, size = self._stage_blocks(
+                        blob_client, itertools.chain(drain_head(), blocks), slot, instrumentation
+                    )
+                    # Put Block List takes raw conditional headers rather than etag/match_condition
+                    conditions = {} if overwrite else {"if_none_match": "*"}
+                    with slot():
+                        response = blob_client.commit_block_list(block_ids, **conditions, **request_options)
+                    return block_ids, size, response
+
+                # The blocks are read from ``data`` once, so a staged upload cannot move to another replica
+                block_ids, size, response = self._on_replicas(
+                    replicas, stage_and_commit, options, instrumentation, failover=False
+                )
+                result = BlobWriteResult(
+                    0, blob_path, file_extension, etag=response.get("etag"), size=size, blocks=len(block_ids)
+                )
+                self._uploaded(blob_name, result, span, instrumentation)
+        except Exception:
+            instrumentation.count("adls_uploads_total", outcome="error")
+            raise
+        return result
+
+    def upload_many(
+        self,
+        items,
+        file_extension: str = "txt",
+        overwrite: bool = True,
+        content_type: Optional[str] = None,
+    ) -> List[BlobWriteResult]:
+        """
+        Write several documents in parallel on a thread pool of ``config.max_workers`` threads.
+
+        Each upload goes through ``upload_blob``, so large items are also staged in parallel
+        blocks; at most ``max_workers * upload_concurrency`` requests are in flight.
+
+        Args:
+            items: Mapping or iterable of ``(name, data)`` pairs; ``data`` as in ``upload_blob``
+            file_extension: File extension shared by the documents
+            overwrite: Replace existing blobs
+            content_type: Content type stored with every blob
+
+        Returns:
+            List[BlobWriteResult]: One result per item, in input order, with the error of failed items
+        """
+        items = list(items.items() if hasattr(items, "items") else items)
+        if not items:
+            return []
+        results: List[Optional[BlobWriteResult]] = [None] * len(items)
+        executor = ThreadPoolExecutor(
+            max_workers=min(self.config.max_workers, len(items)),
+            thread_name_prefix="adls-upload",
+        )
+        try:
+            futures = {
+                executor.submit(
+                    contextvars.copy_context().run, self.upload_blob,
+                    blob_path, data, file_extension, overwrite, content_type,
+                ): (index, blob_path)
+                for index, (blob_path, data) in enumerate(items)
+            }
+            for future in as_completed(futures):
+                index, blob_path = futures[future]
+                try:
+                    results[index] = replace(future.result(), index=index)
+                except Exception as e:
+                    results[index] = BlobWriteResult(index, blob_path, file_extension, error=e)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        return results
+
+    def _stage_blocks(
+        self, blob_client, blocks: Iterable, slot, instrumentation: Instrumentation
+    ) -> Tuple[List[str], int]:
+        """
+        Stage blocks in parallel, reading the next block only when a staging slot is free.
+        Each request also holds ``slot()``, the endpoint's concurrency slot.
+
+        Returns the block IDs in order and the total size; raises the first staging error,
+        leaving the uncommitted blocks for the service to discard.
+        """
+        concurrency = self.config.upload_concurrency
+        options = self._request_options(instrumentation)
+        upload_id = uuid.uuid4().hex
+        slots = threading.Semaphore(concurrency)
+        failed = threading.Event()
+        block_ids: List[str] = []
+        futures = []
+        size = 0
+
+        def stage(block_id: str, block) -> None:
+            try:
+                with slot():
+                    blob_client.stage_block(block_id, bytes(block), **options)
+            except BaseException:
+                failed.set()
+                raise
+            finally:
+                slots.release()
+
+        executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="adls-stage")
+        try:
+            for index, block in enumerate(blocks):
+                slots.acquire()
+                if failed.is_set():
+                    slots.release()
+                    break
+                # IDs must have the same length within a blob; the upload ID keeps concurrent writers apart
+                block_id = base64.b64encode(f"{upload_id}-{index:08d}".encode("ascii")).decode("ascii")
+                block_ids.append(block_id)
+                size += len(block)
+                futures.append(executor.submit(contextvars.copy_context().run, stage, block_id, block))
+                del block
+            for future in futures:
+                future.result()
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+        instrumentation.count("adls_blocks_staged_total", len(block_ids))
+        return block_ids, size
+
+    def _uploaded(self, blob_name: str, result: BlobWriteResult, span, instrumentation: Instrumentation) -> None:
+        """Record a finished upload and drop the cached copy of the previous version."""
+        span.set_attribute("bytes", result.size)
+        span.set_attribute("blocks", result.blocks)
+        instrumentation.count("adls_uploads_total", outcome="ok")
+        instrumentation.count("adls_bytes_uploaded_total", result.size)
+        if self.cache is not None:
+            self.cache.discard(self._cache_key(blob_name))
+
+    def _cache_key(self, blob_name: str) -> str:
+        return f"{self.config.adls_url}/{self.config.container_name}/{blob_name}"
+
+    def _resolve_blob_name(self, blob_path: str, file_extension: Optional[str]) -> str:
+        """Blob name of a document, checked against the manifest when one is attached."""
+        if self.manifest is None:
+            if file_extension is None:
+                raise ValueError("file_extension is required when no manifest is attached")
+            return _blob_name(blob_path, file_extension)
+        if file_extension is None:
+            file_extension = self.manifest.resolve_extension(blob_path)
+        if file_extension is None or self.manifest.lookup(blob_path, file_extension) is None:
+            raise FileNotFoundError(f"{_blob_name(blob_path, file_extension or '*')} is not in the manifest")
+        return _blob_name(blob_path, file_extension)
+
+    def _blob_client_at(self, endpoint: Optional[Endpoint], blob_name: str):
+        """Client of one blob at a routed endpoint, or in the configured container when ``endpoint`` is None."""
+        if endpoint is not None:
+            return self._endpoint_client(endpoint).get_blob_client(container=endpoint.container_name, blob=blob_name)
+        return self.backend.get_blob_client(
+            container=self.config.container_name,
+            blob=blob_name
+        )
+
+    def _endpoint_client(self, endpoint: Endpoint):
+        """Shared service client of a routed endpoint's account."""
+        return self.registry.get_client(
+            endpoint.adls_url,
+            max_connections=self.config.max_connections,
+            account_key=endpoint.account_key.get_secret_value() if endpoint.account_key else None,
+        )
+
+    def _replicas(self, blob_name: str, write: bool = False) -> List[Endpoint]:
+        """
+        Routed endpoints of a blob, nearest first; empty when the configured container holds it.
+
+        Writes start at the first endpoint configured for the shard instead of the nearest one.
+        """
+        if self.routing is None:
+            return []
+        replicas = self.routing.replicas(blob_name)
+        if write and replicas:
+            primary = self.routing.primary(blob_name)
+            replicas = [primary] + [endpoint for endpoint in replicas if endpoint is not primary]
+        return replicas
+
+    def _failover_order(self, replicas: List[Endpoint]) -> List[Endpoint]:
+        """Replicas in the order they are tried: throttled ones last."""
+        # sorted() is stable, so replicas keep their order within the throttled and ready groups
+        return sorted(replicas, key=lambda endpoint: self.registry.endpoint_state(endpoint).throttled)
+
+    def _read_policy_at(self, endpoint: Optional[Endpoint]) -> ReadPolicy:
+        """Read policy learning from the latencies of a routed endpoint's account (``read_policy`` for None)."""
+        if endpoint is None or endpoint.adls_url == self.config.adls_url:
+            return self.read_policy
+        return replace(
+            self.read_policy,
+            tracker=self.registry.latency_tracker(endpoint.adls_url, self.config.latency_window),
+        )
+
+    def _on_replicas(
+        self,
+        replicas: List[Endpoint],
+        operation,
+        options: dict,
+        instrumentation: Instrumentation,
+        failover: bool = True,
+    ):
+        """
+        Run ``operation(endpoint, options, slot)`` on the first replica that does not throttle it.
+
+        Replicas cooling down from a 503 are tried last. ``slot`` is the endpoint's concurrency
+        slot, which the operation holds around each request and the read of its body. When a
+        replica answers 503 it is put in cooldown and the next one is tried at once: the SDK
+        does not retry on replicas that have a successor, only on the last one. Without
+        ``failover`` only the first replica is tried. With no replicas the operation runs once
+        against the configured container (``endpoint`` None) without a cap.
+        """
+        if not replicas:
+            return operation(None, options, nullcontext)
+        replicas = self._failover_order(replicas)
+        if not failover:
+            replicas = replicas[:1]
+        for position, endpoint in enumerate(replicas):
+            last = position + 1 == len(replicas)
+            state = self.registry.endpoint_state(endpoint)
+            try:
+                return operation(endpoint, options if last else dict(options, retry_total=0), state.slot)
+            except HttpResponseError as e:
+                if last or e.status_code not in FAILOVER_STATUS:
+                    raise
+                state.throttle(self.config.throttle_cooldown)
+                instrumentation.count("adls_failovers_total", account=endpoint.adls_url, container=endpoint.container_name)
+
+    def _read_text(self, blob_path: str, file_extension: Optional[str]) -> str:
+        """Read and decode a blob under a ``read`` span, counting the outcome in ``adls_reads_total``; raises on failure."""
+        instrumentation = self.instrumentation
+        try:
+            with instrumentation.span("read", blob=f"{blob_path}.{file_extension}"):
+                content = self._download_text(blob_path, file_extension)
+        except Exception:
+            instrumentation.count("adls_reads_total", outcome="error")
+            raise
+        instrumentation.count("adls_reads_total", outcome="ok")
+        return content
+
+    def _download_text(self, blob_path: str, file_extension: str) -> str:
+        """Download and decode a blob, raising on failure."""
+        blob_data = self._download_bytes(self._resolve_blob_name(blob_path, file_extension))
+        with self.instrumentation.span("decode", bytes=len(blob_data)):
+            # str() decodes any buffer, so mapped local files are decoded without an extra copy
+            return str(blob_data, "utf-8")
+
+    def _request_options(self, instrumentation: Instrumentation) -> dict:
+        """Per-request SDK options; counts responses that trigger a retry when instrumented."""
+        if not instrumentation.enabled:
+            return {}
+
+        def count_retries(response) -> None:
+            if response.http_response.status_code in RETRYABLE_STATUS:
+                instrumentation.count("adls_retries_total", status=str(response.http_response.status_code))
+
+        return {"raw_response_hook": count_retries}
+
+    def _download_bytes(self, blob_name: str):
+        """
+        Download a blob, sharing the download with concurrent reads of the same blob.
+
+        Returns ``bytes`` from ADLS and a zero-copy ``memoryview`` from the local backends,
+        which are neither coalesced nor cached since they are already local.
+        """
+        prefetcher = self.prefetcher
+        if prefetcher is not None:
+            cached = self.cache is not None and self._cache_key(blob_name) in self.cache
+            prefetcher.claim(blob_name, cached)
+        return self._shared_download(blob_name)
+
+    def _shared_download(self, blob_name: str):
+        """Download a blob through the single-flight group (ADLS only)."""
+        if self._local_backend or not self.config.coalesce_reads:
+            return self._fetch_bytes(blob_name)
+        blob_data, shared = self.single_flight.do(
+            self._flight_prefix + (blob_name,), lambda: self._fetch_bytes(blob_name)
+        )
+        if shared:
+            self.instrumentation.count("adls_coalesced_total")
+        return blob_data
+
+    def _fetch_bytes(self, blob_name: str):
+        """Download a blob through the cache, revalidating cached copies by ETag."""
+        instrumentation = self.instrumentation
+        if self.cache is None or self._local_backend:
+            with instrumentation.span("download", blob=blob_name) as span:
+                blob_data, _ = self._download_all(blob_name, instrumentation)
+                span.set_attribute("bytes", len(blob_data))
+            instrumentation.count("adls_bytes_transferred_total", len(blob_data))
+            return blob_data
+
+        cache_key = self._cache_key(blob_name)
+        entry = self.cache.get(cache_key)
+        if entry is not None and self.cache.is_fresh(entry):
+            instrumentation.count("adls_cache_total", result="hit")
+            return entry.data
+        with instrumentation.span("download", blob=blob_name) as span:
+            if entry is None or not entry.etag:
+                blob_data, properties = self._download_all(blob_name, instrumentation)
+            else:
+                try:
+                    blob_data, properties = self._download_all(
+                        blob_name, instrumentation,
+                        etag=entry.etag, match_condition=MatchConditions.IfModified
+                    )
+                except HttpResponseError as e:
+                    if e.status_code != 304:
+                        raise
+                    span.set_attribute("bytes", 0)
+                    self.cache.revalidated(cache_key, entry)
+                    instrumentation.count("adls_cache_total", result="revalidated")
+                    return entry.data
+            span.set_attribute("bytes", len(blob_data))
+        instrumentation.count("adls_cache_total", result="miss")
+        instrumentation.count("adls_bytes_transferred_total", len(blob_data))
+        self.cache.put(cache_key, blob_data, properties.etag)
+        return blob_data
+
+    def _download_all(self, blob_name: str, instrumentation: Instrumentation, **conditions):
+        """
+        Download a whole blob under the read policy; returns its bytes and properties.
+
+        Thresholds come from the latencies of the account the read starts at, and each latency
+        is recorded for the account that answered it.
+        """
+        options = self._request_options(instrumentation)
+        replicas = self._replicas(blob_name)
+
+        def download(endpoint: Optional[Endpoint], request_options: dict, slot):
+            with slot():
+                downloader = self._blob_client_at(endpoint, blob_name).download_blob(**conditions, **request_options)
+                return downloader.readall(), downloader.properties, endpoint
+
+        def attempt(timeout: Optional[float]):
+            request_options = options
+            if timeout is not None:
+                # The policy retries on its own, so the SDK gives up on a stalled socket at once
+                request_options = dict(options, connection_timeout=timeout, read_timeout=timeout, retry_total=0)
+            # Each attempt starts from the nearest replica and fails over on throttling
+            return self._on_replicas(replicas, download, request_options, instrumentation)
+
+        if self.read_policy is None or self._local_backend:
+            blob_data, properties, _ = attempt(None)
+            return blob_data, properties
+        policy = self._read_policy_at(self._failover_order(replicas)[0] if replicas else None)
+        blob_data, properties, _ = policy.run(
+            blob_name, attempt, lambda result: len(result[0]), instrumentation,
+            tracker_of=lambda result: self._read_policy_at(result[2]).tracker,
+        )
+        return blob_data, properties
+
+
+# %% Async connection
+class AsyncADLSConnection:
+    """
+    Asyncio counterpart of ADLSConnection built on the aio Blob SDK.
+
+    The client is bound to the event loop it is first used on, so create one connection per
+    loop and close it (or use ``async with``) when the loop shuts down. Every download acquires
+    a per-connection semaphore, which caps concurrent transfers at ``config.max_concurrency``
+    no matter how many tool calls are awaiting reads. With the local and in-memory backends
+    reads go through a synchronous ADLSConnection on worker threads instead.
+
+    Routed documents (``config.routes``) are read from their nearest replica like in
+    ADLSConnection, failing over on 503. The cooldown of throttled replicas is shared with the
+    synchronous connections through the registry, while the ``max_concurrency`` cap of each
+    endpoint is held by an asyncio semaphore per connection.
+    """
+
+    def __init__(self, config: Optional[ADLSConfig] = None, registry: Optional[ClientRegistry] = None):
+        """
+        Initialize the connection.
+
+        Args:
+            config: Explicit configuration. When omitted it is read from the environment (.env)
+            registry: Registry holding the throttling state of routed endpoints (defaults to the
+                process-wide one)
+        """
+        if config is None:
+            config = _config_from_env()
+        _load_sdk("asyncio", "HttpResponseError")
+
+        self.config = config
+        self.registry = registry if registry is not None else _client_registry
+        self.credential = None
+        self.blob_service_client = None
+        self.routing = None
+        self._local = None
+        if config.backend != "adls":
+            self._local = ADLSConnection(config)
+        else:
+            _load_sdk("AsyncBlobServiceClient", "AsyncDefaultAzureCredential")
+            self.credential = None if config.account_key else AsyncDefaultAzureCredential()
+            self.blob_service_client = AsyncBlobServiceClient(
+                account_url=config.adls_url,
+                credential=config.account_key.get_secret_value() if config.account_key else self.credential
+            )
+            if config.routes:
+                self.routing = RoutingTable(config.routes, region=config.region)
+        self._semaphore = asyncio.Semaphore(config.max_concurrency)
+        self._endpoint_clients: Dict[Tuple[str, Hashable], "AsyncBlobServiceClient"] = {}
+        self._endpoint_slots: Dict[Tuple[str, str], "asyncio.Semaphore"] = {}
+        self.single_flight = AsyncSingleFlight()
+
+    async def read_blob_content(self, blob_path: str, file_extension: str = "pdf") -> Optional[str]:
+        """
+        Read a blob from the ``quant/`` folder of the container without blocking the event loop.
+
+        Args:
+            blob_path: Name of the document without extension
+            file_extension: File extension of the document
+
+        Returns:
+            Optional[str]: Decoded content, or None if the blob could not be read
+        """
+        try:
+            if self._local is not None:
+                async with self._semaphore:
+                    return await asyncio.to_thread(self._local._download_text, blob_path, file_extension)
+            blob_name = _blob_name(blob_path, file_extension)
+            if not self.config.coalesce_reads:
+                blob_data = await self._download(blob_name)
+            else:
+                blob_data, shared = await self.single_flight.do(blob_name, lambda: self._download(blob_name))
+                if shared:
+                    get_instrumentation().count("adls_coalesced_total")
+            return blob_data.decode("utf-8")
+        except Exception as e:
+            logging.error(f"Error reading blob {blob_path}.{file_extension}: {e}")
+            return None
+
+    async def _download(self, blob_name: str) -> bytes:
+        """Download a blob while holding one of the ``max_concurrency`` slots."""
+        async with self._semaphore:
+            replicas = self.routing.replicas(blob_name) if self.routing is not None else []
+            if not replicas:
+                blob_client = self.blob_service_client.get_blob_client(
+                    container=self.config.container_name,
+                    blob=blob_name
+                )
+                downloader = await blob_client.download_blob()
+                return await downloader.readall()
+            return await self._download_routed(blob_name, replicas)
+
+    async def _download_routed(self, blob_name: str, replicas: List[Endpoint]) -> bytes:
+        """Download a routed blob from the first replica that does not throttle it (see ADLSConnection._on_replicas)."""
+        # sorted() is stable, so replicas keep their nearest-first order within each group
+        replicas = sorted(replicas, key=lambda endpoint: self.registry.endpoint_state(endpoint).throttled)
+        for position, endpoint in enumerate(replicas):
+            last = position + 1 == len(replicas)
+            blob_client = self._endpoint_client(endpoint).get_blob_client(container=endpoint.container_name, blob=blob_name)
+            try:
+                async with self._endpoint_slot(endpoint):
+                    downloader = await blob_client.download_blob(**({} if last else {"retry_total": 0}))
+                    return await downloader.readall()
+            except HttpResponseError as e:
+                if last or e.status_code not in FAILOVER_STATUS:
+                    raise
+                self.registry.endpoint_state(endpoint).throttle(self.config.throttle_cooldown)
+                get_instrumentation().count(
+                    "adls_failovers_total", account=endpoint.adls_url, container=endpoint.container_name
+                )
+
+    def _endpoint_client(self, endpoint: Endpoint) -> "AsyncBlobServiceClient":
+        """Client of a routed endpoint's account, created on first use and bound to this connection."""
+        account_key = endpoint.account_key.get_secret_value() if endpoint.account_key else None
+        key = (endpoint.adls_url, _credential_identity(account_key))
+        client = self._endpoint_clients.get(key)
+        if client is None:
+            if account_key is None and self.credential is None:
+                self.credential = AsyncDefaultAzureCredential()
+            client = self._endpoint_clients[key] = AsyncBlobServiceClient(
+                account_url=endpoint.adls_url, credential=account_key or self.credential
+            )
+        return client
+
+    def _endpoint_slot(self, endpoint: Endpoint) -> "asyncio.Semaphore":
+        slot = self._endpoint_slots.get(endpoint.key)
+        if slot is None:
+            slot = self._endpoint_slots[endpoint.key] = asyncio.Semaphore(endpoint.max_concurrency)
+        return slot
+
+    async def read_blob_contents(self, blob_paths: Iterable[str], file_extension: str = "pdf") -> List[Optional[str]]:
+        """
+        Read several blobs concurrently, at most ``config.max_concurrency`` at a time.
+
+        Args:
+            blob_paths: Names of the documents without extension
+            file_extension: File extension shared by the documents
+
+        Returns:
+            List[Optional[str]]: Contents in input order, None where a read failed
+        """
+        return list(await asyncio.gather(
+            *(self.read_blob_content(blob_path, file_extension) for blob_path in blob_paths)
+        ))
+
+    async def close(self) -> None:
+        """Close the clients and the credential."""
+        if self.blob_service_client is not None:
+            await self.blob_service_client.close()
+        for client in self._endpoint_clients.values():
+            await client.close()
+        self._endpoint_clients.clear()
+        if self.credential is not None:
+            await self.credential.close()
+
+    async def __aenter__(self) -> "AsyncADLSConnection":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+
+# %% Warmup
+def warmup(config: Optional[ADLSConfig] = None, wait: bool = False) -> threading.Thread:
+    """
+    Prepare the first read ahead of time on a background thread.
+
+    Imports the SDK, builds the shared client and lists one blob, which acquires an access token
+    and leaves an open connection in the pool. Failures are logged and setup is left to the first
+    read, so a worker can call this at boot and start serving immediately.
+
+    Args:
+        config: Configuration to warm up. When omitted it is read from the environment (.env)
+        wait: Block until the warmup has finished
+
+    Returns:
+        threading.Thread: The warmup thread
+    """
+    def run() -> None:
+        try:
+            with get_instrumentation().span("warmup"):
+                connection = ADLSConnection(config)
+                if connection.blob_service_client is not None:
+                    container_client = connection.blob_service_client.get_container_client(
+                        connection.config.container_name
+                    )
+                    next(iter(container_client.list_blobs(name_starts_with="quant/", results_per_page=1)), None)
+        except Exception as e:
+            logging.warning(f"ADLS warmup failed: {e}")
+
+    thread = threading.Thread(target=run, name="adls-warmup", daemon=True)
+    thread.start()
+    if wait:
+        thread.join()
+    return thread
+
+
+# %% Legacy function
+def connected_agent_tool_read_json(paper: str) -> Optional[str]:
+    """
+    Legacy entry point used by the agent tool to read a paper as text.
+
+    Args:
+        paper: Name of the paper without extension
+
+    Returns:
+        Optional[str]: Paper content, or None on error
+    """
+    instrumentation = get_instrumentation()
+    try:
+        with instrumentation.span("legacy_read", paper=paper):
+            with instrumentation.span("connect"):
+                connection = ADLSConnection()
+            return connection.read_blob_content(paper, "pdf")
+    except Exception as e:
+        logging.error(f"Error in legacy function: {e}")
+        return None
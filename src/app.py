@@ -0,0 +1,368 @@
+"""
+Long-running service exposing the agent tools over JSON-RPC 2.0 on HTTP.
+This module serves paper reads (and web searches when configured) from one shared connection, with bounded workers, admission control and graceful shutdown
+
+Usage:
+    python src/app.py --port 8080 --max-workers 32 --max-in-flight 512 --metrics
+
+    curl -s localhost:8080/rpc -d '{"jsonrpc": "2.0", "id": 1, "method": "read_paper", "params": {"paper": "momentum"}}'
+"""
+# %% Libraries
+import os
+import json
+import signal
+import asyncio
+import inspect
+import logging
+import argparse
+import functools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from aiohttp import web
+from pydantic import BaseModel, Field
+
+from blob_cache import BlobCache, MemoryLRUCache
+from instrumentation import Instrumentation, MetricsRegistry, PrometheusExporter, get_instrumentation, set_instrumentation
+from module_loader import load_module
+
+# JSON-RPC 2.0 error codes; -32000 to -32099 are left to the server
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+SERVER_BUSY = -32000
+READ_FAILED = -32001
+CALL_TIMEOUT = -32002
+SEARCH_FAILED = -32003
+INTERNAL_ERROR = -32603
+
+
+# %% Configuration
+class AppConfig(BaseModel):
+    """Validated configuration of the tool service."""
+
+    host: str = Field(default="127.0.0.1", description="Interface to listen on")
+    port: int = Field(default=8080, ge=0, le=65535, description="Port to listen on (0 picks a free one)")
+    max_workers: int = Field(
+        default=32,
+        ge=1,
+        description="Threads running tool calls; also the size of the shared HTTPS connection pool",
+    )
+    max_in_flight: int = Field(
+        default=512,
+        ge=1,
+        description="Tool calls running or queued for a worker; calls beyond it are rejected as busy",
+    )
+    max_batch_size: int = Field(default=64, ge=1, description="Calls accepted in one JSON-RPC batch or read_papers call")
+    call_timeout: float = Field(default=30.0, gt=0, description="Seconds a caller waits for one tool call")
+    shutdown_timeout: float = Field(default=30.0, ge=0, description="Seconds to let in-flight calls finish on shutdown")
+    cache_bytes: int = Field(default=256 * 1024 * 1024, ge=1, description="Memory budget of the shared paper cache")
+
+
+class RpcError(Exception):
+    """Error returned to the caller as a JSON-RPC error object."""
+
+    def __init__(self, code: int, message: str, data: Any = None):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.data = data
+
+    def to_dict(self) -> dict:
+        error = {"code": self.code, "message": self.message}
+        if self.data is not None:
+            error["data"] = self.data
+        return error
+
+
+def _busy(reason: str) -> RpcError:
+    return RpcError(SERVER_BUSY, "Server busy", {"reason": reason, "retry_after": 1})
+
+
+# %% Service
+class ToolService:
+    """
+    JSON-RPC service sharing one ADLSConnection (and optional BingConnection) across every caller.
+
+    Tool calls run on a pool of ``max_workers`` threads, so the shared client's connection pool,
+    token cache and paper cache are reused by every request. At most ``max_in_flight`` calls may
+    be running or queued; beyond that calls fail at once with a "Server busy" error (HTTP 503
+    with ``Retry-After`` when the whole request is rejected) instead of queueing without bound.
+    On shutdown the listener closes first, new calls are rejected and running calls are given
+    ``shutdown_timeout`` seconds to finish before the connections are closed.
+
+    Endpoints: ``POST /rpc`` (single or batch calls), ``GET /healthz`` and, when a metrics
+    registry is given, ``GET /metrics``.
+    """
+
+    def __init__(
+        self,
+        config: Optional[AppConfig] = None,
+        connection=None,
+        search=None,
+        metrics: Optional[MetricsRegistry] = None,
+    ):
+        """
+        Initialize the service.
+
+        Args:
+            config: Service configuration (defaults to ``AppConfig()``)
+            connection: ADLSConnection to read papers through (defaults to one configured from
+                the environment, with a memory cache and a pool sized to ``max_workers``)
+            search: Optional BingConnection enabling the ``search_web`` method
+            metrics: Registry rendered at ``/metrics``
+        """
+        self.config = config or AppConfig()
+        self.connection = connection if connection is not None else self._default_connection()
+        self.search = search
+        self.metrics = metrics
+        self.port: Optional[int] = None
+        self._executor = ThreadPoolExecutor(max_workers=self.config.max_workers, thread_name_prefix="app-worker")
+        self._in_flight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._draining = False
+        self._runner: Optional[web.AppRunner] = None
+        self._site: Optional[web.TCPSite] = None
+        self._methods: Dict[str, Callable] = {
+            "ping": self._ping,
+            "read_paper": self._read_paper,
+            "read_papers": self._read_papers,
+            "search_web": self._search_web,
+        }
+
+    def _default_connection(self):
+        adls = load_module("adls_connection", "adls-connection.py")
+        config = adls._config_from_env()
+        config = config.model_copy(update={"max_connections": max(config.max_connections, self.config.max_workers)})
+        return adls.ADLSConnection(config, cache=BlobCache(memory=MemoryLRUCache(self.config.cache_bytes)))
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    # Lifecycle
+    def make_app(self) -> web.Application:
+        app = web.Application(client_max_size=1024 * 1024)
+        app.router.add_post("/rpc", self._handle_rpc)
+        app.router.add_get("/healthz", self._handle_health)
+        app.router.add_get("/metrics", self._handle_metrics)
+        return app
+
+    async def start(self) -> int:
+        """Start listening and return the bound port."""
+        self._runner = web.AppRunner(self.make_app(), access_log=None, handle_signals=False)
+        await self._runner.setup()
+        self._site = web.TCPSite(self._runner, self.config.host, self.config.port, backlog=1024)
+        await self._site.start()
+        self.port = self._runner.addresses[0][1]
+        logging.info(f"Tool service listening on {self.config.host}:{self.port}")
+        return self.port
+
+    async def stop(self) -> None:
+        """Stop accepting calls, wait up to ``shutdown_timeout`` for running ones, then release resources."""
+        self._draining = True
+        if self._site is not None:
+            await self._site.stop()
+            self._site = None
+        if not self._idle.is_set():
+            try:
+                await asyncio.wait_for(self._idle.wait(), self.config.shutdown_timeout)
+            except asyncio.TimeoutError:
+                logging.warning(f"Shutting down with {self._in_flight} tool calls still running")
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        for resource in (self.connection, self.search):
+            close = getattr(resource, "close", None)
+            if close is not None:
+                try:
+                    close()
+                except Exception as e:
+                    logging.warning(f"Error closing {type(resource).__name__}: {e}")
+        logging.info("Tool service stopped")
+
+    async def serve_forever(self) -> None:
+        """Run until SIGINT or SIGTERM, then shut down gracefully."""
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, stop.set)
+        await self.start()
+        try:
+            await stop.wait()
+        finally:
+            await self.stop()
+
+    # Admission control
+    def _admit(self, units: int = 1) -> None:
+        if self._draining:
+            raise _busy("shutting_down")
+        if self._in_flight + units > self.config.max_in_flight:
+            get_instrumentation().count("app_rejected_total", reason="overloaded")
+            raise _busy("overloaded")
+        self._in_flight += units
+        self._idle.clear()
+
+    def _release(self, units: int = 1) -> None:
+        self._in_flight -= units
+        if self._in_flight == 0:
+            self._idle.set()
+
+    async def _run(self, fn: Callable, *args) -> Any:
+        """Run a blocking call on a worker; its slot is held until the worker is done with it."""
+        self._admit()
+        loop = asyncio.get_running_loop()
+        # Calls run in a copy of the handler's context so their spans nest under the request
+        future = loop.run_in_executor(self._executor, functools.partial(contextvars.copy_context().run, fn, *args))
+        future.add_done_callback(lambda _: self._release())
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), self.config.call_timeout)
+        except asyncio.TimeoutError:
+            raise RpcError(CALL_TIMEOUT, f"Tool call exceeded {self.config.call_timeout}s") from None
+
+    # Methods
+    async def _ping(self) -> str:
+        return "pong"
+
+    async def _read_paper(self, paper: str, extension: str = "pdf") -> dict:
+        if not isinstance(paper, str) or not paper or not isinstance(extension, str):
+            raise RpcError(INVALID_PARAMS, "paper and extension must be non-empty strings")
+        content = await self._run(self.connection.read_blob_content, paper, extension)
+        if content is None:
+            raise RpcError(READ_FAILED, f"Paper {paper}.{extension} could not be read")
+        return {"paper": paper, "extension": extension, "content": content}
+
+    async def _read_papers(self, papers: List[str], extension: str = "pdf") -> List[dict]:
+        if not isinstance(papers, list) or len(papers) > self.config.max_batch_size:
+            raise RpcError(INVALID_PARAMS, f"papers must be a list of at most {self.config.max_batch_size} names")
+
+        async def read(paper: str) -> dict:
+            try:
+                return await self._read_paper(paper, extension)
+            except RpcError as e:
+                return {"paper": paper, "extension": extension, "error": e.to_dict()}
+
+        return list(await asyncio.gather(*(read(paper) for paper in papers)))
+
+    async def _search_web(self, query: str, count: Optional[int] = None) -> dict:
+        if self.search is None:
+            raise RpcError(METHOD_NOT_FOUND, "Method not found: search_web (no search client configured)")
+        if not isinstance(query, str) or not query.strip():
+            raise RpcError(INVALID_PARAMS, "query must be a non-empty string")
+        try:
+            response = await self._run(self.search.search, query, count)
+        except RpcError:
+            raise
+        except Exception as e:
+            raise RpcError(SEARCH_FAILED, f"Search failed: {e}") from None
+        return response.to_dict()
+
+    # HTTP handlers
+    async def _handle_rpc(self, request: web.Request) -> web.Response:
+        # Reject before reading the body, so an overloaded node sheds load cheaply
+        if self._draining or self._in_flight >= self.config.max_in_flight:
+            reason = "shutting_down" if self._draining else "overloaded"
+            if not self._draining:
+                get_instrumentation().count("app_rejected_total", reason=reason)
+            return self._json(_error_response(None, _busy(reason)), status=503, headers={"Retry-After": "1"})
+        try:
+            payload = json.loads(await request.read())
+        except ValueError:
+            return self._json(_error_response(None, RpcError(PARSE_ERROR, "Parse error")))
+
+        if isinstance(payload, list):
+            if not payload or len(payload) > self.config.max_batch_size:
+                error = RpcError(INVALID_REQUEST, f"Batch must hold 1 to {self.config.max_batch_size} calls")
+                return self._json(_error_response(None, error))
+            responses = await asyncio.gather(*(self._call(item) for item in payload))
+            responses = [response for response in responses if response is not None]
+            return self._json(responses) if responses else web.Response(status=204)
+        response = await self._call(payload)
+        return self._json(response) if response is not None else web.Response(status=204)
+
+    async def _call(self, call: Any) -> Optional[dict]:
+        """Dispatch one JSON-RPC call; returns None for notifications."""
+        if not isinstance(call, dict) or call.get("jsonrpc") != "2.0" or not isinstance(call.get("method"), str):
+            return _error_response(None, RpcError(INVALID_REQUEST, "Invalid Request"))
+        call_id = call.get("id")
+        method = self._methods.get(call["method"])
+        params = call.get("params", {})
+        instrumentation = get_instrumentation()
+        try:
+            if method is None:
+                raise RpcError(METHOD_NOT_FOUND, f"Method not found: {call['method']}")
+            if isinstance(params, dict):
+                args, kwargs = (), params
+            elif isinstance(params, list):
+                args, kwargs = params, {}
+            else:
+                raise RpcError(INVALID_PARAMS, "params must be an object or an array")
+            # Only a mismatch with the signature is the caller's fault; a TypeError raised by the tool is a bug
+            try:
+                inspect.signature(method).bind(*args, **kwargs)
+            except TypeError as e:
+                raise RpcError(INVALID_PARAMS, f"Invalid params: {e}") from None
+            with instrumentation.span("tool_call", method=call["method"]):
+                result = await method(*args, **kwargs)
+        except RpcError as e:
+            error = e
+        except Exception as e:
+            logging.exception(f"Tool call {call['method']} failed")
+            error = RpcError(INTERNAL_ERROR, f"Internal error: {e}")
+        else:
+            instrumentation.count("app_calls_total", method=call["method"], outcome="ok")
+            return {"jsonrpc": "2.0", "id": call_id, "result": result} if "id" in call else None
+        instrumentation.count("app_calls_total", method=call["method"], outcome=str(error.code))
+        return _error_response(call_id, error) if "id" in call else None
+
+    async def _handle_health(self, request: web.Request) -> web.Response:
+        body = {
+            "status": "draining" if self._draining else "ok",
+            "in_flight": self._in_flight,
+            "max_in_flight": self.config.max_in_flight,
+        }
+        return self._json(body, status=503 if self._draining else 200)
+
+    async def _handle_metrics(self, request: web.Request) -> web.Response:
+        if self.metrics is None:
+            raise web.HTTPNotFound()
+        return web.Response(text=PrometheusExporter(self.metrics).render(), content_type="text/plain")
+
+    @staticmethod
+    def _json(body: Any, status: int = 200, headers: Optional[Dict[str, str]] = None) -> web.Response:
+        return web.Response(body=json.dumps(body).encode("utf-8"), status=status, headers=headers,
+                            content_type="application/json")
+
+
+def _error_response(call_id: Any, error: RpcError) -> dict:
+    return {"jsonrpc": "2.0", "id": call_id, "error": error.to_dict()}
+
+
+# %% Command line
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Serve the agent tools over JSON-RPC")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=8080, help="Port to listen on")
+    parser.add_argument("--max-workers", type=int, default=32, help="Threads running tool calls")
+    parser.add_argument("--max-in-flight", type=int, default=512, help="Calls admitted before answering busy")
+    parser.add_argument("--metrics", action="store_true", help="Collect metrics and serve them at /metrics")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    metrics = None
+    if args.metrics:
+        metrics = MetricsRegistry()
+        set_instrumentation(Instrumentation([metrics]))
+    search = None
+    if os.getenv("BING_SEARCH_API_KEY"):
+        search = load_module("bing_connection", "bing-conncetion.py").BingConnection()
+    config = AppConfig(host=args.host, port=args.port, max_workers=args.max_workers, max_in_flight=args.max_in_flight)
+    asyncio.run(ToolService(config, search=search, metrics=metrics).serve_forever())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""
+Benchmark of the ADLSConnection read path against a local blob endpoint.
+This module runs cold and warm reads over several blob sizes and concurrency levels and reports the results as JSON
+
+Usage:
+    python src/benchmark.py --sizes 16k,1m,8m --concurrency 1,8,32 --requests 200 \\
+        --latency-ms 5 --bandwidth-mbps 200 --output bench.json
+
+Pass ``--endpoint`` (and ``--account-key``) to target Azurite instead of the in-process fake server.
+"""
+# %% Libraries
+import json
+import time
+import logging
+import argparse
+import platform
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Sequence
+
+from blob_cache import BlobCache
+from fake_blob_server import ACCOUNT_KEY, FakeBlobServer, FaultProfile
+from module_loader import load_module
+
+CONTAINER = "benchmark"
+
+
+# %% Statistics
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    """Linearly interpolated percentile of already sorted values (``q`` in [0, 100])."""
+    if not sorted_values:
+        return 0.0
+    rank = (len(sorted_values) - 1) * q / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (rank - lower)
+
+
+@dataclass
+class ScenarioResult:
+    """Measurements of one (scenario, blob size, concurrency) cell."""
+
+    scenario: str
+    blob_size: int
+    concurrency: int
+    requests: int
+    errors: int
+    duration_s: float
+    latencies_ms: List[float] = field(default_factory=list, repr=False)
+
+    def to_dict(self) -> dict:
+        latencies = sorted(self.latencies_ms)
+        succeeded = self.requests - self.errors
+        duration = self.duration_s or float("inf")
+        return {
+            "scenario": self.scenario,
+            "blob_size": self.blob_size,
+            "concurrency": self.concurrency,
+            "requests": self.requests,
+            "errors": self.errors,
+            "duration_s": round(self.duration_s, 6),
+            "throughput_rps": round(succeeded / duration, 3),
+            "throughput_mib_s": round(succeeded * self.blob_size / duration / (1024 * 1024), 3),
+            "latency_ms": {
+                "mean": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+                "p50": round(percentile(latencies, 50), 3),
+                "p95": round(percentile(latencies, 95), 3),
+                "p99": round(percentile(latencies, 99), 3),
+                "max": round(latencies[-1], 3) if latencies else 0.0,
+            },
+        }
+
+
+def measure(read: Callable[[str], Optional[str]], names: Sequence[str], concurrency: int) -> tuple:
+    """
+    Issue one read per name with ``concurrency`` threads.
+
+    Returns:
+        tuple: (latencies in ms, error count, wall-clock seconds)
+    """
+    def timed(name: str):
+        start = time.perf_counter()
+        result = read(name)
+        return (time.perf_counter() - start) * 1000, result is None
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        outcomes = list(executor.map(timed, names))
+    duration = time.perf_counter() - start
+    return [latency for latency, _ in outcomes], sum(failed for _, failed in outcomes), duration
+
+
+# %% Runner
+def seed_blobs(connection, sizes: Sequence[int], copies: int) -> Dict[int, List[str]]:
+    """Upload ``copies`` text blobs of every size and return their names by size."""
+    service = connection.blob_service_client
+    try:
+        service.create_container(connection.config.container_name)
+    except Exception:
+        pass  # already exists
+    names = {}
+    for size in sizes:
+        payload = (b"0123456789abcdef" * (size // 16 + 1))[:size]
+        names[size] = []
+        for copy in range(copies):
+            name = f"bench-{size}-{copy}"
+            service.get_blob_client(connection.config.container_name, f"quant/{name}.txt").upload_blob(
+                payload, overwrite=True
+            )
+            names[size].append(name)
+    return names
+
+
+def run_benchmark(
+    config,
+    sizes: Sequence[int],
+    concurrency_levels: Sequence[int],
+    requests: int,
+) -> List[ScenarioResult]:
+    """
+    Measure cold and warm reads for every blob size and concurrency level.
+
+    Cold reads use a fresh client registry (new connection pool) and no cache, so each read
+    is a full transfer. Warm reads reuse a primed pool and a primed BlobCache, so each read is
+    an ETag revalidation answered with 304.
+
+    Args:
+        config: ADLSConfig of the endpoint under test
+        sizes: Blob sizes in bytes
+        concurrency_levels: Numbers of concurrent readers
+        requests: Reads issued per cell
+
+    Returns:
+        List[ScenarioResult]: One result per (scenario, size, concurrency)
+    """
+    adls = load_module("adls_connection", "adls-connection.py")
+    config = config.model_copy(update={
+        "max_connections": max(config.max_connections, max(concurrency_levels)),
+    })
+    seeding_registry = adls.ClientRegistry()
+    names = seed_blobs(adls.ADLSConnection(config, registry=seeding_registry), sizes, max(concurrency_levels))
+    seeding_registry.close()
+
+    results = []
+    for size in sizes:
+        for concurrency in concurrency_levels:
+            pool = names[size][:concurrency]
+            workload = [pool[i % len(pool)] for i in range(requests)]
+            for scenario in ("cold", "warm"):
+                registry = adls.ClientRegistry()
+                cache = BlobCache() if scenario == "warm" else None
+                connection = adls.ADLSConnection(config, registry=registry, cache=cache)
+                if scenario == "warm":
+                    measure(lambda name: connection.read_blob_content(name, "txt"), pool, concurrency)
+                latencies, errors, duration = measure(
+                    lambda name: connection.read_blob_content(name, "txt"), workload, concurrency
+                )
+                registry.close()
+                results.append(ScenarioResult(scenario, size, concurrency, requests, errors, duration, latencies))
+    return results
+
+
+def parse_size(text: str) -> int:
+    """Parse sizes such as ``512``, ``16k`` or ``8m``."""
+    text = text.strip().lower()
+    multiplier = {"k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}.get(text[-1:], 1)
+    return int(float(text[:-1] if multiplier > 1 else text) * multiplier)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> dict:
+    parser = argparse.ArgumentParser(description="Benchmark the ADLSConnection read path")
+    parser.add_argument("--sizes", default="16k,1m", help="Comma-separated blob sizes (k/m/g suffixes)")
+    parser.add_argument("--concurrency", default="1,8,32", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=100, help="Reads per scenario cell")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Injected per-request latency")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Uniform random extra latency")
+    parser.add_argument("--bandwidth-mbps", type=float, default=None, help="Per-response bandwidth cap")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--stall-rate", type=float, default=0.0, help="Fraction of requests that stall")
+    parser.add_argument("--stall-ms", type=float, default=0.0, help="Duration of a stall")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for fault injection")
+    parser.add_argument("--endpoint", default=None, help="External endpoint (e.g. Azurite) instead of the fake server")
+    parser.add_argument("--account-key", default=ACCOUNT_KEY, help="Shared key for --endpoint")
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    # The SDK warns about the empty body of every 304 answered to a warm read
+    logging.getLogger("azure.storage.blob._shared.response_handlers").setLevel(logging.ERROR)
+    adls = load_module("adls_connection", "adls-connection.py")
+    sizes = [parse_size(size) for size in args.sizes.split(",")]
+    concurrency_levels = [int(level) for level in args.concurrency.split(",")]
+    faults = FaultProfile(
+        latency=args.latency_ms / 1000,
+        jitter=args.jitter_ms / 1000,
+        bandwidth=args.bandwidth_mbps * 1024 * 1024 / 8 if args.bandwidth_mbps else None,
+        error_rate=args.error_rate,
+        stall_rate=args.stall_rate,
+        stall_seconds=args.stall_ms / 1000,
+    )
+
+    server = None
+    if args.endpoint is None:
+        server = FakeBlobServer(faults=faults, seed=args.seed).start()
+    try:
+        config = adls.ADLSConfig(
+            adls_url=args.endpoint or server.url,
+            container_name=CONTAINER,
+            account_key=args.account_key,
+            allow_insecure_http=True,
+        )
+        results = run_benchmark(config, sizes, concurrency_levels, args.requests)
+    finally:
+        if server is not None:
+            server.stop()
+
+    report = {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "endpoint": "fake" if args.endpoint is None else args.endpoint,
+        },
+        "faults": asdict(faults) if args.endpoint is None else None,
+        "results": [result.to_dict() for result in results],
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            output.write(text)
+    else:
+        print(text)
+    return report
+
+
+if __name__ == "__main__":
+    main()
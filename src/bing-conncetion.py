@@ -0,0 +1,530 @@
+"""
+Connection to the Bing Web Search API.
+This module provides a validated configuration, a pooled and rate-limited client with a query-result cache, and a batched fan-out of searches
+"""
+# %% Libraries
+import os
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, replace
+from typing import Callable, Dict, Hashable, Iterable, List, Literal, Optional, Tuple
+
+from pydantic import BaseModel, Field, SecretStr, field_validator, model_validator
+
+BING_SEARCH_URL = "https://api.bing.microsoft.com/v7.0/search"
+# Statuses worth retrying: throttling and transient server errors
+_RETRYABLE_STATUS = frozenset((429, 500, 502, 503, 504))
+
+
+# %% Configuration
+class BingConfig(BaseModel):
+    """Validated configuration for a Bing Web Search connection."""
+
+    api_key: SecretStr = Field(..., description="Bing Search resource key (Ocp-Apim-Subscription-Key)")
+    endpoint: str = Field(default=BING_SEARCH_URL, description="Web Search endpoint URL")
+    market: str = Field(default="en-US", description="Market the results are tailored to")
+    safe_search: Literal["Off", "Moderate", "Strict"] = Field(default="Moderate", description="Adult content filter")
+    count: int = Field(default=10, ge=1, le=50, description="Results returned per query")
+    requests_per_second: float = Field(
+        default=3.0,
+        gt=0,
+        description="Request quota of the pricing tier; the scheduler never exceeds it",
+    )
+    burst: int = Field(
+        default=1,
+        ge=1,
+        description="Requests that may be sent back to back before the per-second pacing applies",
+    )
+    cache_ttl: float = Field(default=3600.0, ge=0, description="Seconds a query result is served from the cache")
+    cache_max_entries: int = Field(default=1024, ge=0, description="Query results kept in the LRU cache (0 disables it)")
+    max_connections: int = Field(default=10, ge=1, description="Size of the HTTPS connection pool")
+    max_workers: int = Field(default=8, ge=1, description="Thread pool size used by search_many")
+    timeout: float = Field(default=10.0, gt=0, description="Seconds to wait for a response")
+    max_retries: int = Field(default=3, ge=0, description="Retries of throttled or failed requests")
+    allow_insecure_http: bool = Field(
+        default=False,
+        description="Accept an http:// endpoint, for local stub servers only",
+    )
+
+    @field_validator('endpoint')
+    @classmethod
+    def validate_endpoint(cls, v):
+        if not v or not v.startswith(('https://', 'http://')):
+            raise ValueError('Bing endpoint must be a valid HTTPS URL')
+        return v
+
+    @field_validator('api_key')
+    @classmethod
+    def validate_api_key(cls, v):
+        if not v.get_secret_value().strip():
+            raise ValueError('Bing API key cannot be empty')
+        return v
+
+    @model_validator(mode='after')
+    def validate_scheme(self):
+        if self.endpoint.startswith('http://') and not self.allow_insecure_http:
+            raise ValueError('Bing endpoint must be a valid HTTPS URL')
+        return self
+
+
+def _config_from_env() -> BingConfig:
+    """Build the configuration from environment variables, loading .env first."""
+    import dotenv
+
+    dotenv.load_dotenv()
+    api_key = os.getenv("BING_SEARCH_API_KEY")
+    if not api_key:
+        raise ValueError("BING_SEARCH_API_KEY must be set in environment variables")
+    return BingConfig(api_key=api_key, endpoint=os.getenv("BING_SEARCH_ENDPOINT") or BING_SEARCH_URL)
+
+
+def _pooled_session(max_connections: int) -> "requests.Session":
+    """Build a requests session whose connection pool holds ``max_connections`` sockets."""
+    # Imported here so that importing the module stays cheap
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=max_connections, pool_maxsize=max_connections)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+# %% Results
+@dataclass(frozen=True)
+class WebPage:
+    """One web result."""
+
+    name: str
+    url: str
+    snippet: str = ""
+    display_url: str = ""
+    date_last_crawled: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class SearchResponse:
+    """Web results of one query."""
+
+    query: str
+    pages: Tuple[WebPage, ...]
+    total_estimated_matches: int = 0
+    from_cache: bool = False
+
+    def to_dict(self) -> dict:
+        return {
+            "query": self.query,
+            "total_estimated_matches": self.total_estimated_matches,
+            "pages": [
+                {"name": page.name, "url": page.url, "snippet": page.snippet}
+                for page in self.pages
+            ],
+        }
+
+
+@dataclass(frozen=True)
+class SearchBatchResult:
+    """Outcome of one query in a batch: either the response or the error raised."""
+
+    index: int
+    query: str
+    response: Optional[SearchResponse] = None
+    error: Optional[Exception] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class BingSearchError(Exception):
+    """Error answered by the Search API."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _parse_response(query: str, payload: dict) -> SearchResponse:
+    web_pages = payload.get("webPages") or {}
+    pages = tuple(
+        WebPage(
+            name=item.get("name", ""),
+            url=item.get("url", ""),
+            snippet=item.get("snippet", ""),
+            display_url=item.get("displayUrl", ""),
+            date_last_crawled=item.get("dateLastCrawled"),
+        )
+        for item in web_pages.get("value", [])
+    )
+    return SearchResponse(query, pages, int(web_pages.get("totalEstimatedMatches", 0)))
+
+
+# %% Query cache
+@dataclass
+class QueryCacheStats:
+    """Hit/miss/eviction/expiration counters of the query cache."""
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class QueryCache:
+    """Thread-safe LRU cache of search responses whose entries expire ``ttl`` seconds after being stored."""
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 3600.0, clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Entries kept; least recently used ones are evicted beyond it
+            ttl: Seconds an entry stays valid
+            clock: Monotonic time source (injectable for tests)
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stats = QueryCacheStats()
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, Tuple[float, SearchResponse]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[SearchResponse]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                self.stats.misses += 1
+                return None
+            stored_at, response = item
+            if self._clock() - stored_at >= self.ttl:
+                del self._entries[key]
+                self.stats.expirations += 1
+                self.stats.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return response
+
+    def put(self, key: Hashable, response: SearchResponse) -> None:
+        if self.max_entries <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (self._clock(), response)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+# %% Rate limiting
+class TokenBucket:
+    """
+    Thread-safe token bucket pacing requests to ``rate`` per second with bursts of ``capacity``.
+
+    Callers reserve a token under the lock and sleep outside it, so waiting callers are served
+    in arrival order and never exceed the rate together. ``pause`` stops all callers until a
+    deadline, which is how a ``Retry-After`` answer from the service is honoured: callers that
+    were already sleeping when the pause began check it on waking and wait out its end, keeping
+    their place in line.
+    """
+
+    def __init__(self, rate: float, capacity: int = 1, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        """
+        Args:
+            rate: Tokens added per second
+            capacity: Maximum tokens accumulated while idle
+            clock: Monotonic time source (injectable for tests)
+            sleep: Sleep function (injectable for tests)
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._tokens = float(capacity)
+        self._updated = clock()
+        self._paused_until = 0.0
+        self._pauses = 0
+
+    def acquire(self) -> float:
+        """Take one token, waiting for it if needed; returns the seconds waited."""
+        with self._lock:
+            now = self._clock()
+            if now < self._paused_until:
+                # Refill only from the end of the pause
+                self._updated = max(self._updated, self._paused_until)
+            else:
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+            self._tokens -= 1
+            # Refill time owed to the callers ahead, counted from when the bucket restarts
+            behind = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            wake = max(now, self._paused_until) + behind
+            pauses = self._pauses
+        waited = 0.0
+        while True:
+            wait = wake - now
+            if wait > 0:
+                self._sleep(wait)
+                waited += wait
+            with self._lock:
+                now = self._clock()
+                if self._pauses == pauses:
+                    return waited
+                # A pause began while sleeping: the line restarts at its end
+                pauses = self._pauses
+                wake = self._paused_until + behind
+
+    def pause(self, seconds: float) -> None:
+        """Hold every caller for ``seconds`` from now (e.g. after a 429 with Retry-After)."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, self._clock() + seconds)
+            self._pauses += 1
+            # One request may go as soon as the pause ends and the rest are paced from there;
+            # requests already waiting keep their turn
+            self._tokens = min(self._tokens, 1.0) if self._tokens < 0 else 1.0
+
+
+# %% Connection
+class BingConnection:
+    """
+    Client of the Bing Web Search API for grounding the agent on the web.
+
+    Requests go through one pooled HTTPS session, are paced by a token bucket set to the
+    tier's quota and are retried after throttling, honouring ``Retry-After``. Results are cached
+    per normalized query, so repeated sub-queries of an agent run cost no quota.
+    """
+
+    def __init__(
+        self,
+        config: Optional[BingConfig] = None,
+        session=None,
+        cache: Optional[QueryCache] = None,
+        bucket: Optional[TokenBucket] = None,
+    ):
+        """
+        Initialize the connection.
+
+        Args:
+            config: Explicit configuration. When omitted it is read from the environment (.env)
+            session: requests session to send through (defaults to a pooled one)
+            cache: Query-result cache (defaults to one sized by the configuration)
+            bucket: Rate limiter (defaults to one set to ``config.requests_per_second``)
+        """
+        if config is None:
+            config = _config_from_env()
+        self.config = config
+        self.session = session if session is not None else _pooled_session(config.max_connections)
+        self.cache = cache if cache is not None else QueryCache(config.cache_max_entries, config.cache_ttl)
+        self.bucket = bucket if bucket is not None else TokenBucket(config.requests_per_second, config.burst)
+
+    def search(
+        self,
+        query: str,
+        count: Optional[int] = None,
+        offset: int = 0,
+        freshness: Optional[str] = None,
+    ) -> SearchResponse:
+        """
+        Search the web, answering from the cache when the same query was made recently.
+
+        Args:
+            query: Search terms
+            count: Results to return (defaults to ``config.count``)
+            offset: Results to skip, for paging
+            freshness: Optional age filter (``Day``, ``Week``, ``Month`` or a date range)
+
+        Returns:
+            SearchResponse: Web results of the query
+
+        Raises:
+            ValueError: If the query is empty
+            BingSearchError: If the service rejects the request or keeps failing
+        """
+        query = " ".join(query.split())
+        if not query:
+            raise ValueError("Search query cannot be empty")
+        params = {
+            "q": query,
+            "count": count or self.config.count,
+            "offset": offset,
+            "mkt": self.config.market,
+            "safeSearch": self.config.safe_search,
+            "responseFilter": "Webpages",
+        }
+        if freshness:
+            params["freshness"] = freshness
+        key = self._cache_key(params)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return replace(cached, from_cache=True)
+        response = _parse_response(query, self._request(params))
+        self.cache.put(key, response)
+        return response
+
+    def search_many(self, queries: Iterable[str], count: Optional[int] = None) -> List[SearchBatchResult]:
+        """
+        Run several searches concurrently on a thread pool of ``config.max_workers`` threads.
+
+        Duplicate queries in the batch are sent once. Concurrency hides request latency while the
+        token bucket keeps the batch within the quota.
+
+        Args:
+            queries: Search terms of each sub-query
+            count: Results per query (defaults to ``config.count``)
+
+        Returns:
+            List[SearchBatchResult]: One result per query, in input order
+        """
+        queries = list(queries)
+        if not queries:
+            return []
+        unique: Dict[str, List[int]] = {}
+        for index, query in enumerate(queries):
+            unique.setdefault(" ".join(query.split()).lower(), []).append(index)
+
+        results: List[Optional[SearchBatchResult]] = [None] * len(queries)
+        with ThreadPoolExecutor(
+            max_workers=min(self.config.max_workers, len(unique)),
+            thread_name_prefix="bing-search",
+        ) as executor:
+            futures = {
+                executor.submit(self.search, queries[indexes[0]], count): indexes
+                for indexes in unique.values()
+            }
+            for future in as_completed(futures):
+                try:
+                    outcome = {"response": future.result()}
+                except Exception as e:
+                    outcome = {"error": e}
+                for index in futures[future]:
+                    results[index] = SearchBatchResult(index, queries[index], **outcome)
+        return results
+
+    def _cache_key(self, params: dict) -> Hashable:
+        normalized = dict(params, q=params["q"].lower())
+        return (self.config.endpoint,) + tuple(sorted(normalized.items()))
+
+    def _request(self, params: dict) -> dict:
+        """Send one search, pacing it and retrying throttled or failed attempts."""
+        import requests
+
+        headers = {"Ocp-Apim-Subscription-Key": self.config.api_key.get_secret_value()}
+        attempt = 0
+        while True:
+            self.bucket.acquire()
+            backoff = min(0.5 * 2 ** attempt, 8.0)
+            try:
+                response = self.session.get(
+                    self.config.endpoint, params=params, headers=headers, timeout=self.config.timeout
+                )
+            except requests.RequestException as e:
+                if attempt >= self.config.max_retries:
+                    raise BingSearchError(f"Search request failed: {e}") from e
+                time.sleep(backoff)
+            else:
+                if response.status_code == 200:
+                    return _json_body(response)
+                if response.status_code not in _RETRYABLE_STATUS or attempt >= self.config.max_retries:
+                    raise BingSearchError(
+                        f"Search failed with status {response.status_code}: {_error_message(response)}",
+                        response.status_code,
+                    )
+                retry_after = _retry_after(response.headers.get("Retry-After"))
+                # The quota belongs to the key, so every caller waits out the throttling
+                self.bucket.pause(retry_after if retry_after is not None else backoff)
+            attempt += 1
+
+    def close(self) -> None:
+        self.session.close()
+
+    def __enter__(self) -> "BingConnection":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def _retry_after(value: Optional[str]) -> Optional[float]:
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def _json_body(response) -> dict:
+    """JSON object of a successful answer; a non-JSON body (e.g. an HTML proxy page) raises BingSearchError."""
+    try:
+        payload = response.json()
+    except ValueError as e:
+        raise BingSearchError(
+            f"Search answered status {response.status_code} with an invalid JSON body: {response.text[:200]!r}",
+            response.status_code,
+        ) from e
+    if not isinstance(payload, dict):
+        raise BingSearchError(
+            f"Search answered status {response.status_code} with an unexpected JSON body: {response.text[:200]!r}",
+            response.status_code,
+        )
+    return payload
+
+
+def _error_message(response) -> str:
+    try:
+        errors = response.json().get("errors") or []
+        return errors[0].get("message", "") if errors else ""
+    except (ValueError, AttributeError, TypeError):
+        return response.text[:200]
+
+
+_shared_connection: Optional[BingConnection] = None
+_shared_lock = threading.Lock()
+
+
+def _connection() -> BingConnection:
+    """Process-wide connection built from the environment, so tool calls share cache and quota."""
+    global _shared_connection
+    with _shared_lock:
+        if _shared_connection is None:
+            _shared_connection = BingConnection()
+        return _shared_connection
+
+
+# %% Agent tool
+def connected_agent_tool_search_web(query: str) -> Optional[str]:
+    """
+    Entry point used by the agent tool to ground an answer on web results.
+
+    Args:
+        query: Search terms
+
+    Returns:
+        Optional[str]: JSON with the query and its pages (name, url, snippet), or None on error
+    """
+    try:
+        return json.dumps(_connection().search(query).to_dict())
+    except Exception as e:
+        logging.error(f"Error searching the web for {query!r}: {e}")
+        return None
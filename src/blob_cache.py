@@ -0,0 +1,369 @@
+"""
+Content cache placed in front of ADLS blob reads.
+This module provides an in-memory LRU tier, a persistent on-disk tier and a two-tier cache combining them
+"""
+# %% Libraries
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+from typing import Dict, Optional
+
+
+# %% Entries and statistics
+@dataclass
+class CacheEntry:
+    """Cached blob payload with the ETag it was downloaded at."""
+
+    data: bytes
+    etag: Optional[str]
+    stored_at: float = field(default_factory=time.time)
+
+    @property
+    def size(self) -> int:
+        return len(self.data)
+
+
+@dataclass
+class CacheStats:
+    """Hit/miss/eviction counters of a cache tier."""
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    revalidations: int = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "revalidations": self.revalidations,
+        }
+
+
+# %% Memory tier
+class MemoryLRUCache:
+    """Thread-safe LRU cache bounded by the total size of the cached payloads."""
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024):
+        """
+        Initialize the cache.
+
+        Args:
+            max_bytes: Byte budget; least recently used entries are evicted beyond it
+        """
+        if max_bytes <= 0:
+            raise ValueError("max_bytes must be positive")
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return entry
+
+    def put(self, key: str, entry: CacheEntry) -> None:
+        if entry.size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= previous.size
+            self._entries[key] = entry
+            self._size += entry.size
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= evicted.size
+                self.stats.evictions += 1
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= previous.size
+
+    def __contains__(self, key: str) -> bool:
+        """Whether a key is cached, without counting a lookup or refreshing its recency."""
+        with self._lock:
+            return key in self._entries
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    @property
+    def size_bytes(self) -> int:
+        return self._size
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# %% Disk tier
+class DiskCache:
+    """
+    Persistent cache storing one payload file and one metadata file per key.
+
+    Files are written atomically, so several processes can share the directory. Eviction is
+    least-recently-used by file access time, once the payloads exceed ``max_bytes``.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 4 * 1024 * 1024 * 1024):
+        """
+        Initialize the cache.
+
+        Args:
+            directory: Directory holding the cache files (created if missing)
+            max_bytes: Byte budget for the payload files
+        """
+        if max_bytes <= 0:
+            raise ValueError("max_bytes must be positive")
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        self._size: Optional[int] = None
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, key: str):
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        base = os.path.join(self.directory, digest)
+        return base + ".bin", base + ".json"
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        data_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as meta_file:
+                meta = json.load(meta_file)
+            with open(data_path, "rb") as data_file:
+                data = data_file.read()
+        except (OSError, ValueError):
+            self.stats.misses += 1
+            return None
+        if meta.get("key") != key or len(data) != meta.get("size"):
+            self.stats.misses += 1
+            return None
+        now = time.time()
+        try:
+            os.utime(data_path, (now, os.stat(data_path).st_mtime))
+        except OSError:
+            pass
+        self.stats.hits += 1
+        return CacheEntry(data=data, etag=meta.get("etag"), stored_at=meta.get("stored_at", now))
+
+    def put(self, key: str, entry: CacheEntry) -> None:
+        if entry.size > self.max_bytes:
+            return
+        data_path, meta_path = self._paths(key)
+        meta = {"key": key, "etag": entry.etag, "size": entry.size, "stored_at": entry.stored_at}
+        try:
+            previous_size = os.path.getsize(data_path)
+        except OSError:
+            previous_size = 0
+        try:
+            self._write_atomic(data_path, entry.data)
+            self._write_atomic(meta_path, json.dumps(meta).encode("utf-8"))
+        except OSError as e:
+            logging.warning(f"Error writing cache entry {key}: {e}")
+            return
+        with self._lock:
+            if self._size is not None:
+                self._size += entry.size - previous_size
+            over_budget = self._size is None or self._size > self.max_bytes
+        if over_budget:
+            self._evict()
+
+    def refresh(self, key: str, stored_at: float) -> None:
+        """Update the storage time of a cached entry, rewriting only its metadata file."""
+        data_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as meta_file:
+                meta = json.load(meta_file)
+            size = os.path.getsize(data_path)
+        except (OSError, ValueError):
+            return
+        if meta.get("key") != key or size != meta.get("size"):
+            return
+        meta["stored_at"] = stored_at
+        try:
+            self._write_atomic(meta_path, json.dumps(meta).encode("utf-8"))
+        except OSError as e:
+            logging.warning(f"Error refreshing cache entry {key}: {e}")
+
+    def _write_atomic(self, path: str, payload: bytes) -> None:
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as tmp_file:
+            tmp_file.write(payload)
+        os.replace(tmp_path, path)
+
+    def _evict(self) -> None:
+        """Rescan the directory and drop least recently used payloads until under budget."""
+        with self._lock:
+            files = []
+            total = 0
+            for name in os.listdir(self.directory):
+                if not name.endswith(".bin"):
+                    continue
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_atime, stat.st_size, path))
+                total += stat.st_size
+            if total > self.max_bytes:
+                total = self._evict_files(files, total)
+            self._size = total
+
+    def _evict_files(self, files, total: int) -> int:
+        for _, size, path in sorted(files):
+            for victim in (path, path[:-len(".bin")] + ".json"):
+                try:
+                    os.remove(victim)
+                except OSError:
+                    pass
+            total -= size
+            self.stats.evictions += 1
+            if total <= self.max_bytes:
+                break
+        return total
+
+    def __contains__(self, key: str) -> bool:
+        """Whether a key is cached, without counting a lookup or refreshing its access time."""
+        data_path, meta_path = self._paths(key)
+        return os.path.exists(meta_path) and os.path.exists(data_path)
+
+    def discard(self, key: str) -> None:
+        data_path, meta_path = self._paths(key)
+        with self._lock:
+            try:
+                size = os.path.getsize(data_path)
+            except OSError:
+                return
+            for path in (meta_path, data_path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            if self._size is not None:
+                self._size -= size
+
+    def clear(self) -> None:
+        with self._lock:
+            for name in os.listdir(self.directory):
+                if name.endswith((".bin", ".json")):
+                    try:
+                        os.remove(os.path.join(self.directory, name))
+                    except OSError:
+                        pass
+            self._size = 0
+
+    @property
+    def size_bytes(self) -> int:
+        total = 0
+        for name in os.listdir(self.directory):
+            if name.endswith(".bin"):
+                try:
+                    total += os.path.getsize(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+        return total
+
+
+# %% Two-tier cache
+class BlobCache:
+    """
+    Read cache used by ADLSConnection, backed by a memory tier and an optional disk tier.
+
+    Without ``ttl`` every hit is revalidated against the service with ``If-None-Match`` on the
+    cached ETag, so an unchanged blob costs a 304 instead of a full transfer. With ``ttl`` set,
+    entries younger than ``ttl`` seconds are served without contacting the service at all.
+    """
+
+    def __init__(
+        self,
+        memory: Optional[MemoryLRUCache] = None,
+        disk: Optional[DiskCache] = None,
+        ttl: Optional[float] = None,
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            memory: In-memory tier (a 256 MB LRU by default)
+            disk: Optional persistent tier
+            ttl: Seconds during which an entry is trusted without revalidation
+        """
+        self.memory = memory if memory is not None else MemoryLRUCache()
+        self.disk = disk
+        self.ttl = ttl
+        self.stats = CacheStats()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """Look a key up in the memory tier, then the disk tier (promoting disk hits)."""
+        entry = self.memory.get(key)
+        if entry is None and self.disk is not None:
+            entry = self.disk.get(key)
+            if entry is not None:
+                self.memory.put(key, entry)
+        if entry is None:
+            self.stats.misses += 1
+        else:
+            self.stats.hits += 1
+        return entry
+
+    def is_fresh(self, entry: CacheEntry) -> bool:
+        """Whether an entry may be served without revalidation."""
+        return self.ttl is not None and time.time() - entry.stored_at < self.ttl
+
+    def put(self, key: str, data: bytes, etag: Optional[str]) -> None:
+        """Store a freshly downloaded payload in every tier."""
+        entry = CacheEntry(data=data, etag=etag)
+        self.memory.put(key, entry)
+        if self.disk is not None:
+            self.disk.put(key, entry)
+
+    def revalidated(self, key: str, entry: CacheEntry) -> None:
+        """Record that the service confirmed an entry is current (HTTP 304)."""
+        self.stats.revalidations += 1
+        # Only the storage time changes: the payload is not copied or written to disk again
+        refreshed = replace(entry, stored_at=time.time())
+        self.memory.put(key, refreshed)
+        if self.disk is not None:
+            self.disk.refresh(key, refreshed.stored_at)
+
+    def __contains__(self, key: str) -> bool:
+        """Whether any tier holds a key, without counting a lookup."""
+        return key in self.memory or (self.disk is not None and key in self.disk)
+
+    def discard(self, key: str) -> None:
+        """Drop a key from every tier, e.g. after the blob was written."""
+        self.memory.discard(key)
+        if self.disk is not None:
+            self.disk.discard(key)
+
+    def clear(self) -> None:
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def counters(self) -> Dict[str, Dict[str, int]]:
+        """Counters of the cache and of each tier."""
+        counters = {"cache": self.stats.as_dict(), "memory": self.memory.stats.as_dict()}
+        if self.disk is not None:
+            counters["disk"] = self.disk.stats.as_dict()
+        return counters
@@ -0,0 +1,480 @@
+"""
+Columnar reader for market data (prices, factors) stored as Parquet or CSV blobs.
+This module provides Arrow tables and record-batch iterators with column projection and predicate pushdown; Parquet row groups are pruned from footer statistics and only the needed column chunks are downloaded
+"""
+# %% Libraries
+import io
+import bisect
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# A predicate is (column, operator, value); a list of predicates is their conjunction
+Predicate = Tuple[str, str, Any]
+OPERATORS = ("==", "!=", "<", "<=", ">", ">=", "in")
+FORMATS = ("parquet", "csv")
+
+
+def _pyarrow():
+    """Import pyarrow, which is only required by this reader."""
+    try:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.csv
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError("pyarrow is required for dataset reads (pip install pyarrow)") from e
+    return pyarrow
+
+
+# %% Predicates
+def _predicates(
+    filters: Optional[Iterable[Predicate]],
+    date_range: Optional[Tuple[Any, Any]],
+    tickers: Optional[Iterable[str]],
+    date_column: str,
+    ticker_column: str,
+) -> List[Predicate]:
+    """Validated conjunction of explicit filters and the date-range / ticker shorthands."""
+    predicates = [tuple(predicate) for predicate in filters or ()]
+    if date_range is not None:
+        start, end = date_range
+        if start is not None:
+            predicates.append((date_column, ">=", start))
+        if end is not None:
+            predicates.append((date_column, "<=", end))
+    if tickers is not None:
+        predicates.append((ticker_column, "in", list(tickers)))
+    for predicate in predicates:
+        if len(predicate) != 3 or predicate[1] not in OPERATORS:
+            raise ValueError(f"Invalid predicate {predicate!r}; expected (column, operator, value) with operator in {OPERATORS}")
+    return predicates
+
+
+def _bind(predicates: List[Predicate], schema) -> List[Tuple[str, str, Any]]:
+    """Cast predicate values to their column types (e.g. "2024-01-02" to date32)."""
+    pa = _pyarrow()
+    bound = []
+    for column, operator, value in predicates:
+        if schema.get_field_index(column) < 0:
+            raise KeyError(f"Unknown column in predicate: {column}")
+        column_type = schema.field(column).type
+        if operator == "in":
+            value = pa.array(list(value)).cast(column_type)
+        else:
+            scalar = value if isinstance(value, pa.Scalar) else pa.scalar(value)
+            value = scalar if scalar.type.equals(column_type) else scalar.cast(column_type)
+        bound.append((column, operator, value))
+    return bound
+
+
+def _expression(bound: List[Tuple[str, str, Any]]):
+    """Arrow compute expression of a bound conjunction, or None when it is empty."""
+    pc = _pyarrow().compute
+    expression = None
+    for column, operator, value in bound:
+        field = pc.field(column)
+        if operator == "in":
+            term = field.isin(value)
+        else:
+            term = {
+                "==": field == value,
+                "!=": field != value,
+                "<": field < value,
+                "<=": field <= value,
+                ">": field > value,
+                ">=": field >= value,
+            }[operator]
+        expression = term if expression is None else expression & term
+    return expression
+
+
+def _may_match(operator: str, value, minimum, maximum) -> bool:
+    """Whether a column whose values lie in [minimum, maximum] can satisfy the predicate."""
+    try:
+        if operator == "in":
+            return any(item is not None and minimum <= item <= maximum for item in value.to_pylist())
+        value = value.as_py()
+        if value is None:
+            return True
+        if operator == "==":
+            return minimum <= value <= maximum
+        if operator == "!=":
+            return not minimum == maximum == value
+        if operator == "<":
+            return minimum < value
+        if operator == "<=":
+            return minimum <= value
+        if operator == ">":
+            return maximum > value
+        return maximum >= value
+    except TypeError:
+        # Statistics that do not compare with the value (e.g. naive vs aware timestamps) cannot prune
+        return True
+
+
+# %% Range file
+class BlobRangeFile(io.RawIOBase):
+    """
+    Seekable, read-only file object over a blob that downloads exactly the ranges it is asked for.
+
+    Reads are served from ranges fetched ahead with ``prefetch`` when they cover them, and
+    otherwise with one range request each. Every request is pinned to the ETag seen on open.
+    """
+
+    def __init__(self, connection, blob_path: str, file_extension: str, max_workers: int = 8):
+        """
+        Args:
+            connection: ADLSConnection the blob is read through
+            blob_path: Name of the blob without extension
+            file_extension: File extension of the blob
+            max_workers: Parallel range requests of a prefetch
+        """
+        super().__init__()
+        properties = connection.get_blob_properties(blob_path, file_extension)
+        self.connection = connection
+        self.blob_path = blob_path
+        self.file_extension = file_extension
+        self.max_workers = max_workers
+        self.size: int = properties.size
+        self.etag: Optional[str] = properties.etag
+        self.bytes_fetched = 0
+        self.request_count = 0
+        self._lock = threading.Lock()
+        self._position = 0
+        self._starts: List[int] = []
+        self._ranges: Dict[int, bytes] = {}
+
+    def _fetch(self, offset: int, length: int) -> bytes:
+        data = self.connection.read_blob_range(
+            self.blob_path, self.file_extension, offset=offset, length=length, etag=self.etag
+        )
+        with self._lock:
+            self.bytes_fetched += len(data)
+            self.request_count += 1
+        return data
+
+    def prefetch(self, ranges: Iterable[Tuple[int, int]], hole_size: int = 0) -> None:
+        """
+        Fetch ``(offset, length)`` ranges in parallel, replacing the previously prefetched ones.
+
+        Ranges closer than ``hole_size`` bytes are merged into one request, trading a few unused
+        bytes for fewer round trips.
+        """
+        merged: List[List[int]] = []
+        for offset, length in sorted(ranges):
+            if merged and offset - merged[-1][1] <= hole_size:
+                merged[-1][1] = max(merged[-1][1], offset + length)
+            else:
+                merged.append([offset, offset + length])
+        self._starts, self._ranges = [], {}
+        if not merged:
+            return
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(merged)), thread_name_prefix="dataset-range") as executor:
+            futures = [
+                executor.submit(contextvars.copy_context().run, self._fetch, start, stop - start)
+                for start, stop in merged
+            ]
+            self._ranges = {start: future.result() for (start, _), future in zip(merged, futures)}
+        self._starts = sorted(self._ranges)
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        if position < 0:
+            raise ValueError("Negative seek position")
+        self._position = position
+        return position
+
+    def read(self, size: int = -1) -> bytes:
+        if self.closed:
+            raise ValueError("I/O operation on closed blob range file")
+        start = self._position
+        stop = self.size if size is None or size < 0 else min(self.size, start + size)
+        if start >= stop:
+            return b""
+        index = bisect.bisect_right(self._starts, start) - 1
+        if index >= 0:
+            range_start = self._starts[index]
+            data = self._ranges[range_start]
+            if stop <= range_start + len(data):
+                self._position = stop
+                return data[start - range_start:stop - range_start]
+        data = self._fetch(start, stop - start)
+        self._position = start + len(data)
+        return data
+
+    def readinto(self, buffer) -> int:
+        data = self.read(len(buffer))
+        memoryview(buffer).cast("B")[:len(data)] = data
+        return len(data)
+
+    def close(self) -> None:
+        self._starts, self._ranges = [], {}
+        super().close()
+
+
+# %% Scan plan
+@dataclass(frozen=True)
+class ScanPlan:
+    """Row groups and column chunks a Parquet scan reads after pruning."""
+
+    name: str
+    columns: List[str]
+    row_groups: List[int]
+    row_groups_total: int
+    bytes_planned: int
+    size: int
+
+    @property
+    def row_groups_pruned(self) -> int:
+        return self.row_groups_total - len(self.row_groups)
+
+
+# %% Reader
+class DatasetReader:
+    """
+    Reads Parquet and CSV time series stored under ``quant/`` as Arrow data.
+
+    Both formats project columns and filter rows with a conjunction of predicates, given as
+    ``filters=[(column, operator, value), ...]`` or through the ``date_range`` and ``tickers``
+    shorthands. Parquet reads download the footer, skip row groups whose min/max statistics
+    rule the predicates out, and fetch only the chunks of the needed columns in parallel range
+    requests, one row group at a time. CSV has no index, so it is streamed whole in
+    ``config.chunk_size`` windows and filtered batch by batch.
+    """
+
+    def __init__(
+        self,
+        connection,
+        date_column: str = "date",
+        ticker_column: str = "ticker",
+        batch_size: int = 65536,
+        hole_size: int = 64 * 1024,
+    ):
+        """
+        Initialize the reader.
+
+        Args:
+            connection: ADLSConnection used to read the blobs
+            date_column: Column the ``date_range`` shorthand filters on
+            ticker_column: Column the ``tickers`` shorthand filters on
+            batch_size: Maximum rows per record batch
+            hole_size: Gap below which neighbouring Parquet column chunks are fetched together
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        self.connection = connection
+        self.date_column = date_column
+        self.ticker_column = ticker_column
+        self.batch_size = batch_size
+        self.hole_size = hole_size
+
+    def read(
+        self,
+        name: str,
+        extension: str = "parquet",
+        columns: Optional[Sequence[str]] = None,
+        filters: Optional[Iterable[Predicate]] = None,
+        date_range: Optional[Tuple[Any, Any]] = None,
+        tickers: Optional[Iterable[str]] = None,
+    ):
+        """
+        Read the matching rows of ``quant/{name}.{extension}`` into one Arrow table.
+
+        Args:
+            name: Name of the dataset without extension
+            extension: "parquet" or "csv"
+            columns: Columns to return (all when None)
+            filters: Predicates ``(column, operator, value)`` that every returned row satisfies
+            date_range: Inclusive ``(start, end)`` on ``date_column``; either bound may be None
+            tickers: Values of ``ticker_column`` to keep
+
+        Returns:
+            pyarrow.Table: Matching rows with the requested columns
+        """
+        scan = self._scan(name, extension, columns, filters, date_range, tickers)
+        schema = next(scan)
+        return _pyarrow().Table.from_batches(list(scan), schema=schema)
+
+    def iter_batches(
+        self,
+        name: str,
+        extension: str = "parquet",
+        columns: Optional[Sequence[str]] = None,
+        filters: Optional[Iterable[Predicate]] = None,
+        date_range: Optional[Tuple[Any, Any]] = None,
+        tickers: Optional[Iterable[str]] = None,
+    ) -> Iterator:
+        """
+        Stream the matching rows as record batches; memory is bounded by one row group (Parquet)
+        or one download window (CSV). Arguments are those of ``read``.
+
+        Yields:
+            pyarrow.RecordBatch: Non-empty batches of at most ``batch_size`` rows
+        """
+        scan = self._scan(name, extension, columns, filters, date_range, tickers)
+        next(scan)
+        yield from scan
+
+    def plan(
+        self,
+        name: str,
+        columns: Optional[Sequence[str]] = None,
+        filters: Optional[Iterable[Predicate]] = None,
+        date_range: Optional[Tuple[Any, Any]] = None,
+        tickers: Optional[Iterable[str]] = None,
+    ) -> ScanPlan:
+        """
+        Work out which row groups and bytes a Parquet read would fetch, downloading only the footer.
+
+        Returns:
+            ScanPlan: Surviving row groups and the compressed size of their needed column chunks
+        """
+        predicates = _predicates(filters, date_range, tickers, self.date_column, self.ticker_column)
+        with BlobRangeFile(self.connection, name, "parquet", self.connection.config.max_workers) as source:
+            parquet_file = _pyarrow().parquet.ParquetFile(source)
+            return self._plan(name, parquet_file, source.size, columns, predicates)[0]
+
+    def _scan(self, name, extension, columns, filters, date_range, tickers) -> Iterator:
+        """
+        Yield the output schema, then the matching batches.
+
+        Opening the dataset and producing each batch are timed as separate spans, closed before
+        every ``yield``: a span left open would stay current in the consumer's code between
+        batches and could not be closed from another thread or task resuming the iterator.
+        """
+        if extension not in FORMATS:
+            raise ValueError(f"Unsupported dataset format: {extension} (expected one of {FORMATS})")
+        predicates = _predicates(filters, date_range, tickers, self.date_column, self.ticker_column)
+        instrumentation = self.connection.instrumentation
+        blob = f"{name}.{extension}"
+        scan = self._scan_parquet if extension == "parquet" else self._scan_csv
+        batches = scan(name, columns, predicates)
+        with instrumentation.span("dataset_scan", blob=blob):
+            schema = next(batches)
+        yield schema
+        while True:
+            with instrumentation.span("dataset_batch", blob=blob) as span:
+                batch = next(batches, None)
+                span.set_attribute("rows", batch.num_rows if batch is not None else 0)
+            if batch is None:
+                return
+            yield batch
+
+    def _plan(self, name, parquet_file, size, columns, predicates: List[Predicate]):
+        """Scan plan plus the bound predicates, the columns read to evaluate them and the output schema."""
+        schema = parquet_file.schema_arrow
+        output = list(columns) if columns is not None else list(schema.names)
+        for column in output:
+            if schema.get_field_index(column) < 0:
+                raise KeyError(f"Unknown column: {column}")
+        bound = _bind(predicates, schema)
+        needed = set(output) | {column for column, _, _ in bound}
+        read_columns = [column for column in schema.names if column in needed]
+
+        metadata = parquet_file.metadata
+        row_groups, bytes_planned = [], 0
+        for index in range(metadata.num_row_groups):
+            row_group = metadata.row_group(index)
+            chunks = {}
+            for position in range(row_group.num_columns):
+                chunk = row_group.column(position)
+                chunks.setdefault(chunk.path_in_schema.split(".")[0], []).append(chunk)
+            if not all(self._row_group_may_match(chunks.get(column, ()), operator, value) for column, operator, value in bound):
+                continue
+            row_groups.append(index)
+            bytes_planned += sum(chunk.total_compressed_size for column in read_columns for chunk in chunks.get(column, ()))
+        plan = ScanPlan(
+            name=name,
+            columns=output,
+            row_groups=row_groups,
+            row_groups_total=metadata.num_row_groups,
+            bytes_planned=bytes_planned,
+            size=size,
+        )
+        return plan, bound, read_columns, schema.empty_table().select(output).schema
+
+    @staticmethod
+    def _row_group_may_match(chunks, operator: str, value) -> bool:
+        for chunk in chunks:
+            statistics = chunk.statistics
+            if statistics is None or not statistics.has_min_max:
+                return True
+            if not _may_match(operator, value, statistics.min, statistics.max):
+                return False
+        return True
+
+    @staticmethod
+    def _chunk_ranges(row_group, columns: Sequence[str]) -> List[Tuple[int, int]]:
+        """Byte ranges (offset, length) of the column chunks of ``columns`` in a row group."""
+        ranges = []
+        for position in range(row_group.num_columns):
+            chunk = row_group.column(position)
+            if chunk.path_in_schema.split(".")[0] not in columns:
+                continue
+            start = chunk.dictionary_page_offset if chunk.has_dictionary_page else chunk.data_page_offset
+            ranges.append((start, chunk.total_compressed_size))
+        return ranges
+
+    def _scan_parquet(self, name: str, columns, predicates: List[Predicate]) -> Iterator:
+        pq = _pyarrow().parquet
+        instrumentation = self.connection.instrumentation
+        with BlobRangeFile(self.connection, name, "parquet", self.connection.config.max_workers) as source:
+            parquet_file = pq.ParquetFile(source)
+            plan, bound, read_columns, output_schema = self._plan(name, parquet_file, source.size, columns, predicates)
+            yield output_schema
+            instrumentation.count("dataset_row_groups_total", len(plan.row_groups), outcome="read")
+            instrumentation.count("dataset_row_groups_total", plan.row_groups_pruned, outcome="pruned")
+            expression = _expression(bound)
+            for index in plan.row_groups:
+                source.prefetch(self._chunk_ranges(parquet_file.metadata.row_group(index), read_columns), self.hole_size)
+                table = parquet_file.read_row_group(index, columns=read_columns)
+                yield from self._filtered(table.to_batches(self.batch_size), expression, plan.columns)
+
+    def _scan_csv(self, name: str, columns, predicates: List[Predicate]) -> Iterator:
+        pa_csv = _pyarrow().csv
+        with self.connection.open_blob(name, "csv") as source:
+            include = None
+            if columns is not None:
+                include = list(dict.fromkeys(list(columns) + [column for column, _, _ in predicates]))
+            reader = pa_csv.open_csv(
+                source,
+                read_options=pa_csv.ReadOptions(block_size=min(source.chunk_size, 1 << 30)),
+                convert_options=pa_csv.ConvertOptions(include_columns=include),
+            )
+            schema = reader.schema
+            output = list(columns) if columns is not None else list(schema.names)
+            yield schema.empty_table().select(output).schema
+            expression = _expression(_bind(predicates, schema))
+            for batch in reader:
+                yield from self._filtered(self._split(batch), expression, output)
+
+    def _split(self, batch) -> Iterator:
+        for offset in range(0, batch.num_rows, self.batch_size):
+            yield batch.slice(offset, self.batch_size)
+
+    @staticmethod
+    def _filtered(batches, expression, columns: List[str]) -> Iterator:
+        for batch in batches:
+            if expression is not None:
+                batch = batch.filter(expression)
+            if batch.num_rows:
+                yield batch.select(columns)
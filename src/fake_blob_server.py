@@ -0,0 +1,399 @@
+"""
+In-process stand-in for the Azure Blob Storage REST API.
+This module provides a threaded HTTP server with configurable latency, bandwidth and fault injection for tests and benchmarks
+"""
+# %% Libraries
+import sys
+import time
+import random
+import hashlib
+import threading
+from dataclasses import dataclass
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+
+ACCOUNT_NAME = "devstoreaccount1"
+# Well-known development key published for the Azure storage emulator (Azurite)
+ACCOUNT_KEY = "Eby8vdM02xNOcqFlqUwJPLlmEtlCDXJ1OUzFT50uSRZ6IFsuFq2UVErCz4I6tq/K1SZFPTOtr/KBHBeksoGMGw=="
+SEND_BLOCK = 64 * 1024
+
+
+# %% Configuration
+@dataclass
+class FaultProfile:
+    """Latency, bandwidth and failures injected into every blob request."""
+
+    latency: float = 0.0
+    jitter: float = 0.0
+    bandwidth: Optional[float] = None
+    error_rate: float = 0.0
+    stall_rate: float = 0.0
+    stall_seconds: float = 0.0
+
+    def delay(self, rng: random.Random) -> float:
+        """Seconds to wait before answering a request."""
+        delay = self.latency + (rng.uniform(0, self.jitter) if self.jitter else 0.0)
+        if self.stall_rate and rng.random() < self.stall_rate:
+            delay += self.stall_seconds
+        return delay
+
+
+@dataclass
+class StoredBlob:
+    """Blob kept in server memory."""
+
+    data: bytes
+    etag: str
+    last_modified: float
+    content_type: str = "application/octet-stream"
+
+
+def _etag(data: bytes) -> str:
+    return '"0x' + hashlib.md5(data).hexdigest()[:16].upper() + '"'
+
+
+# %% Request handler
+class _BlobRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    server: "FakeBlobServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _split_path(self) -> Tuple[Optional[str], Optional[str], Dict[str, str]]:
+        parts = urlsplit(self.path)
+        query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        segments = unquote(parts.path).lstrip("/").split("/", 2)
+        if segments and segments[0] == ACCOUNT_NAME:
+            segments = segments[1:]
+        container = segments[0] if segments and segments[0] else None
+        blob = segments[1] if len(segments) > 1 and segments[1] else None
+        return container, blob, query
+
+    def _send(self, status: int, body: bytes = b"", headers: Optional[Dict[str, str]] = None,
+              send_body: bool = True) -> None:
+        self.send_response(status)
+        self.send_header("x-ms-request-id", self.server.next_request_id())
+        self.send_header("x-ms-version", "2023-11-03")
+        self.send_header("Date", formatdate(usegmt=True))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if "Content-Length" not in (headers or {}):
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if send_body and body:
+            self._write_body(body)
+
+    def _write_body(self, body: bytes) -> None:
+        bandwidth = self.server.faults.bandwidth
+        start = time.perf_counter()
+        for offset in range(0, len(body), SEND_BLOCK):
+            block = body[offset:offset + SEND_BLOCK]
+            self.wfile.write(block)
+            if bandwidth:
+                ahead = (offset + len(block)) / bandwidth - (time.perf_counter() - start)
+                if ahead > 0:
+                    time.sleep(ahead)
+
+    def _error(self, status: int, code: str, send_body: bool = True) -> None:
+        body = (
+            '<?xml version="1.0" encoding="utf-8"?><Error><Code>%s</Code>'
+            "<Message>%s</Message></Error>" % (code, code)
+        ).encode("utf-8")
+        self._send(status, body, {"x-ms-error-code": code, "Content-Type": "application/xml"}, send_body)
+
+    def _inject(self, send_body: bool = True) -> bool:
+        """Apply the fault profile; returns True when an error response was sent."""
+        server = self.server
+        server.record_request()
+        delay = server.faults.delay(server.rng) + server.take_stall()
+        if delay:
+            time.sleep(delay)
+        if server.faults.error_rate and server.rng.random() < server.faults.error_rate:
+            self._error(503, "ServerBusy", send_body)
+            return True
+        return False
+
+    def _blob_headers(self, blob: StoredBlob) -> Dict[str, str]:
+        return {
+            "ETag": blob.etag,
+            "Last-Modified": formatdate(blob.last_modified, usegmt=True),
+            "Content-Type": blob.content_type,
+            "x-ms-blob-type": "BlockBlob",
+            "x-ms-creation-time": formatdate(blob.last_modified, usegmt=True),
+            "x-ms-lease-state": "available",
+            "x-ms-lease-status": "unlocked",
+            "Accept-Ranges": "bytes",
+        }
+
+    def do_HEAD(self):
+        self._get(send_body=False)
+
+    def do_GET(self):
+        self._get(send_body=True)
+
+    def _get(self, send_body: bool) -> None:
+        container, blob_name, query = self._split_path()
+        if self._inject(send_body):
+            return
+        if blob_name is None:
+            if query.get("comp") == "list" and container is not None:
+                self._list(container, query)
+            else:
+                self._error(400, "InvalidQueryParameterValue", send_body)
+            return
+        blob = self.server.get_blob(container, blob_name)
+        if blob is None:
+            self._error(404, "BlobNotFound", send_body)
+            return
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match and if_none_match in (blob.etag, "*"):
+            self._send(304, headers={"ETag": blob.etag}, send_body=False)
+            return
+        if_match = self.headers.get("If-Match")
+        if if_match and if_match not in (blob.etag, "*"):
+            self._error(412, "ConditionNotMet", send_body)
+            return
+
+        headers = self._blob_headers(blob)
+        total = len(blob.data)
+        byte_range = self.headers.get("x-ms-range") or self.headers.get("Range")
+        if byte_range and send_body:
+            start_text, _, end_text = byte_range.split("=", 1)[1].partition("-")
+            start = int(start_text)
+            end = min(int(end_text) if end_text else total - 1, total - 1)
+            if start >= total:
+                headers = {"Content-Range": f"bytes */{total}", "x-ms-error-code": "InvalidRange"}
+                self._send(416, headers=headers)
+                return
+            body = blob.data[start:end + 1]
+            headers["Content-Range"] = f"bytes {start}-{end}/{total}"
+            headers["Content-Length"] = str(len(body))
+            self._send(206, body, headers)
+            return
+        headers["Content-Length"] = str(total)
+        self._send(200, blob.data, headers, send_body)
+
+    def _list(self, container: str, query: Dict[str, str]) -> None:
+        if not self.server.has_container(container):
+            self._error(404, "ContainerNotFound")
+            return
+        prefix = query.get("prefix", "")
+        marker = query.get("marker", "")
+        max_results = int(query.get("maxresults", "5000"))
+        names = sorted(name for name in self.server.blob_names(container) if name.startswith(prefix) and name > marker)
+        page, rest = names[:max_results], names[max_results:]
+        items = []
+        for name in page:
+            blob = self.server.get_blob(container, name)
+            if blob is None:
+                continue
+            items.append(
+                "<Blob><Name>%s</Name><Properties>"
+                "<Last-Modified>%s</Last-Modified><Etag>%s</Etag>"
+                "<Content-Length>%d</Content-Length><Content-Type>%s</Content-Type>"
+                "<BlobType>BlockBlob</BlobType></Properties></Blob>"
+                % (escape(name), formatdate(blob.last_modified, usegmt=True), escape(blob.etag),
+                   len(blob.data), escape(blob.content_type))
+            )
+        body = (
+            '<?xml version="1.0" encoding="utf-8"?>'
+            '<EnumerationResults ServiceEndpoint="%s" ContainerName="%s">'
+            "<Prefix>%s</Prefix><MaxResults>%d</MaxResults><Blobs>%s</Blobs>"
+            "<NextMarker>%s</NextMarker></EnumerationResults>"
+            % (escape(self.server.url), escape(container), escape(prefix), max_results, "".join(items),
+               escape(page[-1]) if rest else "")
+        ).encode("utf-8")
+        self._send(200, body, {"Content-Type": "application/xml"})
+
+    def do_PUT(self):
+        container, blob_name, query = self._split_path()
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        if self._inject():
+            return
+        if blob_name is None:
+            if query.get("restype") == "container":
+                created = self.server.create_container(container)
+                if created:
+                    self._send(201, headers={"ETag": _etag(container.encode()),
+                                             "Last-Modified": formatdate(usegmt=True)})
+                else:
+                    self._error(409, "ContainerAlreadyExists")
+            else:
+                self._error(400, "InvalidQueryParameterValue")
+            return
+        if not self.server.has_container(container):
+            self._error(404, "ContainerNotFound")
+            return
+        if query.get("comp") == "block":
+            block_id = query.get("blockid")
+            if not block_id:
+                self._error(400, "InvalidQueryParameterValue")
+                return
+            self.server.stage_block(container, blob_name, block_id, body)
+            self._send(201, headers={"x-ms-request-server-encrypted": "true"})
+            return
+        if self.headers.get("If-None-Match") == "*" and self.server.get_blob(container, blob_name) is not None:
+            self._error(409, "BlobAlreadyExists")
+            return
+        content_type = self.headers.get("x-ms-blob-content-type") or "application/octet-stream"
+        if query.get("comp") == "blocklist":
+            try:
+                block_ids = [element.text or "" for element in ElementTree.fromstring(body)]
+            except ElementTree.ParseError:
+                self._error(400, "InvalidXmlDocument")
+                return
+            blob = self.server.commit_blocks(container, blob_name, block_ids, content_type)
+            if blob is None:
+                self._error(400, "InvalidBlockList")
+                return
+        else:
+            blob = self.server.put_blob(container, blob_name, body, content_type)
+        self._send(201, headers={
+            "ETag": blob.etag,
+            "Last-Modified": formatdate(blob.last_modified, usegmt=True),
+            "x-ms-request-server-encrypted": "true",
+        })
+
+    def do_DELETE(self):
+        container, blob_name, _ = self._split_path()
+        if self._inject():
+            return
+        if blob_name is None or not self.server.delete_blob(container, blob_name):
+            self._error(404, "BlobNotFound")
+            return
+        self._send(202, headers={"x-ms-delete-type-permanent": "true"})
+
+
+# %% Server
+class FakeBlobServer(ThreadingHTTPServer):
+    """
+    Threaded HTTP server answering the subset of the Blob REST API used by ADLSConnection.
+
+    Supports container creation and listing, Put/Get/Head/Delete Blob, Put Block and Put Block
+    List, ranged reads and ``If-None-Match``/``If-Match`` conditions. Requests are authenticated by nobody, so any
+    shared key works; ``ACCOUNT_KEY`` is provided for convenience. Use as a context manager:
+
+        with FakeBlobServer(faults=FaultProfile(latency=0.005)) as server:
+            config = ADLSConfig(adls_url=server.url, container_name="papers",
+                                account_key=ACCOUNT_KEY, allow_insecure_http=True)
+    """
+
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, faults: Optional[FaultProfile] = None,
+                 seed: Optional[int] = None):
+        super().__init__((host, port), _BlobRequestHandler)
+        self.faults = faults or FaultProfile()
+        self.rng = random.Random(seed)
+        self.request_count = 0
+        self.staged_block_count = 0
+        self._stalls: list = []
+        self._containers: Dict[str, Dict[str, StoredBlob]] = {}
+        self._staged: Dict[Tuple[str, str], Dict[str, bytes]] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/{ACCOUNT_NAME}"
+
+    def next_request_id(self) -> str:
+        return f"fake-{threading.get_ident()}-{time.perf_counter_ns()}"
+
+    def record_request(self) -> None:
+        with self._lock:
+            self.request_count += 1
+
+    def stall_next(self, count: int, seconds: float) -> None:
+        """Hold the next ``count`` requests for ``seconds`` before answering (deterministic stalls)."""
+        with self._lock:
+            self._stalls.extend([seconds] * count)
+
+    def take_stall(self) -> float:
+        with self._lock:
+            return self._stalls.pop(0) if self._stalls else 0.0
+
+    def handle_error(self, request, client_address) -> None:
+        # Clients abandon stalled requests (timeouts, hedged reads), so broken pipes are expected
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+    def create_container(self, container: str) -> bool:
+        with self._lock:
+            if container in self._containers:
+                return False
+            self._containers[container] = {}
+            return True
+
+    def has_container(self, container: Optional[str]) -> bool:
+        with self._lock:
+            return container in self._containers
+
+    def put_blob(self, container: str, name: str, data: bytes,
+                 content_type: str = "application/octet-stream") -> StoredBlob:
+        with self._lock:
+            blobs = self._containers.setdefault(container, {})
+            blob = StoredBlob(data=bytes(data), etag=_etag(data + str(time.time_ns()).encode()),
+                              last_modified=time.time(), content_type=content_type)
+            blobs[name] = blob
+            return blob
+
+    def stage_block(self, container: str, name: str, block_id: str, data: bytes) -> None:
+        with self._lock:
+            self._staged.setdefault((container, name), {})[block_id] = bytes(data)
+            self.staged_block_count += 1
+
+    def staged_blocks(self, container: str, name: str) -> List[str]:
+        """IDs of the uncommitted blocks of a blob."""
+        with self._lock:
+            return list(self._staged.get((container, name), {}))
+
+    def commit_blocks(self, container: str, name: str, block_ids: List[str],
+                      content_type: str = "application/octet-stream") -> Optional[StoredBlob]:
+        """Assemble a blob from staged blocks; None (and nothing changes) if a block is unknown."""
+        with self._lock:
+            staged = self._staged.get((container, name), {})
+            if any(block_id not in staged for block_id in block_ids):
+                return None
+            data = b"".join(staged[block_id] for block_id in block_ids)
+            # Committing discards every uncommitted block of the blob, as the service does
+            self._staged.pop((container, name), None)
+        return self.put_blob(container, name, data, content_type)
+
+    def get_blob(self, container: Optional[str], name: str) -> Optional[StoredBlob]:
+        with self._lock:
+            return self._containers.get(container, {}).get(name)
+
+    def delete_blob(self, container: Optional[str], name: str) -> bool:
+        with self._lock:
+            return self._containers.get(container, {}).pop(name, None) is not None
+
+    def blob_names(self, container: str):
+        with self._lock:
+            return list(self._containers.get(container, {}))
+
+    def start(self) -> "FakeBlobServer":
+        self._thread = threading.Thread(target=self.serve_forever, name="fake-blob-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "FakeBlobServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
@@ -0,0 +1,172 @@
+"""
+In-process stand-in for the Bing Web Search API.
+This module provides a threaded HTTP server answering ``/v7.0/search`` with synthetic results, injected latency and a per-second quota
+"""
+# %% Libraries
+import sys
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+SEARCH_PATH = "/v7.0/search"
+SUBSCRIPTION_HEADER = "Ocp-Apim-Subscription-Key"
+
+
+def fake_results(query: str, count: int, offset: int) -> List[dict]:
+    """Deterministic web pages for a query, shaped like ``webPages.value`` items."""
+    slug = "-".join(query.lower().split())
+    return [
+        {
+            "id": f"https://api.bing.microsoft.com/api/v7/#WebPages.{offset + i}",
+            "name": f"{query} - result {offset + i + 1}",
+            "url": f"https://example.org/{slug}/{offset + i + 1}",
+            "displayUrl": f"example.org/{slug}/{offset + i + 1}",
+            "snippet": f"Synthetic snippet {offset + i + 1} about {query}.",
+            "language": "en",
+        }
+        for i in range(count)
+    ]
+
+
+# %% Request handler
+class _SearchRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    server: "FakeSearchServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: dict, headers: Optional[Dict[str, str]] = None) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("BingAPIs-TraceId", f"fake-{threading.get_ident()}-{time.perf_counter_ns()}")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status: int, code: str, message: str, headers: Optional[Dict[str, str]] = None) -> None:
+        self._send_json(status, {"_type": "ErrorResponse", "errors": [{"code": code, "message": message}]}, headers)
+
+    def do_GET(self):
+        server = self.server
+        parts = urlsplit(self.path)
+        query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        server.record_request()
+        if parts.path != SEARCH_PATH:
+            self._error(404, "ResourceNotFound", "Unknown path")
+            return
+        if not self.headers.get(SUBSCRIPTION_HEADER):
+            self._error(401, "InvalidAuthorization", "Missing subscription key")
+            return
+        if not server.admit():
+            self._error(429, "RateLimitExceeded", "Too many requests", {"Retry-After": "1"})
+            return
+        server.record_query(query.get("q", ""))
+        if server.latency:
+            time.sleep(server.latency)
+        text = query.get("q", "").strip()
+        if not text:
+            self._error(400, "InvalidRequest", "Parameter q is required")
+            return
+        count = int(query.get("count", "10"))
+        offset = int(query.get("offset", "0"))
+        self._send_json(200, {
+            "_type": "SearchResponse",
+            "queryContext": {"originalQuery": text},
+            "webPages": {
+                "webSearchUrl": f"https://www.bing.com/search?q={text}",
+                "totalEstimatedMatches": 1000,
+                "value": fake_results(text, count, offset),
+            },
+        })
+
+
+# %% Server
+class FakeSearchServer(ThreadingHTTPServer):
+    """
+    Threaded HTTP server answering the subset of the Bing Web Search API used by BingConnection.
+
+    Requests without a subscription key get 401; requests beyond ``quota`` per second get 429
+    with ``Retry-After``. Use as a context manager:
+
+        with FakeSearchServer(latency=0.005, quota=50) as server:
+            config = BingConfig(api_key="key", endpoint=server.url, allow_insecure_http=True)
+    """
+
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0,
+                 quota: Optional[float] = None):
+        """
+        Args:
+            host: Interface to bind
+            port: Port to bind (0 picks a free one)
+            latency: Seconds added to every admitted request
+            quota: Requests admitted per one-second window (None: unlimited)
+        """
+        super().__init__((host, port), _SearchRequestHandler)
+        self.latency = latency
+        self.quota = quota
+        self.request_count = 0
+        self.throttled_count = 0
+        self.queries: List[str] = []
+        self._window_start = time.monotonic()
+        self._window_count = 0
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}{SEARCH_PATH}"
+
+    def admit(self) -> bool:
+        """Count a request against the current one-second window; False when over quota."""
+        with self._lock:
+            now = time.monotonic()
+            if now - self._window_start >= 1.0:
+                self._window_start = now
+                self._window_count = 0
+            if self.quota is not None and self._window_count >= self.quota:
+                self.throttled_count += 1
+                return False
+            self._window_count += 1
+            return True
+
+    def record_request(self) -> None:
+        with self._lock:
+            self.request_count += 1
+
+    def record_query(self, query: str) -> None:
+        with self._lock:
+            self.queries.append(query)
+
+    def handle_error(self, request, client_address) -> None:
+        # Clients may drop connections they no longer need
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+    def start(self) -> "FakeSearchServer":
+        self._thread = threading.Thread(target=self.serve_forever, name="fake-search-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "FakeSearchServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
@@ -0,0 +1,432 @@
+"""
+Instrumentation of the blob read path.
+This module provides spans, counters and histograms with pluggable sinks: an in-process registry, a Prometheus exporter and OpenTelemetry
+"""
+# %% Libraries
+import os
+import time
+import bisect
+import threading
+import contextvars
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Protocol, Sequence, Tuple
+
+# Seconds, from sub-millisecond cache hits to multi-minute downloads
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+
+# %% Spans
+@dataclass
+class Span:
+    """One timed phase, shaped like an OpenTelemetry span."""
+
+    name: str
+    trace_id: int
+    span_id: int
+    parent_id: Optional[int]
+    start_ns: int
+    end_ns: Optional[int] = None
+    attributes: Dict[str, object] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    @property
+    def duration(self) -> float:
+        """Seconds between start and end (0 while the span is open)."""
+        return (self.end_ns - self.start_ns) / 1e9 if self.end_ns is not None else 0.0
+
+    def set_attribute(self, key: str, value) -> None:
+        self.attributes[key] = value
+
+
+class Sink(Protocol):
+    """Receiver of instrumentation events. Sinks must be thread-safe."""
+
+    def on_start(self, span: Span) -> None: ...
+
+    def on_end(self, span: Span) -> None: ...
+
+    def on_count(self, name: str, value: float, labels: Dict[str, str]) -> None: ...
+
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("adls_span", default=None)
+
+
+class _SpanScope:
+    """Context manager that opens a span, makes it current and reports it to the sinks."""
+
+    __slots__ = ("_instrumentation", "_span", "_token")
+
+    def __init__(self, instrumentation: "Instrumentation", name: str, attributes: Dict[str, object]):
+        parent = _current_span.get()
+        self._instrumentation = instrumentation
+        self._span = Span(
+            name=name,
+            trace_id=parent.trace_id if parent is not None else _random_id(128),
+            span_id=_random_id(64),
+            parent_id=parent.span_id if parent is not None else None,
+            start_ns=time.perf_counter_ns(),
+            attributes=attributes,
+        )
+
+    def __enter__(self) -> Span:
+        self._token = _current_span.set(self._span)
+        for sink in self._instrumentation.sinks:
+            sink.on_start(self._span)
+        return self._span
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        self._span.end_ns = time.perf_counter_ns()
+        if exc_type is not None:
+            self._span.error = exc_type.__name__
+        _current_span.reset(self._token)
+        for sink in self._instrumentation.sinks:
+            sink.on_end(self._span)
+
+
+class _NoopSpan:
+    """Shared stand-in returned by disabled instrumentation; every operation does nothing."""
+
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        pass
+
+    def set_attribute(self, key: str, value) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def _random_id(bits: int) -> int:
+    return int.from_bytes(os.urandom(bits // 8), "big") or 1
+
+
+# %% Instrumentation
+class Instrumentation:
+    """
+    Entry point the read path reports to.
+
+    Without sinks it is disabled: ``span`` returns a shared no-op context manager and ``count``
+    returns immediately, so the instrumented code pays one method call per phase.
+    """
+
+    def __init__(self, sinks: Sequence[Sink] = ()):
+        """
+        Args:
+            sinks: Receivers of spans and counters
+        """
+        self.sinks: Tuple[Sink, ...] = tuple(sinks)
+        self.enabled = bool(self.sinks)
+
+    def span(self, name: str, **attributes):
+        """Time a phase; nested spans become children of the enclosing one."""
+        if not self.enabled:
+            return _NOOP_SPAN
+        return _SpanScope(self, name, attributes)
+
+    def count(self, name: str, value: float = 1, **labels: str) -> None:
+        """Add ``value`` to a counter."""
+        if not self.enabled:
+            return
+        for sink in self.sinks:
+            sink.on_count(name, value, labels)
+
+
+_instrumentation = Instrumentation()
+
+
+def get_instrumentation() -> Instrumentation:
+    """Process-wide instrumentation used by connections that were not given their own."""
+    return _instrumentation
+
+
+def set_instrumentation(instrumentation: Optional[Instrumentation]) -> None:
+    """
+    Replace the process-wide instrumentation (None disables it).
+
+    Credential timing only covers clients created after instrumentation is enabled, so call
+    this before opening the first connection.
+    """
+    global _instrumentation
+    _instrumentation = instrumentation if instrumentation is not None else Instrumentation()
+
+
+# %% In-process metrics
+class Histogram:
+    """Cumulative-bucket histogram of observed values."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[float, int]]:
+        """(upper bound, observations at or below it) per bucket, ending with +Inf."""
+        total = 0
+        result = []
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the ``q`` quantile (``q`` in [0, 1])."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        for bound, total in self.cumulative():
+            if total >= rank:
+                return bound
+        return float("inf")
+
+
+LabelKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+def _key(name: str, labels: Dict[str, str]) -> LabelKey:
+    return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+class MetricsRegistry:
+    """
+    In-process sink aggregating counters and per-phase latency histograms.
+
+    Every finished span is observed in the ``adls_phase_seconds`` histogram, labelled by phase
+    and by outcome (``ok`` or the exception type).
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._counters: Dict[LabelKey, float] = {}
+        self._histograms: Dict[LabelKey, Histogram] = {}
+
+    def on_start(self, span: Span) -> None:
+        pass
+
+    def on_end(self, span: Span) -> None:
+        key = _key("adls_phase_seconds", {"phase": span.name, "outcome": span.error or "ok"})
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(span.duration)
+
+    def on_count(self, name: str, value: float, labels: Dict[str, str]) -> None:
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def counter(self, name: str, **labels: str) -> float:
+        """Current value of a counter (0 if never incremented)."""
+        with self._lock:
+            return self._counters.get(_key(name, labels), 0)
+
+    def histogram(self, phase: str, outcome: str = "ok") -> Optional[Histogram]:
+        """Latency histogram of a phase."""
+        with self._lock:
+            return self._histograms.get(_key("adls_phase_seconds", {"phase": phase, "outcome": outcome}))
+
+    def snapshot(self) -> Tuple[Dict[LabelKey, float], Dict[LabelKey, Histogram]]:
+        """Copies of every counter and histogram, keyed by (name, labels)."""
+        with self._lock:
+            histograms = {}
+            for key, histogram in self._histograms.items():
+                copy = Histogram(histogram.buckets)
+                copy.counts, copy.sum, copy.count = list(histogram.counts), histogram.sum, histogram.count
+                histograms[key] = copy
+            return dict(self._counters), histograms
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+# %% Prometheus
+def _labels_text(labels: Tuple[Tuple[str, str], ...], extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class PrometheusExporter:
+    """Renders a MetricsRegistry in the Prometheus text exposition format."""
+
+    def __init__(self, registry: MetricsRegistry):
+        self.registry = registry
+        self._server = None
+
+    def render(self) -> str:
+        counters, histograms = self.registry.snapshot()
+        lines = []
+        for name in sorted({name for name, _ in counters}):
+            lines.append(f"# TYPE {name} counter")
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{_labels_text(labels)} {_number(value)}")
+        for name in sorted({name for name, _ in histograms}):
+            lines.append(f"# TYPE {name} histogram")
+            for (metric, labels), histogram in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                for bound, total in histogram.cumulative():
+                    lines.append(f"{name}_bucket{_labels_text(labels, (('le', _number(bound)),))} {total}")
+                lines.append(f"{name}_sum{_labels_text(labels)} {_number(histogram.sum)}")
+                lines.append(f"{name}_count{_labels_text(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int = 9464, host: str = "127.0.0.1") -> int:
+        """
+        Serve ``/metrics`` from a background thread and return the bound port.
+
+        Only local scrapers can reach it by default; pass ``host="0.0.0.0"`` to listen on every interface.
+        """
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = exporter.render().encode("utf-8")
+                self.send_response(200 if self.path.split("?")[0] == "/metrics" else 404)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name="prometheus-exporter", daemon=True).start()
+        return self._server.server_address[1]
+
+    def close(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+# %% Spans sinks
+class SpanRecorder:
+    """In-process sink keeping the most recent finished spans, for tests and debugging."""
+
+    def __init__(self, max_spans: int = 1000):
+        self._lock = threading.Lock()
+        self._spans = deque(maxlen=max_spans)
+
+    def on_start(self, span: Span) -> None:
+        pass
+
+    def on_end(self, span: Span) -> None:
+        with self._lock:
+            self._spans.append(span)
+
+    def on_count(self, name: str, value: float, labels: Dict[str, str]) -> None:
+        pass
+
+    @property
+    def spans(self) -> List[Span]:
+        with self._lock:
+            return list(self._spans)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._spans.clear()
+
+
+class OpenTelemetrySink:
+    """
+    Sink forwarding spans to an OpenTelemetry tracer (requires ``opentelemetry-api``).
+
+    Span start and end times are taken from the wall clock when the phase starts and ends,
+    and parent/child links follow the nesting of the instrumented phases.
+    """
+
+    def __init__(self, tracer=None):
+        """
+        Args:
+            tracer: OpenTelemetry tracer (defaults to ``trace.get_tracer("adls-connection")``)
+        """
+        try:
+            from opentelemetry import trace
+        except ImportError as e:
+            raise ImportError("OpenTelemetry export requires opentelemetry-api: pip install opentelemetry-api") from e
+        self._trace = trace
+        self.tracer = tracer or trace.get_tracer("adls-connection")
+        self._lock = threading.Lock()
+        self._open: Dict[int, object] = {}
+
+    def on_start(self, span: Span) -> None:
+        with self._lock:
+            parent = self._open.get(span.parent_id) if span.parent_id is not None else None
+        context = self._trace.set_span_in_context(parent) if parent is not None else None
+        otel_span = self.tracer.start_span(
+            span.name, context=context, attributes=dict(span.attributes), start_time=time.time_ns()
+        )
+        with self._lock:
+            self._open[span.span_id] = otel_span
+
+    def on_end(self, span: Span) -> None:
+        with self._lock:
+            otel_span = self._open.pop(span.span_id, None)
+        if otel_span is None:
+            return
+        for key, value in span.attributes.items():
+            otel_span.set_attribute(key, value)
+        if span.error is not None:
+            otel_span.set_status(self._trace.Status(self._trace.StatusCode.ERROR, span.error))
+        otel_span.end(end_time=time.time_ns())
+
+    def on_count(self, name: str, value: float, labels: Dict[str, str]) -> None:
+        pass
+
+
+# %% Credentials
+class TimedCredential:
+    """Token credential wrapper that times token acquisition as a ``credential`` span."""
+
+    def __init__(self, credential):
+        self._credential = credential
+        if hasattr(credential, "get_token_info"):
+            self.get_token_info = self._get_token_info
+
+    def get_token(self, *scopes, **kwargs):
+        with get_instrumentation().span("credential"):
+            return self._credential.get_token(*scopes, **kwargs)
+
+    def _get_token_info(self, *scopes, **kwargs):
+        with get_instrumentation().span("credential"):
+            return self._credential.get_token_info(*scopes, **kwargs)
+
+    def close(self) -> None:
+        self._credential.close()
+
+    def __enter__(self) -> "TimedCredential":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,254 @@
+"""
+Local manifest of the documents stored under ``quant/`` in an ADLS container.
+This module provides a SQLite-backed index of blob names, extensions, sizes, ETags and modification times
+"""
+# %% Libraries
+import sys
+import sqlite3
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+PREFIX = "quant/"
+DEFAULT_EXTENSIONS: Tuple[str, ...] = ("pdf", "json", "txt")
+
+
+# %% Entries
+@dataclass(frozen=True)
+class ManifestEntry:
+    """Metadata of one document in the container."""
+
+    name: str
+    extension: str
+    size: int
+    etag: Optional[str]
+    last_modified: datetime
+
+    @property
+    def blob_name(self) -> str:
+        return f"{PREFIX}{self.name}.{self.extension}"
+
+
+@dataclass(frozen=True)
+class RefreshResult:
+    """Changes applied to the manifest by one refresh."""
+
+    added: int = 0
+    updated: int = 0
+    removed: int = 0
+    unchanged: int = 0
+
+
+def split_blob_name(blob_name: str) -> Optional[Tuple[str, str]]:
+    """
+    Split ``quant/{name}.{ext}`` into (name, ext).
+
+    Returns:
+        Optional[Tuple[str, str]]: None for blobs outside the prefix or without an extension
+    """
+    if not blob_name.startswith(PREFIX):
+        return None
+    stem, dot, extension = blob_name[len(PREFIX):].rpartition(".")
+    if not dot or not stem or not extension or "/" in extension:
+        return None
+    return stem, extension
+
+
+def _prefix_end(prefix: str) -> Optional[str]:
+    """Smallest string sorting after every name that starts with ``prefix`` (None if unbounded)."""
+    stripped = prefix.rstrip(chr(sys.maxunicode))
+    if not stripped:
+        return None
+    following = ord(stripped[-1]) + 1
+    if 0xD800 <= following <= 0xDFFF:
+        # Surrogates cannot be stored as UTF-8 text
+        following = 0xE000
+    return stripped[:-1] + chr(following)
+
+
+def _timestamp(value: Optional[datetime]) -> float:
+    if value is None:
+        return 0.0
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+# %% Manifest
+class BlobManifest:
+    """
+    Compact SQLite index of the ``quant/`` prefix.
+
+    The manifest is filled from one container listing and refreshed incrementally: only rows
+    whose ETag or size changed are rewritten and rows for deleted blobs are removed. Once
+    attached to an ADLSConnection, it resolves extensions and rejects unknown documents
+    without a network round trip, so refresh it whenever new papers are uploaded.
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        """
+        Open (or create) the manifest.
+
+        Args:
+            path: SQLite database file, or ``:memory:`` for a process-local manifest
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS blobs ("
+                " name TEXT NOT NULL,"
+                " extension TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " etag TEXT,"
+                " last_modified REAL NOT NULL,"
+                " PRIMARY KEY (name, extension)"
+                ") WITHOUT ROWID"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS blobs_modified ON blobs (last_modified)")
+            self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    def refresh(self, connection) -> RefreshResult:
+        """
+        Synchronise the manifest with the container listing.
+
+        Args:
+            connection: ADLSConnection whose ``list_blobs()`` provides the listing
+
+        Returns:
+            RefreshResult: Counts of added, updated, removed and unchanged documents
+        """
+        return self.apply_listing(connection.list_blobs())
+
+    def apply_listing(self, blobs: Iterable) -> RefreshResult:
+        """
+        Synchronise the manifest with a full listing of blob properties.
+
+        Args:
+            blobs: Objects with ``name``, ``size``, ``etag`` and ``last_modified`` attributes
+
+        Returns:
+            RefreshResult: Counts of added, updated, removed and unchanged documents
+        """
+        added = updated = unchanged = 0
+        with self._lock, self._db:
+            known = {
+                (name, extension): (size, etag)
+                for name, extension, size, etag in self._db.execute(
+                    "SELECT name, extension, size, etag FROM blobs"
+                )
+            }
+            seen = set()
+            for blob in blobs:
+                parts = split_blob_name(blob.name)
+                if parts is None:
+                    continue
+                seen.add(parts)
+                previous = known.get(parts)
+                if previous == (blob.size, blob.etag):
+                    unchanged += 1
+                    continue
+                if previous is None:
+                    added += 1
+                else:
+                    updated += 1
+                self._db.execute(
+                    "INSERT OR REPLACE INTO blobs (name, extension, size, etag, last_modified)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (parts[0], parts[1], blob.size, blob.etag, _timestamp(blob.last_modified)),
+                )
+            removed = [key for key in known if key not in seen]
+            self._db.executemany("DELETE FROM blobs WHERE name = ? AND extension = ?", removed)
+            self._db.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('refreshed_at', ?)",
+                (str(datetime.now(timezone.utc).timestamp()),),
+            )
+        return RefreshResult(added=added, updated=updated, removed=len(removed), unchanged=unchanged)
+
+    def _query(self, sql: str, params: Sequence = ()) -> List[ManifestEntry]:
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        return [
+            ManifestEntry(
+                name=name,
+                extension=extension,
+                size=size,
+                etag=etag,
+                last_modified=datetime.fromtimestamp(last_modified, tz=timezone.utc),
+            )
+            for name, extension, size, etag, last_modified in rows
+        ]
+
+    def lookup(self, name: str, extension: str) -> Optional[ManifestEntry]:
+        """Entry of one document, or None if it is not in the container."""
+        entries = self._query(
+            "SELECT name, extension, size, etag, last_modified FROM blobs WHERE name = ? AND extension = ?",
+            (name, extension),
+        )
+        return entries[0] if entries else None
+
+    def extensions(self, name: str) -> List[str]:
+        """Extensions available for a document name."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT extension FROM blobs WHERE name = ? ORDER BY extension", (name,)
+            ).fetchall()
+        return [extension for (extension,) in rows]
+
+    def resolve_extension(self, name: str, preferred: Sequence[str] = DEFAULT_EXTENSIONS) -> Optional[str]:
+        """
+        Pick the extension to read a document with.
+
+        Args:
+            name: Document name without extension
+            preferred: Extensions in order of preference; others are used only if none match
+
+        Returns:
+            Optional[str]: Chosen extension, or None if the document does not exist
+        """
+        available = self.extensions(name)
+        for extension in preferred:
+            if extension in available:
+                return extension
+        return available[0] if available else None
+
+    def with_prefix(self, prefix: str) -> List[ManifestEntry]:
+        """Documents whose name starts with ``prefix`` (case-sensitive, like blob names)."""
+        # A range on the primary key: LIKE would also match names differing in ASCII case
+        end = _prefix_end(prefix)
+        if end is None:
+            return self._query(
+                "SELECT name, extension, size, etag, last_modified FROM blobs"
+                " WHERE name >= ? ORDER BY name, extension",
+                (prefix,),
+            )
+        return self._query(
+            "SELECT name, extension, size, etag, last_modified FROM blobs"
+            " WHERE name >= ? AND name < ? ORDER BY name, extension",
+            (prefix, end),
+        )
+
+    def modified_since(self, since: datetime) -> List[ManifestEntry]:
+        """Documents modified at or after ``since`` (naive datetimes are taken as UTC)."""
+        return self._query(
+            "SELECT name, extension, size, etag, last_modified FROM blobs"
+            " WHERE last_modified >= ? ORDER BY last_modified",
+            (_timestamp(since),),
+        )
+
+    @property
+    def refreshed_at(self) -> Optional[datetime]:
+        """Time of the last refresh, or None if the manifest was never filled."""
+        with self._lock:
+            row = self._db.execute("SELECT value FROM meta WHERE key = 'refreshed_at'").fetchone()
+        return datetime.fromtimestamp(float(row[0]), tz=timezone.utc) if row else None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM blobs").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
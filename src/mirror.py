@@ -0,0 +1,274 @@
+"""
+Incremental mirror of an ADLS container prefix on local disk.
+This module downloads new or changed blobs in parallel, checkpoints progress in SQLite and optionally prunes deleted blobs
+
+Usage:
+    python src/mirror.py /data/quant-corpus --prefix quant/ --prune
+
+The mirrored directory can be read back with ``ADLSConfig(backend="local", local_root=...)``.
+"""
+# %% Libraries
+import os
+import sys
+import glob
+import time
+import hashlib
+import logging
+import sqlite3
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence, Tuple
+
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceModifiedError
+
+from module_loader import load_module
+from storage_backends import LocalBackend
+
+STATE_FILENAME = ".mirror.sqlite"
+
+
+# %% Results
+@dataclass(frozen=True)
+class SyncResult:
+    """Work done by one mirror sync."""
+
+    downloaded: int = 0
+    skipped: int = 0
+    pruned: int = 0
+    failed: int = 0
+    bytes_downloaded: int = 0
+
+
+def _timestamp(value) -> Optional[float]:
+    return value.timestamp() if hasattr(value, "timestamp") else None
+
+
+# %% Mirror
+class ContainerMirror:
+    """
+    Local copy of the blobs under a prefix, kept in sync with the container.
+
+    The blob ``quant/paper.pdf`` is stored as ``<root>/quant/paper.pdf``. A SQLite checkpoint in
+    the root records the ETag and size of every file that finished downloading, so a sync only
+    transfers blobs that are new or whose ETag or size changed. Each download is written to a
+    hidden ``.part`` file named after the blob's ETag and renamed into place once complete; an
+    interrupted sync therefore leaves no torn files, and the next sync continues partial
+    downloads from where they stopped as long as the blob has not changed.
+    """
+
+    def __init__(
+        self,
+        connection,
+        root: str,
+        max_workers: Optional[int] = None,
+        state_path: Optional[str] = None,
+    ):
+        """
+        Open (or create) the mirror.
+
+        Args:
+            connection: ADLSConnection of the container to mirror
+            root: Local directory holding the copy
+            max_workers: Parallel downloads (defaults to ``config.max_workers``)
+            state_path: Checkpoint database (defaults to ``<root>/.mirror.sqlite``)
+        """
+        self.connection = connection
+        self.root = os.path.abspath(root)
+        self.max_workers = max_workers or connection.config.max_workers
+        self._local = LocalBackend(self.root)
+        os.makedirs(self.root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(state_path or os.path.join(self.root, STATE_FILENAME), check_same_thread=False)
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                " name TEXT PRIMARY KEY,"
+                " etag TEXT,"
+                " size INTEGER NOT NULL,"
+                " synced_at REAL NOT NULL"
+                ") WITHOUT ROWID"
+            )
+
+    def path(self, blob_name: str) -> str:
+        """Local file of a blob."""
+        return self._local.path(blob_name)
+
+    def synced(self) -> Dict[str, Tuple[Optional[str], int]]:
+        """(ETag, size) of every mirrored blob, by blob name."""
+        with self._lock:
+            return {name: (etag, size) for name, etag, size in self._db.execute("SELECT name, etag, size FROM files")}
+
+    def sync(self, prefix: str = "quant/", prune: bool = False) -> SyncResult:
+        """
+        Download every blob under ``prefix`` that is missing locally or changed remotely.
+
+        Args:
+            prefix: Blob name prefix to mirror
+            prune: Also delete local files whose blobs no longer exist in the container
+
+        Returns:
+            SyncResult: Counts of downloaded, skipped, pruned and failed blobs
+        """
+        listing = list(self.connection.list_blobs(prefix))
+        synced = self.synced()
+        pending = []
+        skipped = 0
+        for blob in listing:
+            if synced.get(blob.name) == (blob.etag, blob.size) and self._present(blob.name, blob.size):
+                skipped += 1
+            else:
+                pending.append(blob)
+
+        downloaded = failed = transferred = 0
+        if pending:
+            executor = ThreadPoolExecutor(
+                max_workers=min(self.max_workers, len(pending)),
+                thread_name_prefix="adls-mirror",
+            )
+            try:
+                futures = {executor.submit(self._download, blob): blob for blob in pending}
+                for future in as_completed(futures):
+                    blob = futures[future]
+                    try:
+                        transferred += future.result()
+                    except Exception as e:
+                        logging.warning(f"Error mirroring {blob.name}: {e}")
+                        failed += 1
+                        continue
+                    # Checkpoint every finished file so an interrupted sync resumes after it
+                    with self._lock, self._db:
+                        self._db.execute(
+                            "INSERT OR REPLACE INTO files (name, etag, size, synced_at) VALUES (?, ?, ?, ?)",
+                            (blob.name, blob.etag, blob.size, time.time()),
+                        )
+                    downloaded += 1
+            finally:
+                executor.shutdown(wait=True, cancel_futures=True)
+
+        pruned = self._prune(prefix, {blob.name for blob in listing}) if prune else 0
+        logging.info(
+            f"Mirror of {prefix} in {self.root}: {downloaded} downloaded, {skipped} unchanged, "
+            f"{pruned} pruned, {failed} failed"
+        )
+        return SyncResult(downloaded, skipped, pruned, failed, transferred)
+
+    def _present(self, blob_name: str, size: int) -> bool:
+        try:
+            return os.path.getsize(self.path(blob_name)) == size
+        except OSError:
+            return False
+
+    def _part_path(self, path: str, etag: Optional[str]) -> str:
+        version = hashlib.sha1((etag or "").encode("utf-8")).hexdigest()[:16]
+        directory, filename = os.path.split(path)
+        return os.path.join(directory, f".{filename}.{version}.part")
+
+    def _download(self, blob) -> int:
+        """Download one blob into place, resuming its partial file; returns the bytes transferred."""
+        path = self.path(blob.name)
+        part = self._part_path(path, blob.etag)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        offset = os.path.getsize(part) if os.path.exists(part) else 0
+        if offset > blob.size:
+            os.remove(part)
+            offset = 0
+
+        if offset < blob.size:
+            # Pin every request to the listed version so a resumed file never mixes versions
+            conditions = {}
+            if blob.etag:
+                conditions = {"etag": blob.etag, "match_condition": MatchConditions.IfNotModified}
+
+            def download(endpoint, options: dict, slot) -> None:
+                # The endpoint's slot is held until the body is on disk
+                with slot(), open(part, "ab") as out:
+                    # A replica tried after a throttled one starts over from the resume point
+                    out.truncate(offset)
+                    downloader = self.connection._blob_client_at(endpoint, blob.name).download_blob(
+                        offset=offset or None,
+                        max_concurrency=self.connection.config.download_concurrency,
+                        **conditions,
+                        **options
+                    )
+                    for chunk in downloader.chunks():
+                        out.write(chunk)
+                    out.flush()
+                    os.fsync(out.fileno())
+
+            try:
+                # ETags differ between accounts, so a pinned download stays on the replica the listing used
+                self.connection._on_replicas(
+                    self.connection._replicas(blob.name), download, {}, self.connection.instrumentation,
+                    failover=not blob.etag,
+                )
+            except ResourceModifiedError:
+                os.remove(part)
+                raise
+        else:
+            open(part, "ab").close()
+
+        if os.path.getsize(part) != blob.size:
+            raise IOError(f"Incomplete download of {blob.name}: {os.path.getsize(part)} of {blob.size} bytes")
+        os.replace(part, path)
+        modified = _timestamp(blob.last_modified)
+        if modified is not None:
+            os.utime(path, (modified, modified))
+        # Drop partial files left by earlier versions of the blob
+        directory, filename = os.path.split(path)
+        for stale in glob.glob(os.path.join(glob.escape(directory), f".{glob.escape(filename)}.*.part")):
+            os.remove(stale)
+        return blob.size - offset
+
+    def _prune(self, prefix: str, remote: set) -> int:
+        """Delete mirrored files under ``prefix`` whose blobs are gone. Files the mirror did not write are kept."""
+        pruned = 0
+        for name in self.synced():
+            if not name.startswith(prefix) or name in remote:
+                continue
+            try:
+                os.remove(self.path(name))
+            except FileNotFoundError:
+                pass
+            with self._lock, self._db:
+                self._db.execute("DELETE FROM files WHERE name = ?", (name,))
+            pruned += 1
+        return pruned
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self) -> "ContainerMirror":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+# %% Command line
+def _connection_from_env():
+    """ADLSConnection configured from the environment (``adls-connection.py`` has a dashed name)."""
+    return load_module("adls_connection", "adls-connection.py").ADLSConnection()
+
+
+def main(argv: Optional[Sequence[str]] = None) -> SyncResult:
+    parser = argparse.ArgumentParser(description="Mirror a container prefix to local disk")
+    parser.add_argument("root", help="Local directory holding the mirror")
+    parser.add_argument("--prefix", default="quant/", help="Blob name prefix to mirror")
+    parser.add_argument("--prune", action="store_true", help="Delete local copies of removed blobs")
+    parser.add_argument("--workers", type=int, default=None, help="Parallel downloads")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    with ContainerMirror(_connection_from_env(), args.root, max_workers=args.workers) as mirror:
+        result = mirror.sync(args.prefix, prune=args.prune)
+    if result.failed:
+        sys.exit(1)
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+"""
+Import of sibling modules whose dashed file names rule out a plain import.
+This module loads files such as ``adls-connection.py`` once and registers them in ``sys.modules`` under an importable name
+"""
+# %% Libraries
+import os
+import sys
+import importlib.util
+from types import ModuleType
+
+
+def load_module(name: str, filename: str) -> ModuleType:
+    """
+    Import a module of this directory under ``name``, reusing it if it was already loaded.
+
+    Args:
+        name: Name the module is registered under, e.g. ``adls_connection``
+        filename: File name next to this module, e.g. ``adls-connection.py``
+
+    Returns:
+        ModuleType: The loaded module
+    """
+    module = sys.modules.get(name)
+    if module is None:
+        spec = importlib.util.spec_from_file_location(name, os.path.join(os.path.dirname(__file__), filename))
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,392 @@
+"""
+PDF text extraction stage on top of the ADLS blob reader.
+This module provides a page-parallel extractor whose output is memoized per blob ETag, and partial reads of selected pages over range requests
+"""
+# %% Libraries
+import os
+import json
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from single_flight import SingleFlight
+
+# Page attributes a /Page takes from its /Pages ancestors when it does not set them itself
+_INHERITABLE_ATTRIBUTES = ("/Resources", "/MediaBox", "/CropBox", "/Rotate")
+
+
+def _pypdf():
+    """Import pypdf, which is only required by this stage."""
+    try:
+        import pypdf
+        import pypdf.errors
+    except ImportError as e:
+        raise ImportError("pypdf is required for PDF extraction (pip install pypdf)") from e
+    return pypdf
+
+
+def _pdf_reader(source, strict: bool = False):
+    """Open a PDF with pypdf."""
+    return _pypdf().PdfReader(source, strict=strict)
+
+
+def _extract_pages(path: str, start: int, stop: int) -> List[Tuple[int, str]]:
+    """Extract the text of pages ``[start, stop)`` of a local PDF (runs in worker processes)."""
+    reader = _pdf_reader(path)
+    return [(number, reader.pages[number].extract_text() or "") for number in range(start, stop)]
+
+
+def _find_pages(reader, numbers: List[int]) -> Dict[int, object]:
+    """
+    Resolve the pages ``numbers`` (sorted, zero-based) by walking the page tree.
+
+    Unlike ``reader.pages``, which loads every page object, subtrees without a requested page
+    are skipped by their /Count and the walk stops after the last requested page, so a partial
+    read only touches the tree nodes on the way to the pages it needs.
+    """
+    pypdf = _pypdf()
+    wanted = set(numbers)
+    found: Dict[int, object] = {}
+    visited = set()
+
+    def add_page(number: int, reference, kid, inherited: dict) -> None:
+        page = pypdf.PageObject(reader, reference if isinstance(reference, pypdf.generic.IndirectObject) else None)
+        page.update(kid)
+        for key, value in inherited.items():
+            if key not in page:
+                page[key] = value
+        found[number] = page
+
+    def walk(node, first: int, inherited: dict) -> None:
+        inherited = dict(inherited)
+        inherited.update((pypdf.generic.NameObject(key), node[key]) for key in _INHERITABLE_ATTRIBUTES if key in node)
+        kids = node.get("/Kids", ())
+        if node.get("/Count") == len(kids):
+            # Every kid should be a page, so the requested ones are picked by index without reading the rest
+            picked = {number: kids[number - first] for number in numbers if first <= number < first + len(kids)}
+            resolved = {number: reference.get_object() for number, reference in picked.items()}
+            if not any("/Kids" in kid for kid in resolved.values()):
+                for number, kid in resolved.items():
+                    add_page(number, picked[number], kid, inherited)
+                return
+        for reference in kids:
+            if first > numbers[-1]:
+                return
+            if isinstance(reference, pypdf.generic.IndirectObject):
+                if reference.idnum in visited:
+                    continue
+                visited.add(reference.idnum)
+            kid = reference.get_object()
+            if "/Kids" in kid:
+                count = int(kid.get("/Count", 0))
+                if any(first <= number < first + count for number in numbers):
+                    walk(kid, first, inherited)
+                first += count
+            else:
+                if first in wanted:
+                    add_page(first, reference, kid, inherited)
+                first += 1
+
+    if numbers:
+        walk(reader.trailer["/Root"]["/Pages"], 0, {})
+    return found
+
+
+def _title(reader) -> Optional[str]:
+    """Title of a PDF from its document information dictionary."""
+    metadata = reader.metadata
+    return str(metadata.title) if metadata is not None and metadata.title else None
+
+
+def _read_partial(source, numbers: List[int]) -> Tuple[int, Optional[str], List[Tuple[int, str]]]:
+    """Page count, title and the text of pages ``numbers`` of a PDF, read lazily from ``source``."""
+    try:
+        return _read_partial_with(source, numbers, strict=True)
+    except _pypdf().errors.PdfReadError:
+        # Lenient mode checks every object header on open, which reads most of the file
+        return _read_partial_with(source, numbers, strict=False)
+
+
+def _read_partial_with(source, numbers: List[int], strict: bool) -> Tuple[int, Optional[str], List[Tuple[int, str]]]:
+    reader = _pdf_reader(source, strict=strict)
+    page_count = int(reader.trailer["/Root"]["/Pages"].get("/Count", 0))
+    pages = _find_pages(reader, [number for number in numbers if number < page_count])
+    return page_count, _title(reader), [(number, pages[number].extract_text() or "") for number in sorted(pages)]
+
+
+# %% Results
+@dataclass(frozen=True)
+class PageText:
+    """Text of one page (``number`` is zero-based)."""
+
+    number: int
+    text: str
+
+
+@dataclass
+class ExtractedDocument:
+    """Per-page text of one version of a PDF."""
+
+    name: str
+    etag: Optional[str]
+    pages: List[PageText] = field(default_factory=list)
+    page_count: Optional[int] = None
+    title: Optional[str] = None
+
+    @property
+    def text(self) -> str:
+        return "\n".join(page.text for page in self.pages)
+
+    @property
+    def is_partial(self) -> bool:
+        """Whether only some of the document's pages were extracted."""
+        return self.page_count is not None and len(self.pages) < self.page_count
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "etag": self.etag,
+            "pages": [[page.number, page.text] for page in self.pages],
+            "page_count": self.page_count,
+            "title": self.title,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ExtractedDocument":
+        return cls(
+            name=data["name"],
+            etag=data.get("etag"),
+            pages=[PageText(number, text) for number, text in data["pages"]],
+            page_count=data.get("page_count"),
+            title=data.get("title"),
+        )
+
+
+# %% Extractor
+class PdfTextExtractor:
+    """
+    Extracts per-page text from PDFs stored under ``quant/``.
+
+    Pages are split into ranges and parsed on a process pool, so large papers use every core.
+    Results are memoized by (blob name, ETag) in memory and, when ``cache_dir`` is set, on disk,
+    so each version of a paper is parsed once no matter how many sessions ask for it.
+    ``extract_pages`` and ``skim`` read only selected pages through small range requests.
+    """
+
+    def __init__(
+        self,
+        connection,
+        cache_dir: Optional[str] = None,
+        max_workers: Optional[int] = None,
+        pages_per_task: int = 8,
+        memory_entries: int = 128,
+        range_block_size: int = 64 * 1024,
+        range_blocks: int = 64,
+    ):
+        """
+        Initialize the extractor.
+
+        Args:
+            connection: ADLSConnection used to read the PDFs
+            cache_dir: Directory for the persistent extraction cache (memory only when omitted)
+            max_workers: Size of the process pool (defaults to the CPU count)
+            pages_per_task: Pages parsed per worker task; shorter documents are parsed in-process
+            memory_entries: Number of documents kept in the in-memory memo
+            range_block_size: Bytes per range request of partial reads
+            range_blocks: Blocks a partial read keeps in memory
+        """
+        if pages_per_task < 1:
+            raise ValueError("pages_per_task must be at least 1")
+        if range_block_size < 1 or range_blocks < 1:
+            raise ValueError("range_block_size and range_blocks must be at least 1")
+        self.connection = connection
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.pages_per_task = pages_per_task
+        self.memory_entries = memory_entries
+        self.range_block_size = range_block_size
+        self.range_blocks = range_blocks
+        self._memo: "OrderedDict[Tuple[str, Optional[str]], ExtractedDocument]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._flights = SingleFlight()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def extract(self, name: str) -> ExtractedDocument:
+        """
+        Extract the text of ``quant/{name}.pdf``.
+
+        Args:
+            name: Name of the paper without extension
+
+        Returns:
+            ExtractedDocument: Per-page text, from the memo when this version was parsed before
+        """
+        etag = self.connection.get_blob_properties(name, "pdf").etag
+        document = self._memo_get(name, etag)
+        if document is not None:
+            return document
+        # Concurrent requests for the same version wait for one download and parse
+        document, _ = self._flights.do((name, etag), lambda: self._extract_version(name, etag))
+        return document
+
+    def _extract_version(self, name: str, etag: Optional[str]) -> ExtractedDocument:
+        # A flight that just finished may have memoized this version
+        document = self._memo_get(name, etag)
+        if document is not None:
+            return document
+        with tempfile.TemporaryDirectory(prefix="pdf-extract-") as workdir:
+            path = os.path.join(workdir, "document.pdf")
+            with self.connection.open_blob(name, "pdf") as reader, open(path, "wb") as local_file:
+                shutil.copyfileobj(reader, local_file, reader.chunk_size)
+                etag = reader.etag or etag
+            pages, title = self._extract_file(path)
+            document = ExtractedDocument(name=name, etag=etag, pages=pages, page_count=len(pages), title=title)
+
+        self._memo_put(document)
+        return document
+
+    def extract_pages(self, name: str, pages: Iterable[int]) -> ExtractedDocument:
+        """
+        Extract the text of some pages of ``quant/{name}.pdf`` without downloading the rest.
+
+        The blob is read through cached range requests of ``range_block_size`` bytes: the header,
+        the trailer and cross-reference table at the end, the page tree nodes leading to the
+        requested pages and the objects those pages use. Files pypdf can only open in its lenient
+        mode are still read, at the cost of fetching most of the file.
+
+        Args:
+            name: Name of the paper without extension
+            pages: Zero-based page numbers; pages past the end are ignored
+
+        Returns:
+            ExtractedDocument: Text of the requested pages, with ``page_count`` and ``title`` set.
+                Served from the memo when the whole version was extracted before
+        """
+        numbers = sorted(set(pages))
+        if numbers and numbers[0] < 0:
+            raise ValueError("page numbers must not be negative")
+        with self.connection.open_blob(
+            name, "pdf", chunk_size=self.range_block_size, max_windows=self.range_blocks
+        ) as reader:
+            document = self._memo_get(name, reader.etag)
+            if document is not None:
+                wanted = set(numbers)
+                return ExtractedDocument(
+                    name=name,
+                    etag=document.etag,
+                    pages=[page for page in document.pages if page.number in wanted],
+                    page_count=len(document.pages),
+                    title=document.title,
+                )
+            page_count, title, texts = _read_partial(reader, numbers)
+            etag = reader.etag
+        return ExtractedDocument(
+            name=name,
+            etag=etag,
+            pages=[PageText(number, text) for number, text in texts],
+            page_count=page_count,
+            title=title,
+        )
+
+    def skim(self, name: str, max_pages: int = 1) -> ExtractedDocument:
+        """
+        Extract the title and first ``max_pages`` pages of a paper, usually enough for its abstract.
+
+        Args:
+            name: Name of the paper without extension
+            max_pages: Number of leading pages to extract
+
+        Returns:
+            ExtractedDocument: See ``extract_pages``
+        """
+        return self.extract_pages(name, range(max_pages))
+
+    def _extract_file(self, path: str) -> Tuple[List[PageText], Optional[str]]:
+        """Text of every page of a local PDF, and its title."""
+        reader = _pdf_reader(path)
+        page_count = len(reader.pages)
+        ranges = [
+            (start, min(start + self.pages_per_task, page_count))
+            for start in range(0, page_count, self.pages_per_task)
+        ]
+        if len(ranges) <= 1 or self.max_workers == 1:
+            results = [_extract_pages(path, start, stop) for start, stop in ranges]
+        else:
+            pool = self._get_pool()
+            futures = [pool.submit(_extract_pages, path, start, stop) for start, stop in ranges]
+            results = [future.result() for future in futures]
+        return [PageText(number, text) for chunk in results for number, text in chunk], _title(reader)
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # spawn avoids forking a process that holds SDK threads and locks
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._pool
+
+    def _cache_path(self, name: str, etag: Optional[str]) -> Optional[str]:
+        if not self.cache_dir or not etag:
+            return None
+        digest = hashlib.sha256(f"{name}\0{etag}".encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.json")
+
+    def _memo_get(self, name: str, etag: Optional[str]) -> Optional[ExtractedDocument]:
+        key = (name, etag)
+        with self._lock:
+            document = self._memo.get(key)
+            if document is not None:
+                self._memo.move_to_end(key)
+                return document
+        path = self._cache_path(name, etag)
+        if path is None:
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as cache_file:
+                document = ExtractedDocument.from_dict(json.load(cache_file))
+        except (OSError, ValueError, KeyError):
+            return None
+        self._memo_put(document, persist=False)
+        return document
+
+    def _memo_put(self, document: ExtractedDocument, persist: bool = True) -> None:
+        if document.etag is None:
+            return
+        with self._lock:
+            self._memo[(document.name, document.etag)] = document
+            self._memo.move_to_end((document.name, document.etag))
+            while len(self._memo) > self.memory_entries:
+                self._memo.popitem(last=False)
+        path = self._cache_path(document.name, document.etag)
+        if persist and path is not None:
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as cache_file:
+                    json.dump(document.to_dict(), cache_file)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                logging.warning(f"Error writing extraction cache for {document.name}: {e}")
+
+    def close(self) -> None:
+        """Shut down the worker processes."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown()
+
+    def __enter__(self) -> "PdfTextExtractor":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
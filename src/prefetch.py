@@ -0,0 +1,360 @@
+"""
+Background prefetch of blobs the agent is expected to read next.
+This module runs a prioritized download queue beside ADLSConnection that fills its read cache, with concurrency and bandwidth caps, and measures how many prefetched bytes are actually read
+"""
+# %% Libraries
+import time
+import heapq
+import logging
+import itertools
+import threading
+import contextvars
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from manifest import PREFIX, ManifestEntry
+
+# Prefetched blobs remembered until read; older ones are forgotten and stay counted as wasted
+MAX_TRACKED = 4096
+
+
+# %% Statistics
+@dataclass(frozen=True)
+class PrefetchStats:
+    """
+    Counters of a prefetcher.
+
+    ``completed`` prefetches are the ones that downloaded a blob. Each is later either read
+    while still cached (``hits``), joined by a read while still downloading (``taken_over``)
+    or never read, in which case its bytes are wasted.
+    """
+
+    hinted: int = 0
+    completed: int = 0
+    cached: int = 0
+    failed: int = 0
+    cancelled: int = 0
+    dropped: int = 0
+    hits: int = 0
+    taken_over: int = 0
+    bytes_fetched: int = 0
+    bytes_used: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of completed prefetches that served a read."""
+        return (self.hits + self.taken_over) / self.completed if self.completed else 0.0
+
+    @property
+    def wasted_bytes(self) -> int:
+        """Prefetched bytes not read (yet)."""
+        return self.bytes_fetched - self.bytes_used
+
+    def as_dict(self) -> dict:
+        return {
+            "hinted": self.hinted,
+            "completed": self.completed,
+            "cached": self.cached,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "dropped": self.dropped,
+            "hits": self.hits,
+            "taken_over": self.taken_over,
+            "bytes_fetched": self.bytes_fetched,
+            "bytes_used": self.bytes_used,
+            "hit_rate": self.hit_rate,
+            "wasted_bytes": self.wasted_bytes,
+        }
+
+
+# %% Bandwidth
+class _Bandwidth:
+    """Byte budget refilled at ``rate`` bytes per second; downloads are charged once their size is known."""
+
+    def __init__(self, rate: float, clock=time.monotonic):
+        self.rate = rate
+        self._clock = clock
+        self._debt = 0.0
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._debt = max(0.0, self._debt - (now - self._updated) * self.rate)
+        self._updated = now
+
+    def delay(self) -> float:
+        """Seconds until the bytes already spent are paid back."""
+        with self._lock:
+            self._refill()
+            return self._debt / self.rate
+
+    def charge(self, size: int) -> None:
+        with self._lock:
+            self._refill()
+            self._debt += size
+
+
+# %% Prefetcher
+class Prefetcher:
+    """
+    Prioritized background downloads that warm the read cache of an ADLSConnection.
+
+    Hints name the documents the agent is likely to read next (e.g. the top results of a
+    listing or search). Higher priorities are fetched first and hints of equal priority in the
+    order given; hinting a queued document again can only raise its priority. At most
+    ``max_concurrency`` downloads run at once and, with ``max_bytes_per_second``, a download
+    only starts once the bytes of the previous ones fit in the budget.
+
+    The prefetcher attaches itself to the connection, which tells it about every read. A read
+    of a document still in the queue removes it (the read downloads it), and a read of a
+    document being prefetched joins that download instead of starting another one, as long as
+    ``config.coalesce_reads`` is on.
+    """
+
+    def __init__(
+        self,
+        connection,
+        max_concurrency: int = 2,
+        max_bytes_per_second: Optional[float] = None,
+        max_queued: int = 256,
+    ):
+        """
+        Initialize the prefetcher and start its worker threads.
+
+        Args:
+            connection: ADLSConnection with a read cache, which receives the downloads
+            max_concurrency: Downloads running at once
+            max_bytes_per_second: Average prefetch bandwidth, or None for no cap
+            max_queued: Hints waiting at most; further hints are dropped
+        """
+        if connection.cache is None:
+            raise ValueError("Prefetching requires a connection with a read cache")
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        if max_bytes_per_second is not None and max_bytes_per_second <= 0:
+            raise ValueError("max_bytes_per_second must be positive")
+        if max_queued < 1:
+            raise ValueError("max_queued must be at least 1")
+        self.connection = connection
+        self.max_queued = max_queued
+        self._bandwidth = _Bandwidth(max_bytes_per_second) if max_bytes_per_second else None
+        self._condition = threading.Condition()
+        self._stopped = threading.Event()
+        self._sequence = itertools.count()
+        # Heap of (-priority, sequence, blob name); an item is live while _queued maps its name to it
+        self._heap: List[Tuple[int, int, str]] = []
+        self._queued: Dict[str, Tuple[int, int, str, str]] = {}
+        self._in_flight: Dict[str, bool] = {}
+        self._prefetched: "OrderedDict[str, int]" = OrderedDict()
+        self._stats = PrefetchStats()
+        self._workers = [
+            threading.Thread(
+                target=contextvars.copy_context().run,
+                args=(self._work,),
+                name=f"adls-prefetch-{index}",
+                daemon=True,
+            )
+            for index in range(max_concurrency)
+        ]
+        connection.prefetcher = self
+        for worker in self._workers:
+            worker.start()
+
+    def hint(self, documents: Iterable, file_extension: str = "pdf", priority: int = 0) -> int:
+        """
+        Queue documents for prefetching.
+
+        Args:
+            documents: Names without extension, or ``manifest.ManifestEntry`` objects
+            file_extension: Extension of the documents given by name
+            priority: Higher priorities are fetched first
+
+        Returns:
+            int: Documents queued or raised in priority
+        """
+        accepted = dropped = 0
+        with self._condition:
+            for document in documents:
+                if isinstance(document, ManifestEntry):
+                    name, extension = document.name, document.extension
+                else:
+                    name, extension = document, file_extension
+                blob_name = f"{PREFIX}{name}.{extension}"
+                if self._stopped.is_set() or blob_name in self._in_flight or blob_name in self._prefetched:
+                    continue
+                current = self._queued.get(blob_name)
+                if current is not None and current[0] >= priority:
+                    continue
+                if current is None and len(self._queued) >= self.max_queued:
+                    dropped += 1
+                    continue
+                sequence = next(self._sequence)
+                self._queued[blob_name] = (priority, sequence, name, extension)
+                heapq.heappush(self._heap, (-priority, sequence, blob_name))
+                accepted += 1
+            self._update(hinted=accepted, dropped=dropped)
+            self._condition.notify_all()
+        self._count("hinted", accepted)
+        self._count("dropped", dropped)
+        return accepted
+
+    def hint_prefix(self, prefix: str, priority: int = 0, limit: Optional[int] = None) -> int:
+        """
+        Queue the documents of the connection's manifest whose name starts with ``prefix``.
+
+        Args:
+            prefix: Name prefix, e.g. a topic folder
+            priority: Higher priorities are fetched first
+            limit: Queue at most this many documents, in name order
+
+        Returns:
+            int: Documents queued or raised in priority
+        """
+        manifest = self.connection.manifest
+        if manifest is None:
+            raise ValueError("hint_prefix requires a connection with a manifest")
+        entries = manifest.with_prefix(prefix)
+        return self.hint(entries[:limit] if limit is not None else entries, priority=priority)
+
+    def claim(self, blob_name: str, cached: bool) -> None:
+        """
+        Record a read of ``blob_name`` by the connection.
+
+        Args:
+            blob_name: Blob about to be read
+            cached: Whether the read cache holds the blob
+        """
+        outcome, used = None, 0
+        with self._condition:
+            if self._queued.pop(blob_name, None) is not None:
+                outcome = "cancelled"
+                self._update(cancelled=1)
+                self._condition.notify_all()
+            elif blob_name in self._in_flight:
+                self._in_flight[blob_name] = True
+            else:
+                size = self._prefetched.pop(blob_name, None)
+                # A prefetched blob evicted before the read did not save anything
+                if size is not None and cached:
+                    outcome, used = "hit", size
+                    self._update(hits=1, bytes_used=size)
+        if outcome is not None:
+            self._count(outcome)
+        if used:
+            self.connection.instrumentation.count("prefetch_bytes_total", used, use="used")
+
+    def stats(self) -> PrefetchStats:
+        with self._condition:
+            return self._stats
+
+    @property
+    def pending(self) -> int:
+        """Hints queued or downloading."""
+        with self._condition:
+            return len(self._queued) + len(self._in_flight)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Block until the queue is empty and no download is running.
+
+        Returns:
+            bool: False if ``timeout`` expired first
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._queued and not self._in_flight, timeout)
+
+    def close(self) -> None:
+        """Drop the queued hints, wait for running downloads and detach from the connection."""
+        with self._condition:
+            self._stopped.set()
+            cancelled = len(self._queued)
+            self._queued.clear()
+            self._heap.clear()
+            self._update(dropped=cancelled)
+            self._condition.notify_all()
+        self._count("dropped", cancelled)
+        for worker in self._workers:
+            if worker is not threading.current_thread():
+                worker.join()
+        if self.connection.prefetcher is self:
+            self.connection.prefetcher = None
+
+    def __enter__(self) -> "Prefetcher":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _update(self, **deltas: int) -> None:
+        """Add to the counters; the caller holds the condition."""
+        self._stats = PrefetchStats(**{
+            name: value + deltas.get(name, 0) for name, value in vars(self._stats).items()
+        })
+
+    def _count(self, outcome: str, value: int = 1) -> None:
+        if value:
+            self.connection.instrumentation.count("prefetch_total", value, outcome=outcome)
+
+    def _next(self) -> Optional[Tuple[str, str, str]]:
+        """Pop the highest-priority live hint and mark it in flight; None once stopped."""
+        with self._condition:
+            while True:
+                if self._stopped.is_set():
+                    return None
+                while self._heap:
+                    _, sequence, blob_name = heapq.heappop(self._heap)
+                    entry = self._queued.get(blob_name)
+                    if entry is not None and entry[1] == sequence:
+                        del self._queued[blob_name]
+                        self._in_flight[blob_name] = False
+                        return blob_name, entry[2], entry[3]
+                self._condition.wait()
+
+    def _work(self) -> None:
+        instrumentation = self.connection.instrumentation
+        while True:
+            # Wait for budget before taking a hint, so a throttled hint can still be claimed by a read
+            while self._bandwidth is not None:
+                delay = self._bandwidth.delay()
+                if delay <= 0 or self._stopped.wait(delay):
+                    break
+            item = self._next()
+            if item is None:
+                return
+            blob_name, name, extension = item
+            size, error = 0, None
+            try:
+                with instrumentation.span("prefetch", blob=blob_name) as span:
+                    size = self.connection.cache_blob(name, extension)
+                    span.set_attribute("bytes", size)
+            except Exception as e:
+                error = e
+                logging.warning(f"Error prefetching blob {blob_name}: {e}")
+            with self._condition:
+                taken_over = self._in_flight.pop(blob_name)
+                if error is not None:
+                    outcome = "failed"
+                    self._update(failed=1)
+                elif not size:
+                    outcome = "cached"
+                    self._update(cached=1)
+                else:
+                    outcome = "completed"
+                    self._update(completed=1, bytes_fetched=size)
+                    if taken_over:
+                        self._update(taken_over=1, bytes_used=size)
+                    else:
+                        self._prefetched[blob_name] = size
+                        if len(self._prefetched) > MAX_TRACKED:
+                            self._prefetched.popitem(last=False)
+                self._condition.notify_all()
+            self._count(outcome)
+            if size:
+                instrumentation.count("prefetch_bytes_total", size, use="fetched")
+                if taken_over:
+                    self._count("taken_over")
+                    instrumentation.count("prefetch_bytes_total", size, use="used")
+                if self._bandwidth is not None:
+                    self._bandwidth.charge(size)
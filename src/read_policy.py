@@ -0,0 +1,293 @@
+"""
+Latency-aware execution of blob reads.
+This module tracks rolling read latencies per blob size class and uses them to hedge slow reads and time out stalled attempts
+"""
+# %% Libraries
+import time
+import random
+import threading
+import contextvars
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Statuses the SDK retry policy retries on
+RETRYABLE_STATUS = frozenset((408, 429, 500, 502, 503, 504))
+
+# Upper bounds (bytes) of the size classes; larger blobs fall in the last class
+SIZE_CLASSES = (
+    (64 * 1024, "<=64KiB"),
+    (1024 * 1024, "<=1MiB"),
+    (16 * 1024 * 1024, "<=16MiB"),
+)
+LARGEST_CLASS = ">16MiB"
+# Distribution of every read, used for blobs whose size is not known yet
+ANY_SIZE = "any"
+
+
+def size_class(size: Optional[int]) -> str:
+    """Size class of a blob of ``size`` bytes (``ANY_SIZE`` when unknown)."""
+    if size is None:
+        return ANY_SIZE
+    for limit, name in SIZE_CLASSES:
+        if size <= limit:
+            return name
+    return LARGEST_CLASS
+
+
+def is_transient(error: BaseException) -> bool:
+    """Whether a failed attempt is worth retrying: timeouts, throttling and 5xx answers."""
+    if isinstance(error, TimeoutError):
+        return True
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    # azure.core is imported on first failure so that importing this module stays cheap
+    from azure.core.exceptions import ServiceRequestError, ServiceResponseError
+
+    return isinstance(error, (ServiceRequestError, ServiceResponseError))
+
+
+# %% Latency tracking
+class LatencyTracker:
+    """
+    Rolling window of recent read latencies per blob size class.
+
+    Every sample also goes to the ``ANY_SIZE`` window, which answers for classes that have too
+    few samples and for blobs read for the first time. The size of the blobs read most
+    recently is remembered, so the next read of a blob is classified before it starts.
+    """
+
+    def __init__(self, window: int = 256, max_blobs: int = 4096):
+        """
+        Args:
+            window: Samples kept per size class
+            max_blobs: Blob sizes remembered for classification
+        """
+        self.window = window
+        self.max_blobs = max_blobs
+        self._lock = threading.Lock()
+        self._samples: Dict[str, Deque[float]] = {}
+        self._sizes: "OrderedDict[str, int]" = OrderedDict()
+
+    def record(self, blob_name: str, size: int, seconds: float) -> None:
+        """Add the latency of a completed read of ``size`` bytes."""
+        with self._lock:
+            for name in (size_class(size), ANY_SIZE):
+                samples = self._samples.get(name)
+                if samples is None:
+                    samples = self._samples[name] = deque(maxlen=self.window)
+                samples.append(seconds)
+            self._sizes[blob_name] = size
+            self._sizes.move_to_end(blob_name)
+            if len(self._sizes) > self.max_blobs:
+                self._sizes.popitem(last=False)
+
+    def size_class_of(self, blob_name: str) -> str:
+        """Size class of the last read of a blob (``ANY_SIZE`` if it was not read recently)."""
+        with self._lock:
+            return size_class(self._sizes.get(blob_name))
+
+    def quantile(self, name: str, q: float, min_samples: int = 1) -> Optional[float]:
+        """
+        Latency quantile of a size class, or None until ``min_samples`` reads were recorded.
+
+        Args:
+            name: Size class, falling back to ``ANY_SIZE`` when it has too few samples
+            q: Quantile in (0, 1)
+            min_samples: Samples required for an estimate
+        """
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None or len(samples) < min_samples:
+                samples = self._samples.get(ANY_SIZE)
+            if samples is None or len(samples) < min_samples:
+                return None
+            ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def counts(self) -> Dict[str, int]:
+        """Samples held per size class."""
+        with self._lock:
+            return {name: len(samples) for name, samples in self._samples.items()}
+
+
+# %% Policy
+# Threads of the process-wide hedge pool; attempts are only submitted while one is free
+HEDGE_WORKERS = 32
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_in_flight = 0
+
+
+def _release(_future: Future) -> None:
+    global _in_flight
+    with _executor_lock:
+        _in_flight -= 1
+
+
+def _submit_if_idle(fn: Callable[..., T], *args) -> Optional["Future[T]"]:
+    """
+    Run ``fn`` on the process-wide hedge pool, created on first use.
+
+    Returns None instead of queueing when all ``HEDGE_WORKERS`` threads are busy: a queued
+    attempt would spend its time budget waiting for a thread.
+    """
+    global _executor, _in_flight
+    with _executor_lock:
+        if _in_flight >= HEDGE_WORKERS:
+            return None
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="adls-hedge")
+        _in_flight += 1
+        executor = _executor
+    future = executor.submit(fn, *args)
+    future.add_done_callback(_release)
+    return future
+
+
+@dataclass(frozen=True)
+class ReadPolicy:
+    """
+    Hedging, per-attempt timeouts and retries for whole-blob reads.
+
+    Until the tracker holds ``min_samples`` reads, a read is a single plain attempt left to the
+    SDK's own retry policy. From then on each attempt gets a timeout of ``timeout_factor`` times
+    the p99 latency of the blob's size class, clamped to [``min_timeout``, ``max_timeout``]; an
+    attempt that is still running after the ``hedge_quantile`` latency is duplicated and the
+    first answer wins. Transient failures are retried up to ``max_attempts`` times, sleeping a
+    random time of up to ``backoff * 2**n`` seconds between attempts (full jitter).
+    """
+
+    tracker: LatencyTracker
+    hedge: bool = True
+    hedge_quantile: float = 0.95
+    min_samples: int = 20
+    timeout_factor: float = 4.0
+    min_timeout: float = 1.0
+    max_timeout: float = 30.0
+    max_attempts: int = 3
+    backoff: float = 0.1
+
+    def hedge_delay(self, name: str) -> Optional[float]:
+        """Seconds after which an attempt on the size class is duplicated."""
+        return self.tracker.quantile(name, self.hedge_quantile, self.min_samples)
+
+    def attempt_timeout(self, name: str) -> Optional[float]:
+        """Seconds an attempt on the size class may take, or None while there is no estimate."""
+        p99 = self.tracker.quantile(name, 0.99, self.min_samples)
+        if p99 is None:
+            return None
+        return min(self.max_timeout, max(self.min_timeout, p99 * self.timeout_factor))
+
+    def backoff_delay(self, retry: int) -> float:
+        """Full-jitter sleep before retry number ``retry`` (0-based)."""
+        return random.uniform(0, self.backoff * 2 ** retry)
+
+    def run(self, blob_name: str, attempt: Callable[[Optional[float]], T], size_of: Callable[[T], int],
+            instrumentation, tracker_of: Optional[Callable[[T], LatencyTracker]] = None) -> T:
+        """
+        Read a blob under the policy.
+
+        Args:
+            blob_name: Blob being read, used to pick its size class
+            attempt: Performs one request; receives the attempt timeout (None: SDK defaults)
+            size_of: Bytes read, given the attempt's result
+            instrumentation: Receiver of the hedge, timeout and retry counters
+            tracker_of: Tracker that records the latency, given the attempt's result, for
+                attempts that may be answered by another endpoint than the one of ``tracker``
+
+        Returns:
+            T: Result of the first successful attempt
+        """
+        name = self.tracker.size_class_of(blob_name)
+        timeout = self.attempt_timeout(name)
+        if timeout is None:
+            return self._timed(blob_name, attempt, size_of, None, tracker_of)
+        hedge_delay = self.hedge_delay(name) if self.hedge else None
+
+        for retry in range(self.max_attempts):
+            if retry:
+                time.sleep(self.backoff_delay(retry - 1))
+            try:
+                if hedge_delay is None:
+                    return self._timed(blob_name, attempt, size_of, timeout, tracker_of)
+                return self._hedged(blob_name, attempt, size_of, timeout, hedge_delay, instrumentation, tracker_of)
+            except Exception as e:
+                if retry + 1 == self.max_attempts or not is_transient(e):
+                    raise
+                status = getattr(e, "status_code", None)
+                instrumentation.count("adls_retries_total", status=str(status) if status else "timeout")
+
+    def _timed(self, blob_name: str, attempt: Callable[[Optional[float]], T], size_of: Callable[[T], int],
+               timeout: Optional[float], tracker_of: Optional[Callable[[T], LatencyTracker]] = None) -> T:
+        start = time.perf_counter()
+        result = attempt(timeout)
+        tracker = self.tracker if tracker_of is None else tracker_of(result)
+        tracker.record(blob_name, size_of(result), time.perf_counter() - start)
+        return result
+
+    def _hedged(self, blob_name: str, attempt: Callable[[Optional[float]], T], size_of: Callable[[T], int],
+                timeout: float, hedge_delay: float, instrumentation,
+                tracker_of: Optional[Callable[[T], LatencyTracker]] = None) -> T:
+        """
+        One attempt, duplicated once if it runs past ``hedge_delay``; each request has its own deadline.
+
+        Deadlines and the hedge delay count from the moment a request starts running. When the
+        hedge pool has no free thread the attempt runs on the caller's thread without a hedge,
+        and a hedge that finds the pool busy is skipped.
+        """
+        def submit():
+            started = []
+
+            def timed():
+                started.append(time.monotonic())
+                return self._timed(blob_name, attempt, size_of, timeout, tracker_of)
+
+            # Requests run in a copy of the caller's context so their spans nest under the read
+            future = _submit_if_idle(contextvars.copy_context().run, timed)
+            if future is not None:
+                starts[future] = started
+            return future
+
+        starts: Dict[Future, list] = {}
+        first = submit()
+        if first is None:
+            return self._timed(blob_name, attempt, size_of, timeout, tracker_of)
+        hedge = None
+        hedge_sent = False
+        error: Optional[BaseException] = None
+        while starts:
+            # Requests still waiting for a thread are polled until they start
+            wakes = [started[0] + timeout if started else time.monotonic() + 0.005 for started in starts.values()]
+            if not hedge_sent:
+                started = starts.get(first)
+                wakes.append(started[0] + hedge_delay if started else time.monotonic() + 0.005)
+            wake = min(wakes)
+            done, _ = wait(list(starts), timeout=max(0.0, wake - time.monotonic()), return_when=FIRST_COMPLETED)
+            for future in done:
+                del starts[future]
+                if future.exception() is None:
+                    if future is hedge:
+                        instrumentation.count("adls_hedges_total", outcome="won")
+                    return future.result()
+                if not is_transient(future.exception()):
+                    raise future.exception()
+                error = future.exception()
+            now = time.monotonic()
+            for future, started in list(starts.items()):
+                if started and now >= started[0] + timeout:
+                    # The request keeps running until the SDK read timeout; its answer is ignored
+                    del starts[future]
+                    instrumentation.count("adls_read_timeouts_total")
+                    error = TimeoutError(f"Read of {blob_name} took longer than {timeout:.3f}s")
+            started = starts.get(first)
+            if not hedge_sent and started and now >= started[0] + hedge_delay:
+                hedge_sent = True
+                hedge = submit()
+                instrumentation.count("adls_hedges_total", outcome="sent" if hedge is not None else "skipped")
+        raise error
@@ -0,0 +1,189 @@
+"""
+Routing of documents to storage endpoints for a corpus sharded across accounts and containers.
+This module provides the endpoint and route models of the configuration, the routing table resolving a blob to its replicas and the per-endpoint concurrency and throttling state
+"""
+# %% Libraries
+import time
+import hashlib
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from pydantic import BaseModel, Field, SecretStr, field_validator, model_validator
+
+# Blobs of the corpus live under this folder; routes match the document names below it
+PREFIX = "quant/"
+# Statuses after which a read moves on to the next replica: the service throttles with 503 ServerBusy
+FAILOVER_STATUS = frozenset((503,))
+
+
+# %% Configuration
+class Endpoint(BaseModel):
+    """One (account, container) holding a shard of the corpus, or a replica of one."""
+
+    adls_url: str = Field(..., description="Storage account URL of the endpoint")
+    container_name: str = Field(..., description="Container holding the documents")
+    account_key: Optional[SecretStr] = Field(
+        default=None,
+        description="Shared key of the account, instead of DefaultAzureCredential",
+    )
+    region: Optional[str] = Field(default=None, description="Region of the account, e.g. 'brazilsouth'")
+    shard: int = Field(default=0, ge=0, description="Shard of the route this endpoint serves")
+    max_concurrency: int = Field(
+        default=16,
+        ge=1,
+        description="Requests sent to this endpoint at the same time, across every connection of the process",
+    )
+
+    @field_validator('adls_url')
+    @classmethod
+    def validate_adls_url(cls, v):
+        if not v.startswith(('https://', 'http://')):
+            raise ValueError('ADLS URL must be a valid HTTPS URL')
+        return v.rstrip('/')
+
+    @field_validator('container_name')
+    @classmethod
+    def validate_container_name(cls, v):
+        if not v or not v.strip():
+            raise ValueError('Container name cannot be empty')
+        return v.strip()
+
+    @property
+    def key(self) -> Tuple[str, str]:
+        return self.adls_url, self.container_name
+
+
+class Route(BaseModel):
+    """
+    Endpoints of the documents whose name starts with ``prefix``.
+
+    With ``shards`` above 1 the documents are spread over the shards by a stable hash of their
+    name, and every endpoint serves the shard given by its ``shard`` field. Several endpoints
+    of the same shard are replicas holding the same documents.
+    """
+
+    prefix: str = Field(default="", description="Document name prefix, below quant/; empty matches every document")
+    shards: int = Field(default=1, ge=1, description="Hash shards the documents of the route are spread over")
+    endpoints: List[Endpoint] = Field(..., min_length=1, description="Endpoints of the shards, nearest replicas first")
+
+    @model_validator(mode='after')
+    def validate_shards(self):
+        served = {endpoint.shard for endpoint in self.endpoints}
+        if any(shard >= self.shards for shard in served):
+            raise ValueError(f'Endpoint shard out of range for a route with {self.shards} shards')
+        if len(served) != self.shards:
+            raise ValueError('Every shard of a route needs at least one endpoint')
+        return self
+
+
+def document_name(blob_name: str) -> str:
+    """Name of a document given its blob name (``quant/{name}.{ext}``)."""
+    if blob_name.startswith(PREFIX):
+        blob_name = blob_name[len(PREFIX):]
+    stem, dot, _ = blob_name.rpartition(".")
+    return stem if dot else blob_name
+
+
+def shard_of(name: str, shards: int) -> int:
+    """Shard of a document; the hash is stable across processes, unlike ``hash()``."""
+    if shards == 1:
+        return 0
+    digest = hashlib.sha256(name.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % shards
+
+
+# %% Routing table
+class RoutingTable:
+    """
+    Resolution of blob names to the endpoints holding them.
+
+    The route with the longest matching prefix wins and the document's shard picks its
+    endpoints. Replicas in ``region`` come first, then the others in configuration order.
+    Documents matched by no route belong to the connection's own container.
+    """
+
+    def __init__(self, routes: List[Route], region: Optional[str] = None):
+        """
+        Args:
+            routes: Routes of the configuration
+            region: Region of this process, whose replicas are preferred
+        """
+        self.routes = list(routes)
+        self.region = region
+        # Longest prefix first, so the first match is the most specific route
+        self._order = sorted(range(len(self.routes)), key=lambda index: -len(self.routes[index].prefix))
+        self._replicas: Dict[Tuple[int, int], List[Endpoint]] = {}
+        for index, route in enumerate(self.routes):
+            for shard in range(route.shards):
+                replicas = [endpoint for endpoint in route.endpoints if endpoint.shard == shard]
+                self._replicas[index, shard] = sorted(
+                    replicas, key=lambda endpoint: region is None or endpoint.region != region
+                )
+
+    def locate(self, blob_name: str) -> Optional[Tuple[int, int]]:
+        """(route index, shard) of a blob, or None when no route matches it."""
+        name = document_name(blob_name)
+        for index in self._order:
+            route = self.routes[index]
+            if name.startswith(route.prefix):
+                return index, shard_of(name, route.shards)
+        return None
+
+    def replicas(self, blob_name: str) -> List[Endpoint]:
+        """Endpoints holding a blob, nearest first; empty when no route matches it."""
+        location = self.locate(blob_name)
+        return [] if location is None else self._replicas[location]
+
+    def primary(self, blob_name: str) -> Optional[Endpoint]:
+        """Endpoint a blob is written to: the first one configured for its shard."""
+        location = self.locate(blob_name)
+        if location is None:
+            return None
+        index, shard = location
+        return next(endpoint for endpoint in self.routes[index].endpoints if endpoint.shard == shard)
+
+    def shards(self) -> Iterator[Tuple[Route, Tuple[int, int], List[Endpoint]]]:
+        """Every (route, location, replicas) of the table."""
+        for (index, shard), replicas in self._replicas.items():
+            yield self.routes[index], (index, shard), replicas
+
+
+# %% Endpoint state
+class EndpointState:
+    """Concurrency cap and throttling cooldown of one endpoint, shared by every connection using it."""
+
+    def __init__(self, max_concurrency: int, clock=time.monotonic):
+        self.max_concurrency = max_concurrency
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._throttled_until = 0.0
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """Hold one of the endpoint's request slots, waiting for one to free up."""
+        with self._slots:
+            with self._lock:
+                self._in_flight += 1
+            try:
+                yield
+            finally:
+                with self._lock:
+                    self._in_flight -= 1
+
+    @property
+    def in_flight(self) -> int:
+        with self._lock:
+            return self._in_flight
+
+    def throttle(self, seconds: float) -> None:
+        """Record a throttled answer; the endpoint is tried after its replicas for ``seconds``."""
+        with self._lock:
+            self._throttled_until = max(self._throttled_until, self._clock() + seconds)
+
+    @property
+    def throttled(self) -> bool:
+        with self._lock:
+            return self._clock() < self._throttled_until
@@ -0,0 +1,365 @@
+"""
+Local full-text search over the paper corpus stored under ``quant/``.
+This module provides a BM25 inverted index over chunked passages, stored in a memory-mapped on-disk format
+"""
+# %% Libraries
+import os
+import re
+import sys
+import json
+import math
+import mmap
+import heapq
+import shutil
+import logging
+import threading
+from array import array
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from manifest import split_blob_name
+
+FORMAT_VERSION = 1
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has in is it its of on or that the this to was were which with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase alphanumeric tokens of a text, without stopwords."""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def chunk_text(text: str, passage_words: int = 120, overlap: int = 20) -> List[str]:
+    """
+    Split a text into overlapping passages of about ``passage_words`` words.
+
+    Args:
+        text: Document text
+        passage_words: Words per passage
+        overlap: Words shared by consecutive passages
+
+    Returns:
+        List[str]: Passages in document order
+    """
+    if overlap >= passage_words:
+        raise ValueError("overlap must be smaller than passage_words")
+    words = text.split()
+    step = passage_words - overlap
+    passages = []
+    for start in range(0, len(words), step):
+        passages.append(" ".join(words[start:start + passage_words]))
+        if start + passage_words >= len(words):
+            break
+    return passages
+
+
+# %% Results
+@dataclass(frozen=True)
+class SearchHit:
+    """One passage matching a query."""
+
+    name: str
+    extension: str
+    passage: int
+    score: float
+    text: str
+
+
+@dataclass(frozen=True)
+class IndexUpdate:
+    """Documents changed by one index update."""
+
+    added: int = 0
+    updated: int = 0
+    removed: int = 0
+    unchanged: int = 0
+    failed: int = 0
+
+
+# %% Index
+class SearchIndex:
+    """
+    BM25 passage index kept in a directory of flat files.
+
+    Postings, passage lengths and passage text are memory-mapped, so opening the index is
+    cheap and queries touch only the postings of their terms. ``update`` compares the
+    container listing with the indexed ETags and only fetches documents that are new or
+    changed; the files are then rewritten and swapped in atomically.
+    """
+
+    def __init__(self, directory: str, k1: float = 1.2, b: float = 0.75):
+        """
+        Open the index stored in ``directory`` (an empty index if it does not exist yet).
+
+        Args:
+            directory: Index directory
+            k1: BM25 term frequency saturation
+            b: BM25 length normalisation
+        """
+        self.directory = directory
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        # Serialises updates; queries only wait on _lock while new files are swapped in
+        self._update_lock = threading.Lock()
+        self._maps: List[mmap.mmap] = []
+        self._views: List[memoryview] = []
+        self._load()
+
+    def _load(self) -> None:
+        self._close_maps()
+        self.documents: List[dict] = []
+        self._vocab: Dict[str, Tuple[int, int]] = {}
+        self._avg_length = 0.0
+        self._postings = self._lengths = self._offsets = self._passage_docs = memoryview(b"")
+        self._text = memoryview(b"")
+        meta_path = os.path.join(self.directory, "meta.json")
+        if not os.path.exists(meta_path):
+            return
+        with open(meta_path, "r", encoding="utf-8") as meta_file:
+            meta = json.load(meta_file)
+        if meta.get("version") != FORMAT_VERSION or meta.get("byteorder") != sys.byteorder:
+            raise ValueError(f"Unsupported search index format in {self.directory}")
+        with open(os.path.join(self.directory, "vocab.json"), "r", encoding="utf-8") as vocab_file:
+            self._vocab = {term: tuple(entry) for term, entry in json.load(vocab_file).items()}
+        self.documents = meta["documents"]
+        self._avg_length = meta["avg_length"]
+        self._postings = self._map("postings.u32", "I")
+        self._lengths = self._map("lengths.u32", "I")
+        self._offsets = self._map("offsets.u64", "Q")
+        self._passage_docs = self._map("passage_docs.u32", "I")
+        self._text = self._map("passages.txt", "B")
+
+    def _map(self, filename: str, typecode: str) -> memoryview:
+        path = os.path.join(self.directory, filename)
+        if os.path.getsize(path) == 0:
+            return memoryview(array(typecode))
+        with open(path, "rb") as mapped_file:
+            mapped = mmap.mmap(mapped_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps.append(mapped)
+        view = memoryview(mapped)
+        self._views.append(view)
+        if typecode != "B":
+            view = view.cast(typecode)
+            self._views.append(view)
+        return view
+
+    def _close_maps(self) -> None:
+        # Views must be released (derived ones first) before their mmap can close
+        for view in reversed(self._views):
+            view.release()
+        for mapped in self._maps:
+            mapped.close()
+        self._views = []
+        self._maps = []
+
+    @property
+    def passage_count(self) -> int:
+        return len(self._lengths)
+
+    def passage_text(self, passage: int) -> str:
+        return bytes(self._text[self._offsets[passage]:self._offsets[passage + 1]]).decode("utf-8")
+
+    def search(self, query: str, k: int = 10) -> List[SearchHit]:
+        """
+        Rank passages against a query with BM25.
+
+        Args:
+            query: Free-text query
+            k: Number of passages to return
+
+        Returns:
+            List[SearchHit]: Best passages, highest score first
+        """
+        with self._lock:
+            total = self.passage_count
+            if not total:
+                return []
+            scores: Dict[int, float] = defaultdict(float)
+            k1, b, avg_length = self.k1, self.b, self._avg_length or 1.0
+            for term in set(tokenize(query)):
+                entry = self._vocab.get(term)
+                if entry is None:
+                    continue
+                offset, doc_freq = entry
+                idf = math.log(1 + (total - doc_freq + 0.5) / (doc_freq + 0.5))
+                postings = self._postings[offset:offset + 2 * doc_freq]
+                for i in range(0, 2 * doc_freq, 2):
+                    passage, tf = postings[i], postings[i + 1]
+                    norm = k1 * (1 - b + b * self._lengths[passage] / avg_length)
+                    scores[passage] += idf * tf * (k1 + 1) / (tf + norm)
+            best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+            hits = []
+            for passage, score in best:
+                document = self.documents[self._passage_docs[passage]]
+                hits.append(SearchHit(
+                    name=document["name"],
+                    extension=document["extension"],
+                    passage=passage - document["first_passage"],
+                    score=score,
+                    text=self.passage_text(passage),
+                ))
+            return hits
+
+    def _document_passages(self, document: dict) -> List[str]:
+        first = document["first_passage"]
+        with self._lock:
+            return [self.passage_text(passage) for passage in range(first, first + document["passage_count"])]
+
+    def update(
+        self,
+        connection,
+        extractor=None,
+        extensions: Sequence[str] = ("pdf", "txt", "json"),
+        passage_words: int = 120,
+        overlap: int = 20,
+    ) -> IndexUpdate:
+        """
+        Bring the index in line with the container, fetching only new or changed documents.
+
+        Args:
+            connection: ADLSConnection listing and reading the corpus
+            extractor: Optional PdfTextExtractor; without it PDFs are skipped
+            extensions: Extensions to index
+            passage_words: Words per passage
+            overlap: Words shared by consecutive passages
+
+        Returns:
+            IndexUpdate: Counts of added, updated, removed, unchanged and failed documents
+        """
+        def load_text(name: str, extension: str) -> Optional[str]:
+            if extension == "pdf":
+                return extractor.extract(name).text if extractor is not None else None
+            return connection.read_blob_content(name, extension)
+
+        listing = []
+        for blob in connection.list_blobs():
+            parts = split_blob_name(blob.name)
+            if parts is not None and parts[1] in extensions:
+                if parts[1] != "pdf" or extractor is not None:
+                    listing.append((parts[0], parts[1], blob.etag, blob.last_modified))
+        return self._apply(listing, load_text, passage_words, overlap)
+
+    def _apply(
+        self,
+        listing: Iterable[Tuple[str, str, Optional[str], object]],
+        load_text: Callable[[str, str], Optional[str]],
+        passage_words: int,
+        overlap: int,
+    ) -> IndexUpdate:
+        # Documents are fetched and chunked outside the query lock, so searches keep answering
+        # from the current files until the new ones are swapped in
+        with self._update_lock:
+            with self._lock:
+                indexed = {(doc["name"], doc["extension"]): doc for doc in self.documents}
+                current = len(self.documents)
+            seen = set()
+            documents = []
+            added = updated = unchanged = failed = 0
+            for name, extension, etag, last_modified in listing:
+                key = (name, extension)
+                seen.add(key)
+                previous = indexed.get(key)
+                if previous is not None and etag and previous["etag"] == etag:
+                    documents.append((previous, self._document_passages(previous)))
+                    unchanged += 1
+                    continue
+                try:
+                    text = load_text(name, extension)
+                except Exception as e:
+                    logging.warning(f"Error loading {name}.{extension} for indexing: {e}")
+                    text = None
+                if text is None:
+                    failed += 1
+                    if previous is not None:
+                        documents.append((previous, self._document_passages(previous)))
+                    continue
+                if previous is None:
+                    added += 1
+                else:
+                    updated += 1
+                modified = last_modified.isoformat() if hasattr(last_modified, "isoformat") else last_modified
+                meta = {"name": name, "extension": extension, "etag": etag, "last_modified": modified}
+                documents.append((meta, chunk_text(text, passage_words, overlap)))
+            removed = len([key for key in indexed if key not in seen])
+            if added or updated or removed or len(documents) != current:
+                self._write(documents)
+            return IndexUpdate(added, updated, removed, unchanged, failed)
+
+    def _write(self, documents: List[Tuple[dict, List[str]]]) -> None:
+        postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        lengths = array("I")
+        offsets = array("Q", [0])
+        passage_docs = array("I")
+        text_parts = []
+        text_size = 0
+        metas = []
+        for doc_id, (meta, passages) in enumerate(documents):
+            meta = dict(meta, first_passage=len(lengths), passage_count=len(passages))
+            metas.append(meta)
+            for passage_text in passages:
+                passage = len(lengths)
+                tokens = tokenize(passage_text)
+                for term, tf in Counter(tokens).items():
+                    postings[term].append((passage, tf))
+                lengths.append(len(tokens))
+                passage_docs.append(doc_id)
+                encoded = passage_text.encode("utf-8")
+                text_parts.append(encoded)
+                text_size += len(encoded)
+                offsets.append(text_size)
+
+        flat = array("I")
+        vocab = {}
+        for term in sorted(postings):
+            vocab[term] = (len(flat), len(postings[term]))
+            for passage, tf in postings[term]:
+                flat.append(passage)
+                flat.append(tf)
+
+        staging = f"{self.directory.rstrip(os.sep)}.staging"
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        for filename, values in (
+            ("postings.u32", flat),
+            ("lengths.u32", lengths),
+            ("offsets.u64", offsets),
+            ("passage_docs.u32", passage_docs),
+        ):
+            with open(os.path.join(staging, filename), "wb") as out:
+                values.tofile(out)
+        with open(os.path.join(staging, "passages.txt"), "wb") as out:
+            for part in text_parts:
+                out.write(part)
+        with open(os.path.join(staging, "vocab.json"), "w", encoding="utf-8") as out:
+            json.dump(vocab, out)
+        with open(os.path.join(staging, "meta.json"), "w", encoding="utf-8") as out:
+            json.dump({
+                "version": FORMAT_VERSION,
+                "byteorder": sys.byteorder,
+                "avg_length": (sum(lengths) / len(lengths)) if lengths else 0.0,
+                "documents": metas,
+            }, out)
+
+        retired = f"{self.directory.rstrip(os.sep)}.retired"
+        shutil.rmtree(retired, ignore_errors=True)
+        with self._lock:
+            self._close_maps()
+            if os.path.exists(self.directory):
+                os.rename(self.directory, retired)
+            os.rename(staging, self.directory)
+            self._load()
+        shutil.rmtree(retired, ignore_errors=True)
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_maps()
+
+    def __enter__(self) -> "SearchIndex":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,139 @@
+"""
+Single-flight coalescing of concurrent calls that share a key.
+This module provides thread-based and asyncio variants: the first caller runs the work and concurrent callers share its outcome
+"""
+# %% Libraries
+import threading
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Hashable, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True)
+class FlightStats:
+    """Counters of a single-flight group."""
+
+    calls: int = 0
+    coalesced: int = 0
+    in_flight: int = 0
+
+    def as_dict(self) -> dict:
+        return {"calls": self.calls, "coalesced": self.coalesced, "in_flight": self.in_flight}
+
+
+# %% Threads
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Thread-safe group in which concurrent calls with the same key run once.
+
+    The first caller of a key (the leader) runs the function; callers arriving while it runs
+    block until it finishes and receive the same result, or have the same exception raised.
+    Nothing is remembered once the call completes, so the next call runs the function again.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._total = 0
+        self._coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> Tuple[T, bool]:
+        """
+        Run ``fn`` unless a call for ``key`` is already in flight, then share its outcome.
+
+        Args:
+            key: Identity of the work
+            fn: Function computing the result
+
+        Returns:
+            Tuple[T, bool]: The result, and whether it was shared from another caller's call
+        """
+        with self._lock:
+            self._total += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self._coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def stats(self) -> FlightStats:
+        with self._lock:
+            return FlightStats(self._total, self._coalesced, len(self._calls))
+
+
+# %% Asyncio
+class AsyncSingleFlight:
+    """
+    Asyncio counterpart of SingleFlight, for use on a single event loop.
+
+    The work runs as a task shared by every caller of the key; a caller that is cancelled
+    stops waiting without cancelling the download for the others.
+    """
+
+    def __init__(self):
+        self._tasks: Dict[Hashable, "asyncio.Task"] = {}
+        self._total = 0
+        self._coalesced = 0
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """
+        Await ``factory()`` unless a call for ``key`` is already in flight, then share its outcome.
+
+        Args:
+            key: Identity of the work
+            factory: Coroutine function computing the result
+
+        Returns:
+            Tuple[T, bool]: The result, and whether it was shared from another caller's call
+        """
+        # Imported here so that importing this module does not pull in asyncio
+        import asyncio
+
+        self._total += 1
+        task = self._tasks.get(key)
+        shared = task is not None
+        if shared:
+            self._coalesced += 1
+        else:
+            task = asyncio.ensure_future(factory())
+            self._tasks[key] = task
+            task.add_done_callback(lambda done, key=key: self._finish(key, done))
+        return await asyncio.shield(task), shared
+
+    def _finish(self, key: Hashable, task) -> None:
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        # Retrieve the outcome so an error nobody awaited anymore is not reported as unhandled
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> FlightStats:
+        return FlightStats(self._total, self._coalesced, len(self._tasks))
@@ -0,0 +1,425 @@
+"""
+Storage backends that ADLSConnection reads from.
+This module defines the backend protocol and provides local-filesystem and in-memory implementations of it
+"""
+# %% Libraries
+import os
+import mmap
+import uuid
+import shutil
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Protocol, Tuple
+
+
+# %% Protocol
+class StorageBackend(Protocol):
+    """
+    Subset of ``azure.storage.blob.BlobServiceClient`` that ADLSConnection depends on.
+
+    ``BlobServiceClient`` satisfies it as is. The other backends return blob handles whose
+    ``download_blob`` accepts the same ``offset``/``length``/``etag``/``match_condition``
+    arguments and fails with the same exceptions (404, 304, 412, 416) as the service, so ranged
+    reads, ETag revalidation and streaming behave identically on every backend.
+    """
+
+    def get_blob_client(self, container: str, blob: str): ...
+
+    def get_container_client(self, container: str): ...
+
+    def close(self) -> None: ...
+
+
+def _http_error(error_type: str, message: str, status_code: int) -> Exception:
+    """Exception shaped like the one the Blob service raises for ``status_code``."""
+    # azure.core is imported on first error so that importing the backends stays cheap
+    from azure.core import exceptions
+
+    error = getattr(exceptions, error_type)(message=message)
+    error.status_code = status_code
+    return error
+
+
+@dataclass
+class BlobProperties:
+    """Properties of a stored blob, named like ``azure.storage.blob.BlobProperties``."""
+
+    name: str
+    size: int
+    etag: str
+    last_modified: datetime
+    content_range: Optional[str] = None
+
+
+class BlobDownload:
+    """Result of ``download_blob``: the properties plus the requested bytes."""
+
+    def __init__(self, properties: BlobProperties, data):
+        self.properties = properties
+        self._data = data
+
+    def readall(self):
+        """Requested bytes, as a zero-copy ``memoryview`` where the backend allows it."""
+        return self._data
+
+    def chunks(self) -> Iterator:
+        yield self._data
+
+
+def _check_conditions(name: str, etag: str, expected: Optional[str], match_condition) -> None:
+    """Apply If-None-Match / If-Match semantics the way the service does."""
+    if expected is None or match_condition is None:
+        return
+    from azure.core import MatchConditions
+
+    if match_condition == MatchConditions.IfModified and expected == etag:
+        raise _http_error("ResourceNotModifiedError", f"{name} not modified", 304)
+    if match_condition == MatchConditions.IfNotModified and expected != etag:
+        raise _http_error("ResourceModifiedError", f"{name} was modified", 412)
+
+
+def _check_missing(name: str, exists: bool, if_none_match: Optional[str]) -> None:
+    """Apply ``If-None-Match: *`` (create only) the way the service does."""
+    if if_none_match == "*" and exists:
+        raise _http_error("ResourceExistsError", f"{name} already exists", 409)
+
+
+def _block_id(block) -> str:
+    """ID of a block list entry given as a string or a ``BlobBlock``."""
+    return block if isinstance(block, str) else block.id
+
+
+def _byte_range(name: str, size: int, offset: Optional[int], length: Optional[int]) -> Tuple[int, int]:
+    """Validated ``[start, stop)`` of a download; ranged reads past the end fail with 416."""
+    if offset is None:
+        return 0, size
+    if offset >= size:
+        raise _http_error("HttpResponseError", f"Requested range of {name} not satisfiable", 416)
+    stop = size if length is None else min(size, offset + length)
+    return offset, stop
+
+
+def _ranged_properties(properties: BlobProperties, start: int, stop: int, ranged: bool) -> BlobProperties:
+    if not ranged:
+        return properties
+    return BlobProperties(
+        name=properties.name,
+        size=stop - start,
+        etag=properties.etag,
+        last_modified=properties.last_modified,
+        content_range=f"bytes {start}-{stop - 1}/{properties.size}",
+    )
+
+
+# %% Local filesystem
+class LocalBackend:
+    """
+    Backend over a directory that stands in for the container.
+
+    The blob ``quant/paper.pdf`` is the file ``<root>/quant/paper.pdf``. Downloads map the file
+    and return ``memoryview`` slices of the mapping, so reads cost no copy until the caller
+    decodes them. ETags are derived from the file's inode, size and modification time. Staged
+    blocks are hidden files next to the blob until a block list commits them.
+    """
+
+    def __init__(self, root: str):
+        """
+        Args:
+            root: Directory holding the blobs
+        """
+        self.root = os.path.abspath(root)
+
+    def path(self, blob_name: str) -> str:
+        """File backing a blob, refusing names that escape the root."""
+        path = os.path.abspath(os.path.join(self.root, *blob_name.split("/")))
+        if os.path.commonpath([self.root, path]) != self.root:
+            raise ValueError(f"Blob name escapes the local root: {blob_name}")
+        return path
+
+    def get_blob_client(self, container: str, blob: str) -> "LocalBlobClient":
+        return LocalBlobClient(self, blob)
+
+    def get_container_client(self, container: str) -> "LocalContainerClient":
+        return LocalContainerClient(self)
+
+    def block_path(self, blob_name: str, block_id: str) -> str:
+        """Hidden file holding an uncommitted block of a blob."""
+        directory, filename = os.path.split(self.path(blob_name))
+        return os.path.join(directory, f".{filename}.{block_id.encode('utf-8').hex()}.block")
+
+    def properties(self, blob_name: str, stat: Optional[os.stat_result] = None) -> BlobProperties:
+        if stat is None:
+            try:
+                stat = os.stat(self.path(blob_name))
+            except FileNotFoundError:
+                raise _http_error("ResourceNotFoundError", f"{blob_name} not found", 404) from None
+        return BlobProperties(
+            name=blob_name,
+            size=stat.st_size,
+            etag=f'"{stat.st_ino:x}-{stat.st_size:x}-{stat.st_mtime_ns:x}"',
+            last_modified=datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc),
+        )
+
+    def close(self) -> None:
+        pass
+
+
+class LocalBlobClient:
+    """Handle of one file of a LocalBackend."""
+
+    def __init__(self, backend: LocalBackend, blob_name: str):
+        self.backend = backend
+        self.blob_name = blob_name
+
+    def get_blob_properties(self, **kwargs) -> BlobProperties:
+        return self.backend.properties(self.blob_name)
+
+    def download_blob(
+        self,
+        offset: Optional[int] = None,
+        length: Optional[int] = None,
+        etag: Optional[str] = None,
+        match_condition=None,
+        **kwargs
+    ) -> BlobDownload:
+        try:
+            handle = open(self.backend.path(self.blob_name), "rb")
+        except FileNotFoundError:
+            raise _http_error("ResourceNotFoundError", f"{self.blob_name} not found", 404) from None
+        with handle:
+            # Properties come from the open descriptor, so they describe the bytes mapped below
+            properties = self.backend.properties(self.blob_name, os.fstat(handle.fileno()))
+            _check_conditions(self.blob_name, properties.etag, etag, match_condition)
+            start, stop = _byte_range(self.blob_name, properties.size, offset, length)
+            if properties.size == 0:
+                data = memoryview(b"")
+            else:
+                # The view keeps the mapping alive after the descriptor is closed
+                data = memoryview(mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ))[start:stop]
+        return BlobDownload(_ranged_properties(properties, start, stop, offset is not None), data)
+
+    def upload_blob(self, data, overwrite: bool = False, **kwargs) -> dict:
+        path = self.backend.path(self.blob_name)
+        if not overwrite and os.path.exists(path):
+            raise _http_error("ResourceExistsError", f"{self.blob_name} already exists", 409)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp_path, "wb") as out:
+                out.write(data.encode("utf-8") if isinstance(data, str) else data)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return {"etag": self.get_blob_properties().etag}
+
+    def stage_block(self, block_id: str, data, **kwargs) -> None:
+        path = self.backend.block_path(self.blob_name, block_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as out:
+            out.write(data.encode("utf-8") if isinstance(data, str) else data)
+
+    def commit_block_list(self, block_list, if_none_match: Optional[str] = None, **kwargs) -> dict:
+        path = self.backend.path(self.blob_name)
+        _check_missing(self.blob_name, os.path.exists(path), if_none_match)
+        block_paths = [self.backend.block_path(self.blob_name, _block_id(block)) for block in block_list]
+        missing = [block_path for block_path in block_paths if not os.path.exists(block_path)]
+        if missing:
+            raise _http_error("HttpResponseError", f"Invalid block list for {self.blob_name}", 400)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp_path, "wb") as out:
+                for block_path in block_paths:
+                    with open(block_path, "rb") as block_file:
+                        shutil.copyfileobj(block_file, out)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        # Committing discards every uncommitted block of the blob, as the service does
+        directory, filename = os.path.split(path)
+        for name in os.listdir(directory):
+            if name.startswith(f".{filename}.") and name.endswith(".block"):
+                os.remove(os.path.join(directory, name))
+        return {"etag": self.get_blob_properties().etag}
+
+
+class LocalContainerClient:
+    """Listing of the files of a LocalBackend."""
+
+    def __init__(self, backend: LocalBackend):
+        self.backend = backend
+
+    def list_blobs(self, name_starts_with: Optional[str] = None, **kwargs) -> Iterator[BlobProperties]:
+        prefix = name_starts_with or ""
+        # Only walk the directory the prefix points into
+        top = self.backend.path(prefix.rsplit("/", 1)[0]) if "/" in prefix else self.backend.root
+        names = []
+        for directory, _, filenames in os.walk(top):
+            relative = os.path.relpath(directory, self.backend.root)
+            for filename in filenames:
+                # Skip in-flight uploads and hidden files (mirror state, partial downloads)
+                if filename.endswith(".tmp") or filename.startswith("."):
+                    continue
+                name = filename if relative == "." else f"{relative.replace(os.sep, '/')}/{filename}"
+                if name.startswith(prefix):
+                    names.append(name)
+        for name in sorted(names):
+            try:
+                stat = os.stat(self.backend.path(name))
+            except FileNotFoundError:
+                continue  # removed while listing
+            yield self.backend.properties(name, stat)
+
+
+# %% In-memory
+class MemoryBackend:
+    """
+    Backend over a dictionary held in process memory, for tests and ephemeral pipelines.
+
+    Blobs are immutable ``bytes``; downloads return ``memoryview`` slices of them.
+    """
+
+    def __init__(self, blobs: Optional[Dict[str, bytes]] = None):
+        """
+        Args:
+            blobs: Initial content, keyed by blob name
+        """
+        self._lock = threading.Lock()
+        self._blobs: Dict[str, Tuple[bytes, BlobProperties]] = {}
+        self._staged: Dict[str, Dict[str, bytes]] = {}
+        for name, data in (blobs or {}).items():
+            self.put(name, data)
+
+    def put(self, blob_name: str, data) -> BlobProperties:
+        """Store (or replace) a blob and return its new properties."""
+        data = data.encode("utf-8") if isinstance(data, str) else bytes(data)
+        properties = BlobProperties(
+            name=blob_name,
+            size=len(data),
+            etag=f'"{uuid.uuid4().hex}"',
+            last_modified=datetime.now(timezone.utc),
+        )
+        with self._lock:
+            self._blobs[blob_name] = (data, properties)
+        return properties
+
+    def delete(self, blob_name: str) -> None:
+        with self._lock:
+            self._blobs.pop(blob_name, None)
+
+    def stage(self, blob_name: str, block_id: str, data) -> None:
+        """Keep an uncommitted block of a blob."""
+        data = data.encode("utf-8") if isinstance(data, str) else bytes(data)
+        with self._lock:
+            self._staged.setdefault(blob_name, {})[block_id] = data
+
+    def commit(self, blob_name: str, block_ids: List[str]) -> BlobProperties:
+        """Replace a blob with the concatenation of staged blocks and drop its other staged blocks."""
+        with self._lock:
+            staged = self._staged.get(blob_name, {})
+            if any(block_id not in staged for block_id in block_ids):
+                raise _http_error("HttpResponseError", f"Invalid block list for {blob_name}", 400)
+            data = b"".join(staged[block_id] for block_id in block_ids)
+            self._staged.pop(blob_name, None)
+        return self.put(blob_name, data)
+
+    def staged_blocks(self, blob_name: str) -> List[str]:
+        """IDs of the uncommitted blocks of a blob."""
+        with self._lock:
+            return list(self._staged.get(blob_name, {}))
+
+    def entry(self, blob_name: str) -> Tuple[bytes, BlobProperties]:
+        with self._lock:
+            entry = self._blobs.get(blob_name)
+        if entry is None:
+            raise _http_error("ResourceNotFoundError", f"{blob_name} not found", 404)
+        return entry
+
+    def listing(self) -> List[BlobProperties]:
+        """Properties of every blob, sorted by name."""
+        with self._lock:
+            return [self._blobs[name][1] for name in sorted(self._blobs)]
+
+    def get_blob_client(self, container: str, blob: str) -> "MemoryBlobClient":
+        return MemoryBlobClient(self, blob)
+
+    def get_container_client(self, container: str) -> "MemoryContainerClient":
+        return MemoryContainerClient(self)
+
+    def close(self) -> None:
+        pass
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._blobs)
+
+
+class MemoryBlobClient:
+    """Handle of one blob of a MemoryBackend."""
+
+    def __init__(self, backend: MemoryBackend, blob_name: str):
+        self.backend = backend
+        self.blob_name = blob_name
+
+    def get_blob_properties(self, **kwargs) -> BlobProperties:
+        return self.backend.entry(self.blob_name)[1]
+
+    def download_blob(
+        self,
+        offset: Optional[int] = None,
+        length: Optional[int] = None,
+        etag: Optional[str] = None,
+        match_condition=None,
+        **kwargs
+    ) -> BlobDownload:
+        data, properties = self.backend.entry(self.blob_name)
+        _check_conditions(self.blob_name, properties.etag, etag, match_condition)
+        start, stop = _byte_range(self.blob_name, properties.size, offset, length)
+        return BlobDownload(
+            _ranged_properties(properties, start, stop, offset is not None),
+            memoryview(data)[start:stop],
+        )
+
+    def upload_blob(self, data, overwrite: bool = False, **kwargs) -> dict:
+        with self.backend._lock:
+            exists = self.blob_name in self.backend._blobs
+        if exists and not overwrite:
+            raise _http_error("ResourceExistsError", f"{self.blob_name} already exists", 409)
+        return {"etag": self.backend.put(self.blob_name, data).etag}
+
+    def stage_block(self, block_id: str, data, **kwargs) -> None:
+        self.backend.stage(self.blob_name, block_id, data)
+
+    def commit_block_list(self, block_list, if_none_match: Optional[str] = None, **kwargs) -> dict:
+        with self.backend._lock:
+            exists = self.blob_name in self.backend._blobs
+        _check_missing(self.blob_name, exists, if_none_match)
+        return {"etag": self.backend.commit(self.blob_name, [_block_id(block) for block in block_list]).etag}
+
+
+class MemoryContainerClient:
+    """Listing of the blobs of a MemoryBackend."""
+
+    def __init__(self, backend: MemoryBackend):
+        self.backend = backend
+
+    def list_blobs(self, name_starts_with: Optional[str] = None, **kwargs) -> Iterator[BlobProperties]:
+        prefix = name_starts_with or ""
+        for properties in self.backend.listing():
+            if properties.name.startswith(prefix):
+                yield properties
+
+
+_memory_backends: Dict[str, MemoryBackend] = {}
+_memory_lock = threading.Lock()
+
+
+def shared_memory_backend(container_name: str) -> MemoryBackend:
+    """In-memory backend shared by every connection to ``container_name`` in this process."""
+    with _memory_lock:
+        backend = _memory_backends.get(container_name)
+        if backend is None:
+            backend = _memory_backends[container_name] = MemoryBackend()
+        return backend
@@ -1,15 +1,26 @@
 """
 Unit tests for ADLS connection module.
 """
+import io
 import os
 import sys
+import asyncio
+import threading
+import time
 import pytest
-from unittest.mock import Mock, patch, MagicMock
+from unittest.mock import ANY, AsyncMock, Mock, patch, MagicMock
 from pydantic import ValidationError
 
 # Add the src directory to the Python path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
+from blob_cache import BlobCache
+from manifest import BlobManifest
+from storage_backends import MemoryBackend
+from types import SimpleNamespace
+from datetime import datetime, timezone
+from azure.core.exceptions import ResourceExistsError, ResourceNotModifiedError
+
 # Import the module using importlib due to dash in filename
 import importlib.util
 spec = importlib.util.spec_from_file_location("adls_connection", 
@@ -21,6 +32,17 @@ spec.loader.exec_module(adls_module)
 ADLSConfig = adls_module.ADLSConfig
 ADLSConnection = adls_module.ADLSConnection
 connected_agent_tool_read_json = adls_module.connected_agent_tool_read_json
+ClientRegistry = adls_module.ClientRegistry
+AsyncADLSConnection = adls_module.AsyncADLSConnection
+BlobReadResult = adls_module.BlobReadResult
+
+
+@pytest.fixture(autouse=True)
+def reset_shared_clients():
+    """Drop shared clients so each test sees freshly patched SDK classes."""
+    adls_module.close_shared_clients()
+    yield
+    adls_module.close_shared_clients()
 
 
 class TestADLSConfig:
@@ -99,7 +121,8 @@ class TestADLSConnection:
             mock_credential.assert_called_once()
             mock_blob_service.assert_called_once_with(
                 account_url=config.adls_url,
-                credential=mock_credential.return_value
+                credential=mock_credential.return_value,
+                session=ANY
             )
     
     @patch.dict(os.environ, {
@@ -220,6 +243,760 @@ class TestADLSConnection:
                 blob="quant/test-data.json"
             )
 
+    def test_get_blob_properties(self, valid_adls_config):
+        """Test fetching properties without downloading the blob."""
+        with patch.object(adls_module, 'DefaultAzureCredential'), \
+             patch.object(adls_module, 'BlobServiceClient') as mock_blob_service:
+            blob_client = mock_blob_service.return_value.get_blob_client.return_value
+
+            connection = ADLSConnection(valid_adls_config)
+            properties = connection.get_blob_properties("test-paper", "pdf")
+
+            assert properties is blob_client.get_blob_properties.return_value
+            blob_client.download_blob.assert_not_called()
+            mock_blob_service.return_value.get_blob_client.assert_called_once_with(
+                container="test-container",
+                blob="quant/test-paper.pdf"
+            )
+
+
+class TestReadMany:
+    """Test cases for parallel batch reads."""
+
+    @staticmethod
+    def _mock_service(contents, delay=0.0):
+        """Build a service client mock serving ``contents`` keyed by blob path."""
+        def get_blob_client(container, blob):
+            def download_blob():
+                time.sleep(delay)
+                if isinstance(contents[blob], Exception):
+                    raise contents[blob]
+                blob_data = Mock()
+                blob_data.readall.return_value = contents[blob]
+                return blob_data
+
+            blob_client = Mock()
+            blob_client.download_blob.side_effect = download_blob
+            return blob_client
+
+        service = Mock()
+        service.get_blob_client.side_effect = get_blob_client
+        return service
+
+    def test_read_many_returns_input_order_with_errors(self, valid_adls_config):
+        """Test that results keep input order and carry per-item errors."""
+        error = Exception("Blob not found")
+        service = self._mock_service({
+            "quant/a.pdf": b"A",
+            "quant/b.pdf": error,
+            "quant/c.pdf": b"C",
+        })
+        with patch.object(adls_module, 'DefaultAzureCredential'), \
+             patch.object(adls_module, 'BlobServiceClient', return_value=service):
+
+            connection = ADLSConnection(valid_adls_config)
+            results = connection.read_many(["a", "b", "c"], extension="pdf")
+
+            assert [result.blob_path for result in results] == ["a", "b", "c"]
+            assert [result.content for result in results] == ["A", None, "C"]
+            assert [result.ok for result in results] == [True, False, True]
+            assert results[1].error is error
+
+    def test_read_many_empty(self, valid_adls_config):
+        """Test that an empty batch returns no results."""
+        with patch.object(adls_module, 'DefaultAzureCredential'), \
+             patch.object(adls_module, 'BlobServiceClient'):
+
+            assert ADLSConnection(valid_adls_config).read_many([]) == []
+
+    def test_read_many_runs_in_parallel(self):
+        """Test that batch wall-clock time approaches a single download."""
+        config = ADLSConfig(
+            adls_url="https://teststorage.blob.core.windows.net",
+            container_name="test-container",
+            max_workers=10
+        )
+        names = [f"paper-{i}" for i in range(10)]
+        service = self._mock_service({f"quant/{name}.pdf": b"x" for name in names}, delay=0.05)
+        with patch.object(adls_module, 'DefaultAzureCredential'), \
+             patch.object(adls_module, 'BlobServiceClient', return_value=service):
+
+            connection = ADLSConnection(config)
+            start = time.perf_counter()
+            results = connection.read_many(names)
+            elapsed = time.perf_counter() - start
+
+            assert all(result.ok for result in results)
+            assert elapsed < 0.3
+
+    def test_iter_read_many_streams_in_completion_order(self, valid_adls_config):
+        """Test that finished downloads are yielded before slower ones."""
+        release = threading.Event()
+        service = Mock()
+
+        def get_blob_client(container, blob):
+            def download_blob():
+                if blob == "quant/slow.pdf":
+                    release.wait(1)
+                blob_data = Mock()
+                blob_data.readall.return_value = blob.encode()
+                return blob_data
+
+            blob_client = Mock()
+            blob_client.download_blob.side_effect = download_blob
+            return blob_client
+
+        service.get_blob_client.side_effect = get_blob_client
+        with patch.object(adls_module, 'DefaultAzureCredential'), \
+             patch.object(adls_module, 'BlobServiceClient', return_value=service):
+
+            connection = ADLSConnection(valid_adls_config)
+            stream = connection.iter_read_many(["slow", "fast"])
+            first = next(stream)
+            release.set()
+            second = next(stream)
+
+            assert (first.blob_path, first.index) == ("fast", 1)
+            assert (second.blob_path, second.index) == ("slow", 0)
+
+
+class TestReadCoalescing:
+    """Test cases for single-flight coalescing of concurrent reads."""
+
+    @staticmethod
+    def _slow_service(calls, delay=0.05):
+        """Service client mock whose downloads take ``delay`` seconds and are recorded in ``calls``."""
+        def download_blob(**kwargs):
+            calls.append(1)
+            time.sleep(delay)
+            blob_data = Mock()
+            blob_data.readall.return_value = b"Shared content"
+            return blob_data
+
+        blob_client = Mock()
+        blob_client.download_blob.side_effect = download_blob
+        service = Mock()
+        service.get_blob_client.return_value = blob_client
+        return service
+
+    def test_concurrent_reads_share_one_download(self, valid_adls_config):
+        """Test that readers of the same blob, on different connections, share a download."""
+        calls = []
+        service = self._slow_service(calls)
+        with patch.object(adls_module, 'DefaultAzureCredential'), \
+             patch.object(adls_module, 'BlobServiceClient', return_value=service):
+
+            results = []
+            threads = [
+                threading.Thread(target=lambda: results.append(
+                    ADLSConnection(valid_adls_config).read_blob_content("test-paper", "pdf")
+                ))
+                for _ in range(8)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            assert results == ["Shared content"] * 8
+            assert len(calls) == 1
+
+    def test_coalescing_can_be_disabled(self):
+        """Test that coalesce_reads=False downloads once per reader."""
+        config = ADLSConfig(
+            adls_url="https://teststorage.blob.core.windows.net",
+            container_name="test-container",
+            coalesce_reads=False
+        )
+        calls = []
+        service = self._slow_service(calls)
+        with patch.object(adls_module, 'DefaultAzureCredential'), \
+             patch.object(adls_module, 'BlobServiceClient', return_value=service):
+
+            connection = ADLSConnection(config)
+            results = connection.read_many(["test-paper"] * 4)
+
+            assert all(result.ok for result in results)
+            assert len(calls) == 4
+
+    def test_async_reads_share_one_download(self, valid_adls_config):
+        """Test that concurrent awaits of the same blob share a download."""
+        async def readall():
+            await asyncio.sleep(0.01)
+            return b"Async content"
+
+        downloader = Mock()
+        downloader.readall = readall
+        blob_client = Mock()
+        blob_client.download_blob = AsyncMock(return_value=downloader)
+        service = Mock()
+        service.get_blob_client.return_value = blob_client
+
+        with patch.object(adls_module, 'AsyncDefaultAzureCredential'), \
+             patch.object(adls_module, 'AsyncBlobServiceClient', return_value=service):
+
+            connection = AsyncADLSConnection(valid_adls_config)
+            result = asyncio.run(connection.read_blob_contents(["test-paper"] * 5))
+
+            assert result == ["Async content"] * 5
+            blob_client.download_blob.assert_awaited_once()
+            assert connection.single_flight.stats().coalesced == 4
+
+
+class TestReadCache:
+    """Test cases for reads through the content cache."""
+
+    @staticmethod
+    def _mock_blob_client(data=b"Cached paper", etag="etag-1"):
+        downloader = Mock()
+        downloader.readall.return_value = data
+        downloader.properties.etag = etag
+        blob_client = Mock()
+        blob_client.download_blob.return_value = downloader
+        return blob_client
+
+    def test_miss_downloads_and_stores(self, valid_adls_config):
+        """Test that a miss downloads the blob and stores it with its ETag."""
+        cache = BlobCache()
+        blob_client = self._mock_blob_client()
+        with patch.object(adls_module, 'DefaultAzureCredential'), \
+             patch.object(adls_module, 'BlobServiceClient') as mock_blob_service:
+            mock_blob_service.return_value.get_blob_client.return_value = blob_client
+
+            connection = ADLSConnection(valid_adls_config, cache=cache)
+            result = connection.read_blob_content("paper", "pdf")
+
+            assert result == "Cached paper"
+            blob_client.download_blob.assert_called_once_with()
+            entry = cache.get("https://teststorage.blob.core.windows.net/test-container/quant/paper.pdf")
+            assert entry.etag == "etag-1"
+
+    def test_hit_revalidates_with_etag(self, valid_adls_config):
+        """Test that a cached entry is revalidated and a 304 serves it."""
+        cache = BlobCache()
+        key = "https://teststorage.blob.core.windows.net/test-container/quant/paper.pdf"
+        cache.put(key, b"Cached paper", "etag-1")
+        blob_client = Mock()
+        blob_client.download_blob.side_effect = ResourceNotModifiedError("Not modified", response=Mock(status_code=304))
+        with patch.object(adls_module, 'DefaultAzureCredential'), \
+             patch.object(adls_module, 'BlobServiceClient') as mock_blob_service:
+            mock_blob_service.return_value.get_blob_client.return_value = blob_client
+
+            connection = ADLSConnection(valid_adls_config, cache=cache)
+            result = connection.read_blob_content("paper", "pdf")
+
+            assert result == "Cached paper"
+            blob_client.download_blob.assert_called_once_with(
+                etag="etag-1", match_condition=adls_module.MatchConditions.IfModified
+            )
+            assert cache.stats.revalidations == 1
+
+    def test_changed_blob_replaces_entry(self, valid_adls_config):
+        """Test that a modified blob is downloaded and replaces the stale entry."""
+        cache = BlobCache()
+        key = "https://teststorage.blob.core.windows.net/test-container/quant/paper.pdf"
+        cache.put(key, b"Old paper", "etag-1")
+        blob_client = self._mock_blob_client(b"New paper", "etag-2")
+        with patch.object(adls_module, 'DefaultAzureCredential'), \
+             patch.object(adls_module, 'BlobServiceClient') as mock_blob_service:
+            mock_blob_service.return_value.get_blob_client.return_value = blob_client
+
+            connection = ADLSConnection(valid_adls_config, cache=cache)
+
+            assert connection.read_blob_content("paper", "pdf") == "New paper"
+            assert cache.get(key).etag == "etag-2"
+
+    def test_ttl_mode_skips_service(self, valid_adls_config):
+        """Test that a fresh entry in TTL mode never reaches the service."""
+        cache = BlobCache(ttl=300)
+        cache.put("https://teststorage.blob.core.windows.net/test-container/quant/paper.pdf", b"Cached paper", "etag-1")
+        blob_client = Mock()
+        with patch.object(adls_module, 'DefaultAzureCredential'), \
+             patch.object(adls_module, 'BlobServiceClient') as mock_blob_service:
+            mock_blob_service.return_value.get_blob_client.return_value = blob_client
+
+            connection = ADLSConnection(valid_adls_config, cache=cache)
+
+            assert connection.read_blob_content("paper", "pdf") == "Cached paper"
+            blob_client.download_blob.assert_not_called()
+
+    def test_cache_blob_downloads_once(self, valid_adls_config):
+        """Test that cache_blob fills the cache and skips blobs it already holds."""
+        cache = BlobCache(ttl=300)
+        blob_client = self._mock_blob_client()
+        with patch.object(adls_module, 'DefaultAzureCredential'), \
+             patch.object(adls_module, 'BlobServiceClient') as mock_blob_service:
+            mock_blob_service.return_value.get_blob_client.return_value = blob_client
+
+            connection = ADLSConnection(valid_adls_config, cache=cache)
+
+            assert connection.cache_blob("paper", "pdf") == len(b"Cached paper")
+            assert connection.cache_blob("paper", "pdf") == 0
+            assert connection.read_blob_content("paper", "pdf") == "Cached paper"
+            blob_client.download_blob.assert_called_once_with()
+            with pytest.raises(ValueError):
+                ADLSConnection(valid_adls_config).cache_blob("paper", "pdf")
+
+
+class TestStreamingReads:
+    """Test cases for chunked and file-like blob reads."""
+
+    PAYLOAD = bytes(range(256)) * 40  # 10240 bytes
+
+    @classmethod
+    def _ranged_blob_client(cls, payload=None, etag="etag-1"):
+        """Blob client mock answering ranged downloads from ``payload``."""
+        payload = cls.PAYLOAD if payload is None else payload
+
+        def download_blob(offset=0, length=None, **kwargs):
+            end = len(payload) if length is None else min(len(payload), offset + length)
+            downloader = Mock()
+            downloader.readall.return_value = payload[offset:end]
+            downloader.properties.etag = etag
+            downloader.properties.size = end - offset
+            downloader.properties.content_range = f"bytes {offset}-{end - 1}/{len(payload)}"
+            return downloader
+
+        blob_client = Mock()
+        blob_client.download_blob.side_effect = download_blob
+        return blob_client
+
+    def _connection(self, config, blob_client):
+        with patch.object(adls_module, 'DefaultAzureCredential'), \
+             patch.object(adls_module, 'BlobServiceClient') as mock_blob_service:
+            mock_blob_service.return_value.get_blob_client.return_value = blob_client
+            return ADLSConnection(config)
+
+    def test_iter_blob_chunks_bounded_by_chunk_size(self, valid_adls_config):
+        """Test that chunks never exceed chunk_size and rebuild the blob."""
+        blob_client = self._ranged_blob_client()
+        connection = self._connection(valid_adls_config, blob_client)
+
+        chunks = list(connection.iter_blob_chunks("paper", "pdf", chunk_size=4096))
+
+        assert [len(chunk) for chunk in chunks] == [4096, 4096, 2048]
+        assert b"".join(chunks) == self.PAYLOAD
+        connection.blob_service_client.get_blob_client.assert_called_with(
+            container="test-container", blob="quant/paper.pdf"
+        )
+
+    def test_ranged_requests_are_pinned_to_etag(self, valid_adls_config):
+        """Test that windows after the first are pinned to the opening ETag."""
+        blob_client = self._ranged_blob_client()
+        connection = self._connection(valid_adls_config, blob_client)
+
+        list(connection.iter_blob_chunks("paper", "pdf", chunk_size=8192))
+
+        first, second = blob_client.download_blob.call_args_list
+        assert first.kwargs == {"offset": 0, "length": 8192}
+        assert second.kwargs["offset"] == 8192
+        assert second.kwargs["etag"] == "etag-1"
+        assert second.kwargs["match_condition"] == adls_module.MatchConditions.IfNotModified
+
+    def test_open_blob_read_and_seek(self, valid_adls_config):
+        """Test file-like reads across window boundaries and seeking."""
+        connection = self._connection(valid_adls_config, self._ranged_blob_client())
+
+        with connection.open_blob("paper", "pdf", chunk_size=1000) as reader:
+            assert reader.size == len(self.PAYLOAD)
+            assert reader.read(10) == self.PAYLOAD[:10]
+            reader.seek(995)
+            assert reader.read(10) == self.PAYLOAD[995:1005]
+            reader.seek(-5, 2)
+            assert reader.read() == self.PAYLOAD[-5:]
+            assert reader.read(1) == b""
+            reader.seek(0)
+            assert reader.read() == self.PAYLOAD
+
+    def test_open_blob_empty(self, valid_adls_config):
+        """Test that an empty blob, whose ranged reads fail with 416, reads as empty."""
+        blob_client = Mock()
+        blob_client.download_blob.side_effect = adls_module.HttpResponseError(
+            "Requested Range Not Satisfiable", response=Mock(status_code=416)
+        )
+        blob_client.get_blob_properties.return_value = SimpleNamespace(size=0, etag="etag-empty")
+        connection = self._connection(valid_adls_config, blob_client)
+
+        assert list(connection.iter_blob_chunks("empty", "txt")) == []
+        with connection.open_blob("empty", "txt") as reader:
+            assert reader.read() == b""
+            assert reader.etag == "etag-empty"
+
+    def test_open_blob_keeps_recent_windows(self, valid_adls_config):
+        """Test that aligned windows are reused while cached and refetched once evicted."""
+        blob_client = self._ranged_blob_client()
+        connection = self._connection(valid_adls_config, blob_client)
+
+        with connection.open_blob("paper", "pdf", chunk_size=1000, max_windows=2) as reader:
+            reader.seek(-10, 2)
+            assert reader.read() == self.PAYLOAD[-10:]
+            reader.seek(5)
+            assert reader.read(5) == self.PAYLOAD[5:10]
+            assert reader.fetch_count == 2
+            reader.seek(5000)
+            reader.read(1)
+            reader.seek(10000)
+            reader.read(1)
+
+        offsets = [call.kwargs["offset"] for call in blob_client.download_blob.call_args_list]
+        assert offsets == [0, 10000, 5000, 10000]
+        assert reader.bytes_fetched == 1000 + 240 + 1000 + 240
+
+    def test_read_blob_range(self, valid_adls_config):
+        """Test that a range is one ranged request and that ranges past the end are clipped."""
+        blob_client = self._ranged_blob_client()
+        connection = self._connection(valid_adls_config, blob_client)
+
+        assert connection.read_blob_range("paper", "pdf", offset=100, length=50) == self.PAYLOAD[100:150]
+        assert connection.read_blob_range("paper", "pdf", offset=10200, length=100) == self.PAYLOAD[10200:]
+        blob_client.download_blob.assert_any_call(offset=100, length=50, max_concurrency=4)
+        connection.read_blob_range("paper", "pdf", offset=0, length=10, etag="etag-1")
+        pinned = blob_client.download_blob.call_args.kwargs
+        assert pinned["etag"] == "etag-1"
+        assert pinned["match_condition"] == adls_module.MatchConditions.IfNotModified
+        assert connection.read_blob_range("paper", "pdf", offset=5, length=0) == b""
+        assert blob_client.download_blob.call_count == 3
+        with pytest.raises(ValueError):
+            connection.read_blob_range("paper", "pdf", offset=-1)
+
+    def test_read_blob_range_past_end(self, valid_adls_config):
+        """Test that an unsatisfiable range (416) reads as empty and other errors raise."""
+        blob_client = Mock()
+        blob_client.download_blob.side_effect = adls_module.HttpResponseError(
+            "Requested Range Not Satisfiable", response=Mock(status_code=416)
+        )
+        connection = self._connection(valid_adls_config, blob_client)
+
+        assert connection.read_blob_range("paper", "pdf", offset=20000, length=10) == b""
+        blob_client.download_blob.side_effect = adls_module.HttpResponseError(
+            "Forbidden", response=Mock(status_code=403)
+        )
+        with pytest.raises(adls_module.HttpResponseError):
+            connection.read_blob_range("paper", "pdf", offset=0, length=10)
+
+
+class TestManifestReads:
+    """Test cases for reads resolved through the manifest."""
+
+    @staticmethod
+    def _manifest():
+        manifest = BlobManifest()
+        manifest.apply_listing([
+            SimpleNamespace(name="quant/paper.json", size=4, etag="e", last_modified=datetime(2024, 1, 1, tzinfo=timezone.utc)),
+        ])
+        return manifest
+
+    def test_missing_document_skips_network(self, valid_adls_config):
+        """Test that a document absent from the manifest is rejected locally."""
+        with patch.object(adls_module, 'DefaultAzureCredential'), \
+             patch.object(adls_module, 'BlobServiceClient') as mock_blob_service, \
+             patch.object(adls_module.logging, 'error'):
+
+            connection = ADLSConnection(valid_adls_config, manifest=self._manifest())
+
+            assert connection.read_blob_content("paper", "pdf") is None
+            assert connection.read_blob_content("missing", None) is None
+            mock_blob_service.return_value.get_blob_client.assert_not_called()
+
+    def test_extension_resolved_from_manifest(self, valid_adls_config):
+        """Test that a None extension is resolved before downloading."""
+        blob_data = Mock()
+        blob_data.readall.return_value = b"{}"
+        with patch.object(adls_module, 'DefaultAzureCredential'), \
+             patch.object(adls_module, 'BlobServiceClient') as mock_blob_service:
+            service = mock_blob_service.return_value
+            service.get_blob_client.return_value.download_blob.return_value = blob_data
+
+            connection = ADLSConnection(valid_adls_config, manifest=self._manifest())
+
+            assert connection.read_blob_content("paper", None) == "{}"
+            service.get_blob_client.assert_called_once_with(container="test-container", blob="quant/paper.json")
+
+    def test_list_blobs_uses_quant_prefix(self, valid_adls_config):
+        """Test that listing is scoped to the quant/ prefix of the container."""
+        with patch.object(adls_module, 'DefaultAzureCredential'), \
+             patch.object(adls_module, 'BlobServiceClient') as mock_blob_service:
+            container_client = mock_blob_service.return_value.get_container_client.return_value
+            container_client.list_blobs.return_value = iter(["blob"])
+
+            connection = ADLSConnection(valid_adls_config)
+
+            assert list(connection.list_blobs()) == ["blob"]
+            mock_blob_service.return_value.get_container_client.assert_called_once_with("test-container")
+            container_client.list_blobs.assert_called_once_with(name_starts_with="quant/")
+
+
+class TestUploads:
+    """Test cases for single and batched blob writes."""
+
+    PAYLOAD = bytes(range(256)) * 40  # 10240 bytes
+
+    @staticmethod
+    def _connection(**settings):
+        settings.setdefault("upload_block_size", 1024)
+        settings.setdefault("max_single_upload_size", 4096)
+        config = ADLSConfig(container_name="outputs", backend="memory", **settings)
+        store = MemoryBackend()
+        return ADLSConnection(config, backend=store, cache=BlobCache()), store
+
+    def test_small_payload_is_one_request(self):
+        """Test that payloads up to max_single_upload_size skip block staging."""
+        connection, store = self._connection()
+
+        result = connection.upload_blob("summary", "Momentum crashes", "txt", content_type="text/plain")
+
+        assert result.ok and result.blocks == 0 and result.size == 16
+        assert connection.read_blob_content("summary", "txt") == "Momentum crashes"
+        assert result.etag == store.entry("quant/summary.txt")[1].etag
+
+    @pytest.mark.parametrize("source", ["bytes", "file", "generator"])
+    def test_large_payload_is_staged_in_blocks(self, source):
+        """Test that large payloads from any source are staged in blocks and committed."""
+        connection, store = self._connection()
+        data = {
+            "bytes": self.PAYLOAD,
+            "file": io.BytesIO(self.PAYLOAD),
+            "generator": (self.PAYLOAD[i:i + 700] for i in range(0, len(self.PAYLOAD), 700)),
+        }[source]
+
+        result = connection.upload_blob("report", data, "bin")
+
+        assert result.blocks == 10 and result.size == len(self.PAYLOAD)
+        assert bytes(store.get_blob_client("outputs", "quant/report.bin").download_blob().readall()) == self.PAYLOAD
+        assert store.staged_blocks("quant/report.bin") == []
+
+    def test_overwrite_false_keeps_existing_blob(self):
+        """Test that overwrite=False fails with 409 on both write paths."""
+        connection, _ = self._connection()
+        connection.upload_blob("report", self.PAYLOAD, "bin")
+
+        for data in (b"small", self.PAYLOAD[::-1]):
+            with pytest.raises(ResourceExistsError):
+                connection.upload_blob("report", data, "bin", overwrite=False)
+        assert connection.read_blob_range("report", "bin") == self.PAYLOAD
+
+    def test_upload_discards_cached_content(self):
+        """Test that a write drops the cached copy so the next read sees it."""
+        connection, _ = self._connection()
+        connection.upload_blob("summary", "first", "txt")
+        assert connection.read_blob_content("summary", "txt") == "first"
+
+        connection.upload_blob("summary", "second", "txt")
+
+        assert connection.read_blob_content("summary", "txt") == "second"
+
+    def test_upload_many_keeps_order_and_reports_errors(self):
+        """Test that a batch returns results in input order with per-item errors."""
+        connection, _ = self._connection(max_workers=4)
+        connection.upload_blob("taken", "existing", "txt")
+        items = [(f"note-{i}", f"note {i}") for i in range(8)] + [("taken", "new"), ("large", self.PAYLOAD)]
+
+        results = connection.upload_many(items, overwrite=False)
+
+        assert [result.index for result in results] == list(range(10))
+        assert [result.blob_path for result in results] == [name for name, _ in items]
+        assert isinstance(results[8].error, ResourceExistsError)
+        assert results[9].blocks == 10
+        assert all(result.ok for i, result in enumerate(results) if i != 8)
+        assert connection.read_blob_content("note-5", "txt") == "note 5"
+        assert connection.upload_many([]) == []
+
+
+class TestClientRegistry:
+    """Test cases for the shared client registry."""
+
+    def test_connections_share_client_and_credential(self, valid_adls_config):
+        """Test that connections to the same account reuse one client."""
+        with patch.object(adls_module, 'DefaultAzureCredential') as mock_credential, \
+             patch.object(adls_module, 'BlobServiceClient') as mock_blob_service:
+
+            first = ADLSConnection(valid_adls_config)
+            second = ADLSConnection(valid_adls_config)
+
+            assert first.blob_service_client is second.blob_service_client
+            mock_credential.assert_called_once()
+            mock_blob_service.assert_called_once()
+
+    def test_credential_shared_across_accounts(self):
+        """Test that one credential serves several storage accounts."""
+        registry = ClientRegistry()
+        with patch.object(adls_module, 'DefaultAzureCredential') as mock_credential, \
+             patch.object(adls_module, 'BlobServiceClient') as mock_blob_service:
+            mock_blob_service.side_effect = lambda **kwargs: Mock()
+
+            first = registry.get_client("https://one.blob.core.windows.net")
+            second = registry.get_client("https://two.blob.core.windows.net")
+
+            assert first is not second
+            assert len(registry) == 2
+            mock_credential.assert_called_once()
+
+    def test_pool_size_from_config(self):
+        """Test that the shared session pool is sized from the configuration."""
+        config = ADLSConfig(
+            adls_url="https://teststorage.blob.core.windows.net",
+            container_name="test-container",
+            max_connections=32
+        )
+        with patch.object(adls_module, 'DefaultAzureCredential'), \
+             patch.object(adls_module, 'BlobServiceClient') as mock_blob_service:
+
+            ADLSConnection(config)
+
+            session = mock_blob_service.call_args.kwargs["session"]
+            assert session.get_adapter("https://x")._pool_maxsize == 32
+
+    def test_close_releases_and_rebuilds(self, valid_adls_config):
+        """Test that closing the registry closes clients and later reads rebuild them."""
+        with patch.object(adls_module, 'DefaultAzureCredential') as mock_credential, \
+             patch.object(adls_module, 'BlobServiceClient') as mock_blob_service:
+
+            ADLSConnection(valid_adls_config)
+            adls_module.close_shared_clients()
+
+            mock_blob_service.return_value.close.assert_called_once()
+            mock_credential.return_value.close.assert_called_once()
+
+            ADLSConnection(valid_adls_config)
+            assert mock_blob_service.call_count == 2
+
+    def test_identity_change_builds_new_client(self, valid_adls_config):
+        """Test that a different service principal does not reuse another identity's client."""
+        with patch.object(adls_module, 'DefaultAzureCredential') as mock_credential, \
+             patch.object(adls_module, 'BlobServiceClient'):
+
+            with patch.dict(os.environ, {'AZURE_CLIENT_ID': 'app-one'}):
+                ADLSConnection(valid_adls_config)
+            with patch.dict(os.environ, {'AZURE_CLIENT_ID': 'app-two'}):
+                ADLSConnection(valid_adls_config)
+
+            assert mock_credential.call_count == 2
+
+
+class TestAsyncADLSConnection:
+    """Test cases for the asyncio connection."""
+
+    @staticmethod
+    def _mock_async_service(contents):
+        """Build an aio service client mock serving ``contents`` keyed by blob path."""
+        def get_blob_client(container, blob):
+            blob_client = Mock()
+            if isinstance(contents[blob], Exception):
+                blob_client.download_blob = AsyncMock(side_effect=contents[blob])
+            else:
+                downloader = Mock()
+                downloader.readall = AsyncMock(return_value=contents[blob])
+                blob_client.download_blob = AsyncMock(return_value=downloader)
+            return blob_client
+
+        service = Mock()
+        service.get_blob_client.side_effect = get_blob_client
+        service.close = AsyncMock()
+        return service
+
+    def test_read_blob_content_success(self, valid_adls_config):
+        """Test awaiting a single blob read."""
+        service = self._mock_async_service({"quant/test-paper.pdf": b"Async content"})
+        with patch.object(adls_module, 'AsyncDefaultAzureCredential'), \
+             patch.object(adls_module, 'AsyncBlobServiceClient', return_value=service):
+
+            connection = AsyncADLSConnection(valid_adls_config)
+            result = asyncio.run(connection.read_blob_content("test-paper", "pdf"))
+
+            assert result == "Async content"
+            service.get_blob_client.assert_called_once_with(
+                container="test-container",
+                blob="quant/test-paper.pdf"
+            )
+
+    def test_read_blob_content_exception(self, valid_adls_config):
+        """Test that a failed async read is logged and returns None."""
+        service = self._mock_async_service({"quant/missing.pdf": Exception("Blob not found")})
+        with patch.object(adls_module, 'AsyncDefaultAzureCredential'), \
+             patch.object(adls_module, 'AsyncBlobServiceClient', return_value=service), \
+             patch.object(adls_module.logging, 'error') as mock_logging:
+
+            connection = AsyncADLSConnection(valid_adls_config)
+            result = asyncio.run(connection.read_blob_content("missing", "pdf"))
+
+            assert result is None
+            assert "Error reading blob" in mock_logging.call_args[0][0]
+
+    def test_read_blob_contents_preserves_order(self, valid_adls_config):
+        """Test that the multi-read returns results in input order."""
+        service = self._mock_async_service({
+            "quant/a.json": b"A",
+            "quant/b.json": Exception("boom"),
+            "quant/c.json": b"C",
+        })
+        with patch.object(adls_module, 'AsyncDefaultAzureCredential'), \
+             patch.object(adls_module, 'AsyncBlobServiceClient', return_value=service), \
+             patch.object(adls_module.logging, 'error'):
+
+            connection = AsyncADLSConnection(valid_adls_config)
+            result = asyncio.run(connection.read_blob_contents(["a", "b", "c"], "json"))
+
+            assert result == ["A", None, "C"]
+
+    def test_read_blob_contents_respects_concurrency_limit(self):
+        """Test that no more than max_concurrency downloads run at once."""
+        config = ADLSConfig(
+            adls_url="https://teststorage.blob.core.windows.net",
+            container_name="test-container",
+            max_concurrency=3
+        )
+        active = 0
+        peak = 0
+
+        async def slow_readall():
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            return b"x"
+
+        downloader = Mock()
+        downloader.readall = slow_readall
+        blob_client = Mock()
+        blob_client.download_blob = AsyncMock(return_value=downloader)
+        service = Mock()
+        service.get_blob_client.return_value = blob_client
+
+        with patch.object(adls_module, 'AsyncDefaultAzureCredential'), \
+             patch.object(adls_module, 'AsyncBlobServiceClient', return_value=service):
+
+            connection = AsyncADLSConnection(config)
+            result = asyncio.run(connection.read_blob_contents([str(i) for i in range(12)]))
+
+            assert result == ["x"] * 12
+            assert peak == 3
+
+    def test_async_context_manager_closes(self, valid_adls_config):
+        """Test that leaving the context closes client and credential."""
+        service = self._mock_async_service({})
+        with patch.object(adls_module, 'AsyncDefaultAzureCredential') as mock_credential, \
+             patch.object(adls_module, 'AsyncBlobServiceClient', return_value=service):
+            mock_credential.return_value.close = AsyncMock()
+
+            async def run():
+                async with AsyncADLSConnection(valid_adls_config):
+                    pass
+
+            asyncio.run(run())
+
+            service.close.assert_awaited_once()
+            mock_credential.return_value.close.assert_awaited_once()
+
+    @patch.dict(os.environ, {}, clear=True)
+    def test_init_missing_environment_variables(self):
+        """Test that the async connection applies the same environment validation."""
+        with patch.object(adls_module.dotenv, 'load_dotenv'):
+            with pytest.raises(ValueError) as exc_info:
+                AsyncADLSConnection()
+
+            assert "ADLS_URL and AZURE_STORAGE_CONTAINER_NAME must be set" in str(exc_info.value)
+
 
 class TestLegacyFunction:
     """Test cases for the legacy function."""
@@ -262,5 +1039,40 @@ class TestLegacyFunction:
             assert "Error in legacy function" in mock_logging.call_args[0][0]
 
 
+class TestLazyLoading:
+    """Test cases for deferred imports and warmup."""
+
+    @patch.dict(os.environ, {'ADLS_URL': 'https://teststorage.blob.core.windows.net'})
+    def test_module_attributes_resolve_on_first_access(self):
+        """Test that SDK names and the legacy environment globals are resolved lazily."""
+        from azure.storage.blob import BlobServiceClient
+
+        assert adls_module.BlobServiceClient is BlobServiceClient
+        assert adls_module.ADLS_URL == 'https://teststorage.blob.core.windows.net'
+        with pytest.raises(AttributeError):
+            adls_module.not_a_module_attribute
+
+    def test_warmup_lists_one_blob_in_background(self, valid_adls_config):
+        """Test that warmup builds the shared client and makes one authenticated request."""
+        with patch.object(adls_module, 'DefaultAzureCredential'), \
+             patch.object(adls_module, 'BlobServiceClient') as mock_blob_service:
+            thread = adls_module.warmup(valid_adls_config, wait=True)
+
+            container_client = mock_blob_service.return_value.get_container_client.return_value
+            container_client.list_blobs.assert_called_once_with(name_starts_with="quant/", results_per_page=1)
+            assert not thread.is_alive()
+            assert len(adls_module._client_registry) == 1
+
+    def test_warmup_failure_is_logged(self, valid_adls_config):
+        """Test that a failing warmup only logs a warning."""
+        with patch.object(adls_module, 'DefaultAzureCredential'), \
+             patch.object(adls_module, 'BlobServiceClient') as mock_blob_service, \
+             patch.object(adls_module.logging, 'warning') as mock_warning:
+            mock_blob_service.return_value.get_container_client.side_effect = Exception("no network")
+            adls_module.warmup(valid_adls_config, wait=True)
+
+        assert "ADLS warmup failed" in mock_warning.call_args[0][0]
+
+
 if __name__ == "__main__":
     pytest.main([__file__])
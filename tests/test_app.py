@@ -0,0 +1,240 @@
+"""
+Unit tests for the JSON-RPC tool service.
+"""
+import os
+import sys
+import time
+import asyncio
+import threading
+import importlib.util
+import aiohttp
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+spec = importlib.util.spec_from_file_location("adls_connection",
+                                              os.path.join(os.path.dirname(__file__), '..', 'src', 'adls-connection.py'))
+adls_module = importlib.util.module_from_spec(spec)
+sys.modules['adls_connection'] = adls_module
+spec.loader.exec_module(adls_module)
+
+from app import (
+    INTERNAL_ERROR,
+    INVALID_PARAMS,
+    METHOD_NOT_FOUND,
+    READ_FAILED,
+    SERVER_BUSY,
+    AppConfig,
+    ToolService,
+)
+from instrumentation import Instrumentation, MetricsRegistry, set_instrumentation
+from storage_backends import MemoryBackend
+
+
+class GatedConnection:
+    """Connection whose reads block until released, to hold calls in flight."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.started = threading.Semaphore(0)
+        self.closed = False
+
+    def read_blob_content(self, blob_path, file_extension="pdf"):
+        self.started.release()
+        self.release.wait(5)
+        return f"content of {blob_path}"
+
+    def close(self):
+        self.closed = True
+
+
+def memory_connection():
+    config = adls_module.ADLSConfig(container_name="papers", backend="memory")
+    store = MemoryBackend({"quant/momentum.pdf": "Momentum crashes", "quant/value.pdf": "Value premium"})
+    return adls_module.ADLSConnection(config, backend=store)
+
+
+def run_service(service, scenario):
+    """Start the service on a free port, run ``scenario(session, url)`` and stop the service."""
+    async def main():
+        port = await service.start()
+        try:
+            async with aiohttp.ClientSession() as session:
+                return await scenario(session, f"http://127.0.0.1:{port}")
+        finally:
+            await service.stop()
+
+    return asyncio.run(main())
+
+
+def rpc(method, params=None, call_id=1):
+    call = {"jsonrpc": "2.0", "method": method, "params": params or {}}
+    if call_id is not None:
+        call["id"] = call_id
+    return call
+
+
+class TestToolService:
+    """Test cases for JSON-RPC dispatch."""
+
+    def test_read_paper(self):
+        """Test a single call served from the shared connection."""
+        service = ToolService(AppConfig(port=0), connection=memory_connection())
+
+        async def scenario(session, url):
+            async with session.post(f"{url}/rpc", json=rpc("read_paper", {"paper": "momentum"})) as response:
+                return response.status, await response.json()
+
+        status, body = run_service(service, scenario)
+        assert status == 200
+        assert body == {
+            "jsonrpc": "2.0",
+            "id": 1,
+            "result": {"paper": "momentum", "extension": "pdf", "content": "Momentum crashes"},
+        }
+
+    def test_batch_with_errors_and_notifications(self):
+        """Test that a batch answers every call with an id, in order, with per-call errors."""
+        service = ToolService(AppConfig(port=0), connection=memory_connection())
+        batch = [
+            rpc("read_papers", {"papers": ["momentum", "missing"]}, call_id=1),
+            rpc("read_paper", {"paper": ""}, call_id=2),
+            rpc("nope", call_id=3),
+            rpc("ping", call_id=None),
+            rpc("ping", [], call_id=4),
+        ]
+
+        async def scenario(session, url):
+            async with session.post(f"{url}/rpc", json=batch) as response:
+                return await response.json()
+
+        body = run_service(service, scenario)
+        assert [item["id"] for item in body] == [1, 2, 3, 4]
+        papers = body[0]["result"]
+        assert papers[0]["content"] == "Momentum crashes"
+        assert papers[1]["error"]["code"] == READ_FAILED
+        assert body[1]["error"]["code"] == INVALID_PARAMS
+        assert body[2]["error"]["code"] == METHOD_NOT_FOUND
+        assert body[3]["result"] == "pong"
+
+    def test_params_mismatch_and_tool_bugs(self):
+        """Test that only params not matching the signature are INVALID_PARAMS, not TypeErrors raised by a tool."""
+        connection = GatedConnection()
+        connection.release.set()
+        connection.read_blob_content = lambda blob_path, file_extension="pdf": len(None)
+        service = ToolService(AppConfig(port=0), connection=connection)
+        calls = [
+            rpc("read_paper", {"paper": "momentum", "pages": 3}, call_id=1),
+            rpc("read_paper", [], call_id=2),
+            rpc("read_paper", {"paper": "momentum"}, call_id=3),
+        ]
+
+        async def scenario(session, url):
+            async with session.post(f"{url}/rpc", json=calls) as response:
+                return await response.json()
+
+        unknown, missing, bug = run_service(service, scenario)
+        assert unknown["error"]["code"] == INVALID_PARAMS
+        assert missing["error"]["code"] == INVALID_PARAMS
+        assert bug["error"]["code"] == INTERNAL_ERROR
+
+    def test_malformed_requests(self):
+        """Test parse errors, invalid requests and the unconfigured search method."""
+        service = ToolService(AppConfig(port=0), connection=memory_connection())
+
+        async def scenario(session, url):
+            bodies = []
+            for payload in (b"{not json", b'{"id": 1}', b"[]"):
+                async with session.post(f"{url}/rpc", data=payload) as response:
+                    bodies.append(await response.json())
+            async with session.post(f"{url}/rpc", json=rpc("search_web", {"query": "carry"})) as response:
+                bodies.append(await response.json())
+            return bodies
+
+        parse, invalid, empty, search = run_service(service, scenario)
+        assert parse["error"]["code"] == -32700
+        assert invalid["error"]["code"] == -32600
+        assert empty["error"]["code"] == -32600
+        assert search["error"]["code"] == METHOD_NOT_FOUND
+
+
+class TestBackpressure:
+    """Test cases for admission control and shutdown."""
+
+    def test_overload_is_rejected_fast(self):
+        """Test that calls beyond max_in_flight get an immediate busy error and 503."""
+        connection = GatedConnection()
+        service = ToolService(AppConfig(port=0, max_workers=2, max_in_flight=2), connection=connection)
+
+        async def scenario(session, url):
+            held = [
+                asyncio.ensure_future(session.post(f"{url}/rpc", json=rpc("read_paper", {"paper": f"p{i}"})))
+                for i in range(2)
+            ]
+            for _ in range(2):
+                await asyncio.to_thread(connection.started.acquire, True, 5)
+            start = time.perf_counter()
+            async with session.post(f"{url}/rpc", json=rpc("read_paper", {"paper": "late"})) as response:
+                rejected = (response.status, response.headers.get("Retry-After"), await response.json())
+            rejected_after = time.perf_counter() - start
+            async with session.get(f"{url}/healthz") as response:
+                health = await response.json()
+            connection.release.set()
+            responses = await asyncio.gather(*held)
+            results = [await response.json() for response in responses]
+            return rejected, rejected_after, health, results
+
+        rejected, rejected_after, health, results = run_service(service, scenario)
+        status, retry_after, body = rejected
+        assert status == 503
+        assert retry_after == "1"
+        assert body["error"]["code"] == SERVER_BUSY
+        assert body["error"]["data"]["reason"] == "overloaded"
+        assert rejected_after < 0.5
+        assert health == {"status": "ok", "in_flight": 2, "max_in_flight": 2}
+        assert [result["result"]["content"] for result in results] == ["content of p0", "content of p1"]
+
+    def test_graceful_shutdown_finishes_running_calls(self):
+        """Test that stop() lets running calls answer, then closes the connection."""
+        connection = GatedConnection()
+        service = ToolService(AppConfig(port=0, shutdown_timeout=5), connection=connection)
+
+        async def main():
+            port = await service.start()
+            async with aiohttp.ClientSession() as session:
+                pending = asyncio.ensure_future(
+                    session.post(f"http://127.0.0.1:{port}/rpc", json=rpc("read_paper", {"paper": "slow"}))
+                )
+                await asyncio.to_thread(connection.started.acquire, True, 5)
+                stopping = asyncio.ensure_future(service.stop())
+                await asyncio.sleep(0.05)
+                assert not stopping.done()
+                connection.release.set()
+                response = await pending
+                body = await response.json()
+                await stopping
+                return body
+
+        body = asyncio.run(main())
+        assert body["result"]["content"] == "content of slow"
+        assert connection.closed
+        assert service.in_flight == 0
+
+    def test_metrics_endpoint(self):
+        """Test that call counters are exposed when a registry is given."""
+        metrics = MetricsRegistry()
+        set_instrumentation(Instrumentation([metrics]))
+        try:
+            service = ToolService(AppConfig(port=0), connection=memory_connection(), metrics=metrics)
+
+            async def scenario(session, url):
+                async with session.post(f"{url}/rpc", json=rpc("ping")) as response:
+                    await response.json()
+                async with session.get(f"{url}/metrics") as response:
+                    return await response.text()
+
+            text = run_service(service, scenario)
+        finally:
+            set_instrumentation(None)
+        assert 'app_calls_total{method="ping",outcome="ok"} 1' in text
+        assert 'adls_phase_seconds_count{outcome="ok",phase="tool_call"} 1' in text
@@ -0,0 +1,54 @@
+"""
+Tests of the read-path benchmark harness.
+"""
+import os
+import sys
+import json
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from benchmark import main, parse_size, percentile
+
+
+class TestBenchmarkHelpers:
+    """Test cases for the statistics helpers."""
+
+    def test_percentile(self):
+        """Test interpolated percentiles."""
+        values = [float(value) for value in range(1, 101)]
+        assert percentile(values, 50) == 50.5
+        assert percentile(values, 99) == 99.01
+        assert percentile([], 95) == 0.0
+
+    def test_parse_size(self):
+        """Test size suffixes."""
+        assert parse_size("512") == 512
+        assert parse_size("16k") == 16384
+        assert parse_size("1.5m") == 1572864
+
+
+class TestBenchmarkRun:
+    """Test cases for a small end-to-end run against the fake server."""
+
+    def test_report(self, tmp_path):
+        """Test that every cell is reported in the JSON output."""
+        output = tmp_path / "bench.json"
+        main([
+            "--sizes", "1k,64k",
+            "--concurrency", "1,4",
+            "--requests", "8",
+            "--latency-ms", "1",
+            "--seed", "7",
+            "--output", str(output),
+        ])
+
+        report = json.loads(output.read_text())
+        cells = {(r["scenario"], r["blob_size"], r["concurrency"]) for r in report["results"]}
+        assert len(cells) == 8
+        for result in report["results"]:
+            assert result["errors"] == 0
+            assert result["requests"] == 8
+            assert result["latency_ms"]["p50"] <= result["latency_ms"]["p99"]
+            assert result["throughput_rps"] > 0
+        assert report["faults"]["latency"] == 0.001
@@ -0,0 +1,268 @@
+"""
+Unit tests for the Bing search client against the local stub server.
+"""
+import os
+import sys
+import json
+import time
+import importlib.util
+import pytest
+from unittest.mock import Mock, patch
+from pydantic import ValidationError
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+# Import the module using importlib due to dash in filename
+spec = importlib.util.spec_from_file_location("bing_connection",
+                                              os.path.join(os.path.dirname(__file__), '..', 'src', 'bing-conncetion.py'))
+bing_module = importlib.util.module_from_spec(spec)
+sys.modules['bing_connection'] = bing_module
+spec.loader.exec_module(bing_module)
+
+from fake_search_server import FakeSearchServer
+
+BingConfig = bing_module.BingConfig
+BingConnection = bing_module.BingConnection
+QueryCache = bing_module.QueryCache
+TokenBucket = bing_module.TokenBucket
+
+
+class FakeClock:
+    """Manually advanced clock whose sleep moves time forward."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def server():
+    with FakeSearchServer() as running:
+        yield running
+
+
+def make_config(server, **settings):
+    settings.setdefault("requests_per_second", 1000)
+    return BingConfig(api_key="test-key", endpoint=server.url, allow_insecure_http=True, **settings)
+
+
+class TestBingConfig:
+    """Test cases for the configuration model."""
+
+    def test_defaults(self):
+        """Test that the public endpoint and conservative quota are the defaults."""
+        config = BingConfig(api_key="s3cr3t")
+        assert config.endpoint == bing_module.BING_SEARCH_URL
+        assert config.requests_per_second == 3.0
+        assert "s3cr3t" not in repr(config)
+
+    def test_validation(self):
+        """Test rejected keys, endpoints and counts."""
+        with pytest.raises(ValidationError):
+            BingConfig(api_key="  ")
+        with pytest.raises(ValidationError):
+            BingConfig(api_key="key", endpoint="http://localhost:8080/v7.0/search")
+        with pytest.raises(ValidationError):
+            BingConfig(api_key="key", count=51)
+
+    @patch.dict(os.environ, {}, clear=True)
+    def test_missing_environment_variables(self):
+        """Test that a connection without config requires the key in the environment."""
+        with patch("dotenv.load_dotenv"):
+            with pytest.raises(ValueError) as exc_info:
+                BingConnection()
+        assert "BING_SEARCH_API_KEY must be set" in str(exc_info.value)
+
+
+class TestQueryCache:
+    """Test cases for the TTL + LRU cache."""
+
+    def test_entries_expire_after_ttl(self):
+        """Test that an entry is served until its TTL and then counted as expired."""
+        clock = FakeClock()
+        cache = QueryCache(max_entries=10, ttl=60, clock=clock)
+        response = bing_module.SearchResponse("momentum", ())
+        cache.put("k", response)
+
+        clock.now = 59
+        assert cache.get("k") is response
+        clock.now = 60
+        assert cache.get("k") is None
+        assert cache.stats.as_dict() == {"hits": 1, "misses": 1, "evictions": 0, "expirations": 1}
+
+    def test_least_recently_used_is_evicted(self):
+        """Test that the LRU entry goes first when the cache is full."""
+        cache = QueryCache(max_entries=2, ttl=60)
+        for key in ("a", "b"):
+            cache.put(key, bing_module.SearchResponse(key, ()))
+        cache.get("a")
+        cache.put("c", bing_module.SearchResponse("c", ()))
+
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.stats.evictions == 1
+
+
+class TestTokenBucket:
+    """Test cases for the rate limiter."""
+
+    def test_paces_requests_after_burst(self):
+        """Test that requests beyond the burst are spaced 1/rate apart."""
+        clock = FakeClock()
+        bucket = TokenBucket(rate=4, capacity=2, clock=clock, sleep=clock.sleep)
+        waits = [bucket.acquire() for _ in range(5)]
+
+        assert waits[:2] == [0, 0]
+        assert waits[2:] == pytest.approx([0.25, 0.25, 0.25])
+
+    def test_pause_holds_callers(self):
+        """Test that a Retry-After pause delays the next request to its end."""
+        clock = FakeClock()
+        bucket = TokenBucket(rate=10, capacity=1, clock=clock, sleep=clock.sleep)
+        bucket.acquire()
+        bucket.pause(2.0)
+
+        assert bucket.acquire() == pytest.approx(2.0)
+        assert bucket.acquire() == pytest.approx(0.1)
+
+
+    def test_pause_holds_callers_already_waiting(self):
+        """Test that a caller sleeping when a pause begins waits for the pause to end."""
+        clock = FakeClock()
+
+        def sleep(seconds):
+            # The 429 arrives while the caller waits for its token
+            if not clock.slept:
+                bucket.pause(2.0)
+            clock.sleep(seconds)
+
+        bucket = TokenBucket(rate=10, capacity=1, clock=clock, sleep=sleep)
+        bucket.acquire()
+
+        assert bucket.acquire() == pytest.approx(2.1)
+        assert clock.now == pytest.approx(2.1)
+        assert clock.slept == pytest.approx([0.1, 2.0])
+
+
+class TestBingConnection:
+    """Test cases for searches against the stub server."""
+
+    def test_search_parses_web_pages(self, server):
+        """Test a search and the parameters it sends."""
+        with BingConnection(make_config(server, count=3)) as connection:
+            response = connection.search("  factor   momentum ")
+
+        assert response.query == "factor momentum"
+        assert [page.url for page in response.pages] == [
+            f"https://example.org/factor-momentum/{i}" for i in (1, 2, 3)
+        ]
+        assert response.total_estimated_matches == 1000
+        assert not response.from_cache
+        assert server.queries == ["factor momentum"]
+
+    def test_repeated_query_is_served_from_cache(self, server):
+        """Test that a normalized repeat costs no request."""
+        with BingConnection(make_config(server)) as connection:
+            connection.search("Factor Momentum")
+            response = connection.search("factor  momentum")
+
+        assert response.from_cache
+        assert server.request_count == 1
+        assert connection.cache.stats.hits == 1
+
+    def test_errors_raise_without_retry(self, server):
+        """Test that a rejected request raises BingSearchError with its status."""
+        config = make_config(server)
+        with BingConnection(config) as connection:
+            with pytest.raises(ValueError):
+                connection.search("   ")
+            connection.config = config.model_copy(update={"endpoint": server.url.replace("search", "missing")})
+            with pytest.raises(bing_module.BingSearchError) as exc_info:
+                connection.search("momentum")
+
+        assert exc_info.value.status_code == 404
+        assert server.request_count == 1
+
+    def test_malformed_bodies_raise_search_error(self, server):
+        """Test that HTML or non-object bodies raise BingSearchError with the status and the body's start."""
+        html = Mock(status_code=200, text="<html>Gateway login</html>")
+        html.json.side_effect = json.JSONDecodeError("Expecting value", html.text, 0)
+        listing = Mock(status_code=200, text="[]")
+        listing.json.return_value = []
+        failed = Mock(status_code=401, text="<html>Denied</html>")
+        failed.json.side_effect = ValueError("not JSON")
+        with BingConnection(make_config(server)) as connection:
+            errors = []
+            for response in (html, listing, failed):
+                with patch.object(connection.session, "get", return_value=response):
+                    with pytest.raises(bing_module.BingSearchError) as exc_info:
+                        connection.search(f"query {len(errors)}")
+                errors.append(exc_info.value)
+
+        assert [error.status_code for error in errors] == [200, 200, 401]
+        assert "<html>Gateway login</html>" in str(errors[0])
+        assert "<html>Denied</html>" in str(errors[2])
+
+    def test_throttled_request_is_retried_after_retry_after(self, server):
+        """Test that a 429 pauses the client and the retry succeeds."""
+        server.quota = 1
+        with BingConnection(make_config(server)) as connection:
+            connection.search("first")
+            start = time.perf_counter()
+            response = connection.search("second")
+            elapsed = time.perf_counter() - start
+
+        assert response.pages
+        assert server.throttled_count >= 1
+        assert elapsed >= 0.9
+
+    def test_search_many_fans_out_within_quota(self):
+        """Test that a batch runs concurrently, dedupes queries and stays under the quota."""
+        with FakeSearchServer(latency=0.05, quota=100) as server:
+            config = make_config(server, requests_per_second=40, burst=4, max_workers=8)
+            queries = [f"sub-query {i}" for i in range(12)] + ["SUB-QUERY 3"]
+            with BingConnection(config) as connection:
+                start = time.perf_counter()
+                results = connection.search_many(queries)
+                elapsed = time.perf_counter() - start
+
+            assert [result.index for result in results] == list(range(13))
+            assert all(result.ok for result in results)
+            assert results[12].response.query == "sub-query 3"
+            assert server.request_count == 12
+            assert server.throttled_count == 0
+            # Sequential would take 12 x 50 ms; pacing at 40/s bounds the batch at ~0.2 s + latency
+            assert 0.15 < elapsed < 0.5
+
+    def test_search_many_reports_errors_per_query(self, server):
+        """Test that failed queries carry their error and the rest succeed."""
+        with BingConnection(make_config(server)) as connection:
+            results = connection.search_many(["momentum", "  "])
+
+        assert results[0].ok
+        assert isinstance(results[1].error, ValueError)
+        assert connection.search_many([]) == []
+
+
+class TestAgentTool:
+    """Test cases for the agent entry point."""
+
+    def test_returns_json_or_none(self, server):
+        """Test that the tool returns pages as JSON and None on error."""
+        connection = BingConnection(make_config(server, count=2))
+        with patch.object(bing_module, "_shared_connection", connection), \
+             patch.object(bing_module.logging, "error") as mock_logging:
+            payload = json.loads(bing_module.connected_agent_tool_search_web("value premium"))
+            assert bing_module.connected_agent_tool_search_web("") is None
+
+        assert payload["query"] == "value premium"
+        assert len(payload["pages"]) == 2
+        assert "Error searching the web" in mock_logging.call_args[0][0]
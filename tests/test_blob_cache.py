@@ -0,0 +1,160 @@
+"""
+Unit tests for the blob cache module.
+"""
+import os
+import sys
+import time
+import pytest
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from blob_cache import BlobCache, CacheEntry, DiskCache, MemoryLRUCache
+
+
+class TestMemoryLRUCache:
+    """Test cases for the in-memory tier."""
+
+    def test_get_put_and_counters(self):
+        """Test hits and misses are counted."""
+        cache = MemoryLRUCache(max_bytes=100)
+        assert cache.get("a") is None
+        cache.put("a", CacheEntry(b"abc", "etag-a"))
+        assert cache.get("a").data == b"abc"
+        assert cache.stats.hits == 1
+        assert cache.stats.misses == 1
+
+    def test_evicts_least_recently_used_by_size(self):
+        """Test that the byte budget evicts the least recently used entry."""
+        cache = MemoryLRUCache(max_bytes=10)
+        cache.put("a", CacheEntry(b"aaaa", None))
+        cache.put("b", CacheEntry(b"bbbb", None))
+        cache.get("a")
+        cache.put("c", CacheEntry(b"cccc", None))
+
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.size_bytes == 8
+        assert cache.stats.evictions == 1
+
+    def test_oversized_entry_not_cached(self):
+        """Test that an entry larger than the budget is ignored."""
+        cache = MemoryLRUCache(max_bytes=3)
+        cache.put("a", CacheEntry(b"abcd", None))
+        assert len(cache) == 0
+
+    def test_invalid_budget(self):
+        """Test that a non-positive budget is rejected."""
+        with pytest.raises(ValueError):
+            MemoryLRUCache(max_bytes=0)
+
+
+class TestDiskCache:
+    """Test cases for the on-disk tier."""
+
+    def test_roundtrip_survives_new_instance(self, tmp_path):
+        """Test that entries persist across cache instances."""
+        DiskCache(str(tmp_path)).put("key", CacheEntry(b"payload", "etag-1"))
+
+        entry = DiskCache(str(tmp_path)).get("key")
+
+        assert entry.data == b"payload"
+        assert entry.etag == "etag-1"
+
+    def test_byte_budget_eviction(self, tmp_path):
+        """Test that the least recently accessed payload is evicted first."""
+        cache = DiskCache(str(tmp_path), max_bytes=10)
+        cache.put("old", CacheEntry(b"x" * 4, None))
+        old_path, _ = cache._paths("old")
+        os.utime(old_path, (time.time() - 100, time.time() - 100))
+        cache.put("new", CacheEntry(b"y" * 4, None))
+        cache.put("newest", CacheEntry(b"z" * 4, None))
+
+        assert cache.get("old") is None
+        assert cache.get("new") is not None
+        assert cache.size_bytes <= 10
+        assert cache.stats.evictions == 1
+
+    def test_corrupt_entry_is_a_miss(self, tmp_path):
+        """Test that a truncated payload is not served."""
+        cache = DiskCache(str(tmp_path))
+        cache.put("key", CacheEntry(b"payload", None))
+        data_path, _ = cache._paths("key")
+        with open(data_path, "wb") as data_file:
+            data_file.write(b"pay")
+
+        assert cache.get("key") is None
+        assert cache.stats.misses == 1
+
+
+class TestBlobCache:
+    """Test cases for the two-tier cache."""
+
+    def test_disk_hit_promoted_to_memory(self, tmp_path):
+        """Test that a disk hit is copied into the memory tier."""
+        disk = DiskCache(str(tmp_path))
+        disk.put("key", CacheEntry(b"payload", "etag"))
+        cache = BlobCache(disk=disk)
+
+        assert cache.get("key").data == b"payload"
+        assert cache.memory.get("key") is not None
+        assert cache.counters()["cache"]["hits"] == 1
+
+    def test_ttl_freshness(self):
+        """Test that only entries younger than the TTL skip revalidation."""
+        cache = BlobCache(ttl=60)
+        assert cache.is_fresh(CacheEntry(b"x", None))
+        assert not cache.is_fresh(CacheEntry(b"x", None, stored_at=time.time() - 120))
+        assert not BlobCache().is_fresh(CacheEntry(b"x", None))
+
+    def test_revalidated_refreshes_entry(self):
+        """Test that a 304 refreshes the stored timestamp and counts a revalidation."""
+        cache = BlobCache(ttl=60)
+        stale = CacheEntry(b"x", "etag", stored_at=time.time() - 120)
+
+        cache.revalidated("key", stale)
+
+        assert cache.is_fresh(cache.get("key"))
+        assert cache.stats.revalidations == 1
+
+    def test_revalidated_rewrites_only_disk_metadata(self, tmp_path):
+        """Test that a 304 refreshes the disk entry's timestamp without rewriting its payload."""
+        disk = DiskCache(str(tmp_path))
+        stale = CacheEntry(b"payload", "etag", stored_at=time.time() - 120)
+        disk.put("key", stale)
+        data_path, _ = disk._paths("key")
+        before = os.stat(data_path)
+        cache = BlobCache(disk=disk, ttl=60)
+
+        cache.revalidated("key", stale)
+
+        assert os.stat(data_path).st_ino == before.st_ino
+        assert os.stat(data_path).st_mtime_ns == before.st_mtime_ns
+        assert cache.is_fresh(DiskCache(str(tmp_path)).get("key"))
+        assert cache.memory.get("key").data is stale.data
+        cache.revalidated("missing", stale)
+        assert "missing" not in disk
+
+    def test_discard_drops_every_tier(self, tmp_path):
+        """Test that a discarded key is gone from memory and disk."""
+        cache = BlobCache(disk=DiskCache(str(tmp_path)))
+        cache.put("key", b"payload", "etag")
+
+        cache.discard("key")
+        cache.discard("never-stored")
+
+        assert cache.memory.get("key") is None
+        assert cache.disk.get("key") is None
+        assert len(cache.memory) == 0
+
+    def test_contains_does_not_count_lookups(self, tmp_path):
+        """Test that membership checks see both tiers and leave the statistics alone."""
+        disk = DiskCache(str(tmp_path))
+        disk.put("on-disk", CacheEntry(b"payload", "etag"))
+        cache = BlobCache(disk=disk)
+        cache.put("in-memory", b"payload", "etag")
+
+        assert "on-disk" in cache and "in-memory" in cache
+        assert "missing" not in cache
+        assert cache.counters()["cache"] == {"hits": 0, "misses": 0, "evictions": 0, "revalidations": 0}
+        assert disk.stats.hits == 0
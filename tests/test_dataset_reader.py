@@ -0,0 +1,209 @@
+"""
+Unit tests for the Parquet/CSV dataset reader.
+"""
+import io
+import os
+import sys
+import random
+import contextvars
+import datetime
+import importlib.util
+import pytest
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+pa = pytest.importorskip("pyarrow")
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+spec = importlib.util.spec_from_file_location("adls_connection",
+                                              os.path.join(os.path.dirname(__file__), '..', 'src', 'adls-connection.py'))
+adls_module = importlib.util.module_from_spec(spec)
+sys.modules['adls_connection'] = adls_module
+spec.loader.exec_module(adls_module)
+
+from dataset_reader import BlobRangeFile, DatasetReader
+from fake_blob_server import ACCOUNT_KEY, FakeBlobServer
+from instrumentation import Instrumentation, MetricsRegistry, SpanRecorder
+from storage_backends import MemoryBackend
+
+TICKERS = [f"T{i:03d}" for i in range(50)]
+START = datetime.date(2020, 1, 1)
+
+
+def prices(days=400):
+    """Daily bars of every ticker, sorted by date like a time-partitioned file."""
+    rng = random.Random(7)
+    rows = days * len(TICKERS)
+    return pa.table({
+        "date": [START + datetime.timedelta(days=i // len(TICKERS)) for i in range(rows)],
+        "ticker": [TICKERS[i % len(TICKERS)] for i in range(rows)],
+        "close": [rng.uniform(10, 500) for _ in range(rows)],
+        "volume": [rng.randint(0, 10 ** 6) for _ in range(rows)],
+        "momentum": [rng.gauss(0, 1) for _ in range(rows)],
+        "value": [rng.gauss(0, 1) for _ in range(rows)],
+    })
+
+
+def parquet_bytes(table, row_group_size=1000):
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer, row_group_size=row_group_size)
+    return buffer.getvalue()
+
+
+def csv_bytes(table):
+    buffer = io.BytesIO()
+    pa_csv.write_csv(table, buffer)
+    return buffer.getvalue()
+
+
+@pytest.fixture(scope="module")
+def table():
+    return prices()
+
+
+@pytest.fixture
+def metrics():
+    return MetricsRegistry()
+
+
+@pytest.fixture
+def connection(table, metrics):
+    config = adls_module.ADLSConfig(container_name="market", backend="memory", chunk_size=64 * 1024)
+    backend = MemoryBackend({
+        "quant/prices.parquet": parquet_bytes(table),
+        "quant/prices.csv": csv_bytes(table.slice(0, 5000)),
+    })
+    return adls_module.ADLSConnection(config, backend=backend, instrumentation=Instrumentation([metrics]))
+
+
+def expected(table, start, end, tickers, columns):
+    mask = pc.and_(
+        pc.and_(pc.greater_equal(table["date"], start), pc.less_equal(table["date"], end)),
+        pc.is_in(table["ticker"], pa.array(tickers)),
+    )
+    return table.filter(mask).select(columns)
+
+
+class TestParquet:
+    """Test cases for pruned, projected Parquet reads."""
+
+    def test_read_pushes_down_projection_and_predicates(self, connection, table, metrics):
+        """Test that a date/ticker slice matches a local filter and fetches a fraction of the file."""
+        size = connection.get_blob_properties("prices", "parquet").size
+        result = DatasetReader(connection).read(
+            "prices", columns=["date", "ticker", "close"],
+            date_range=("2020-06-01", "2020-06-10"), tickers=["T001", "T042"],
+        )
+
+        start, end = datetime.date(2020, 6, 1), datetime.date(2020, 6, 10)
+        assert result.equals(expected(table, start, end, ["T001", "T042"], ["date", "ticker", "close"]))
+        assert result.num_rows == 20
+        assert metrics.counter("dataset_row_groups_total", outcome="read") == 2
+        assert metrics.counter("dataset_row_groups_total", outcome="pruned") == 18
+        assert metrics.counter("adls_bytes_transferred_total") < size // 4
+
+    def test_plan_reports_pruned_row_groups(self, connection):
+        """Test that a plan reads only the footer and sizes the needed column chunks."""
+        reader = DatasetReader(connection)
+        full = reader.plan("prices")
+        narrow = reader.plan("prices", columns=["close"], filters=[("date", ">=", datetime.date(2021, 1, 20))])
+
+        assert full.row_groups == list(range(20)) and full.row_groups_pruned == 0
+        assert narrow.row_groups == [19]
+        assert narrow.columns == ["close"]
+        # The date column is read to evaluate the predicate even though it is not returned
+        assert 0 < narrow.bytes_planned < full.bytes_planned / 20
+
+    def test_iter_batches_and_empty_results(self, connection):
+        """Test batch sizes, general filters and the schema of an empty result."""
+        reader = DatasetReader(connection, batch_size=300)
+        batches = list(reader.iter_batches("prices", filters=[("volume", ">", 900000), ("ticker", "!=", "T000")]))
+
+        assert all(0 < batch.num_rows <= 300 for batch in batches)
+        assert all(pc.min(batch["volume"]).as_py() > 900000 for batch in batches)
+        empty = reader.read("prices", columns=["close"], date_range=("2030-01-01", None))
+        assert empty.num_rows == 0
+        assert empty.schema.names == ["close"]
+
+    def test_batches_resume_in_another_context(self, connection):
+        """Test that no span stays open between batches, so another context can finish the scan."""
+        recorder = SpanRecorder()
+        connection._instrumentation = Instrumentation([recorder])
+        batches = DatasetReader(connection, batch_size=300).iter_batches("prices", columns=["close"])
+        first = next(batches)
+
+        rest = contextvars.Context().run(list, batches)
+
+        assert sum(batch.num_rows for batch in [first] + rest) == 20000
+        names = [span.name for span in recorder.spans]
+        assert names.count("dataset_scan") == 1
+        assert names.count("dataset_batch") == len(rest) + 2
+
+    def test_invalid_requests(self, connection):
+        """Test rejected operators, columns and formats."""
+        reader = DatasetReader(connection)
+        with pytest.raises(ValueError):
+            reader.read("prices", filters=[("close", "~", 1)])
+        with pytest.raises(KeyError):
+            reader.read("prices", columns=["missing"])
+        with pytest.raises(KeyError):
+            reader.read("prices", filters=[("missing", "==", 1)])
+        with pytest.raises(ValueError):
+            reader.read("prices", extension="xlsx")
+
+
+class TestCsv:
+    """Test cases for streamed CSV reads."""
+
+    def test_read_filters_streamed_batches(self, connection, table):
+        """Test projection and predicates on a CSV streamed in small windows."""
+        result = DatasetReader(connection).read(
+            "prices", "csv", columns=["ticker", "close"],
+            date_range=("2020-01-10", "2020-01-20"), tickers=["T007"],
+        )
+
+        source = table.slice(0, 5000)
+        start, end = datetime.date(2020, 1, 10), datetime.date(2020, 1, 20)
+        assert result.schema.names == ["ticker", "close"]
+        assert result["close"].to_pylist() == pytest.approx(expected(source, start, end, ["T007"], ["close"])["close"].to_pylist())
+
+
+class TestBlobRangeFile:
+    """Test cases for the range-read file object."""
+
+    def test_prefetch_merges_close_ranges(self, connection):
+        """Test that prefetched ranges serve reads and close ranges share a request."""
+        with BlobRangeFile(connection, "prices", "csv") as source:
+            source.prefetch([(0, 100), (150, 50), (10000, 10)], hole_size=64)
+            assert source.request_count == 2
+            source.seek(160)
+            assert source.read(20) == connection.read_blob_range("prices", "csv", 160, 20)
+            assert source.request_count == 2
+            source.seek(5000)
+            source.read(10)
+            assert source.request_count == 3
+
+    def test_reads_are_pinned_to_the_opened_version(self, table):
+        """Test that a blob replaced mid-scan fails instead of mixing versions (real SDK path)."""
+        with FakeBlobServer() as server:
+            server.create_container("market")
+            server.put_blob("market", "quant/prices.parquet", parquet_bytes(table))
+            config = adls_module.ADLSConfig(
+                adls_url=server.url, container_name="market", account_key=ACCOUNT_KEY, allow_insecure_http=True,
+            )
+            registry = adls_module.ClientRegistry()
+            reader = DatasetReader(adls_module.ADLSConnection(config, registry=registry))
+            try:
+                batches = reader.iter_batches("prices", columns=["close"], tickers=["T001"])
+                first = next(batches)
+                server.put_blob("market", "quant/prices.parquet", parquet_bytes(table.slice(0, 100)))
+                with pytest.raises(adls_module.HttpResponseError) as exc_info:
+                    list(batches)
+            finally:
+                registry.close()
+
+        assert first.num_rows == 20
+        assert exc_info.value.status_code == 412
@@ -0,0 +1,129 @@
+"""
+Tests of the in-process blob server against the real Azure SDK client.
+"""
+import os
+import sys
+import time
+import importlib.util
+import pytest
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+spec = importlib.util.spec_from_file_location("adls_connection",
+                                              os.path.join(os.path.dirname(__file__), '..', 'src', 'adls-connection.py'))
+adls_module = importlib.util.module_from_spec(spec)
+sys.modules['adls_connection'] = adls_module
+spec.loader.exec_module(adls_module)
+
+from blob_cache import BlobCache
+from fake_blob_server import ACCOUNT_KEY, FakeBlobServer, FaultProfile
+
+
+@pytest.fixture
+def server():
+    """Running fake server with a ``papers`` container holding two documents."""
+    with FakeBlobServer(seed=1) as running:
+        running.create_container("papers")
+        running.put_blob("papers", "quant/momentum.txt", b"Momentum crashes " * 100)
+        running.put_blob("papers", "quant/empty.txt", b"")
+        yield running
+
+
+@pytest.fixture
+def connection(server):
+    """ADLSConnection to the fake server through a private registry."""
+    config = adls_module.ADLSConfig(
+        adls_url=server.url,
+        container_name="papers",
+        account_key=ACCOUNT_KEY,
+        allow_insecure_http=True,
+    )
+    registry = adls_module.ClientRegistry()
+    yield adls_module.ADLSConnection(config, registry=registry, cache=BlobCache())
+    registry.close()
+
+
+class TestFakeBlobServer:
+    """Test cases for the REST subset served to the SDK."""
+
+    def test_http_url_requires_opt_in(self, server):
+        """Test that plain http stays rejected unless explicitly allowed."""
+        with pytest.raises(ValueError, match="ADLS URL must be a valid HTTPS URL"):
+            adls_module.ADLSConfig(adls_url=server.url, container_name="papers")
+
+    def test_read_and_revalidate(self, connection, server):
+        """Test a full read, then a 304 revalidation from the cache."""
+        assert connection.read_blob_content("momentum", "txt") == "Momentum crashes " * 100
+        assert connection.read_blob_content("momentum", "txt") == "Momentum crashes " * 100
+        assert connection.cache.stats.revalidations == 1
+
+    def test_missing_blob(self, connection):
+        """Test that a missing blob is reported as None."""
+        assert connection.read_blob_content("missing", "txt") is None
+
+    def test_ranged_and_empty_reads(self, connection):
+        """Test ranged streaming, including the empty-blob 416 path."""
+        chunks = list(connection.iter_blob_chunks("momentum", "txt", chunk_size=500))
+        assert [len(chunk) for chunk in chunks] == [500, 500, 500, 200]
+        assert list(connection.iter_blob_chunks("empty", "txt")) == []
+
+    def test_windows_split_into_parallel_subranges(self, connection, server):
+        """Test that each default 4 MiB window arrives as download_concurrency ranged GETs."""
+        payload = bytes(range(256)) * (16 * 4096)  # 16 MiB
+        server.put_blob("papers", "quant/large.bin", payload)
+
+        before = server.request_count
+        with connection.open_blob("large", "bin") as reader:
+            assert server.request_count - before == 4
+            before = server.request_count
+            server.stall_next(4, 0.4)
+            start = time.perf_counter()
+            reader.seek(4 * 1024 * 1024)
+            assert reader.read(1024) == payload[4 * 1024 * 1024:4 * 1024 * 1024 + 1024]
+            elapsed = time.perf_counter() - start
+            assert server.request_count - before == 4
+            reader.seek(0)
+            assert reader.read() == payload
+        assert elapsed < 0.8
+
+    def test_listing_and_properties(self, connection):
+        """Test container listing and HEAD requests."""
+        assert sorted(blob.name for blob in connection.list_blobs()) == ["quant/empty.txt", "quant/momentum.txt"]
+        assert connection.get_blob_properties("momentum", "txt").size == 1700
+
+    def test_error_injection(self, connection, server):
+        """Test that injected 503s reach the client once retries are exhausted."""
+        server.faults = FaultProfile(error_rate=1.0)
+        service = connection.blob_service_client
+        with pytest.raises(Exception):
+            service.get_blob_client("papers", "quant/momentum.txt").download_blob(retry_total=0)
+        assert server.request_count >= 1
+
+    def test_block_staged_upload(self, server):
+        """Test that a large upload is staged block by block and committed with its metadata."""
+        config = adls_module.ADLSConfig(
+            adls_url=server.url,
+            container_name="papers",
+            account_key=ACCOUNT_KEY,
+            allow_insecure_http=True,
+            upload_block_size=1000,
+            max_single_upload_size=1000,
+        )
+        registry = adls_module.ClientRegistry()
+        connection = adls_module.ADLSConnection(config, registry=registry)
+        payload = b"Value premium " * 500
+        try:
+            result = connection.upload_blob("value", payload, "txt", content_type="text/plain")
+            staged = server.staged_block_count
+            with pytest.raises(adls_module.HttpResponseError) as exc_info:
+                connection.upload_blob("value", payload, "txt", overwrite=False)
+        finally:
+            registry.close()
+
+        blob = server.get_blob("papers", "quant/value.txt")
+        assert result.blocks == 7
+        assert blob.data == payload and blob.content_type == "text/plain"
+        assert result.etag == blob.etag
+        assert staged == 7
+        assert exc_info.value.status_code == 409
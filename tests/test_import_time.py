@@ -0,0 +1,53 @@
+"""
+Cold-start checks: importing the connection module stays cheap and side-effect free.
+"""
+import os
+import sys
+import json
+import subprocess
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+# Seconds allowed for a cold import of adls-connection.py (the best of a few runs)
+IMPORT_BUDGET = float(os.getenv("ADLS_IMPORT_BUDGET_SECONDS", "0.5"))
+
+PROBE = """
+import os, sys, json, time, importlib.util
+sys.path.insert(0, {src!r})
+start = time.perf_counter()
+spec = importlib.util.spec_from_file_location("adls_connection", os.path.join({src!r}, "adls-connection.py"))
+module = importlib.util.module_from_spec(spec)
+sys.modules["adls_connection"] = module
+spec.loader.exec_module(module)
+elapsed = time.perf_counter() - start
+heavy = sorted(name for name in sys.modules if name.split(".")[0] in ("azure", "requests", "dotenv", "asyncio", "aiohttp"))
+print(json.dumps({{"elapsed": elapsed, "heavy": heavy, "adls_url": os.environ.get("ADLS_URL")}}))
+"""
+
+
+def cold_import(cwd):
+    """Import the module in a fresh interpreter and report what it cost."""
+    env = {key: value for key, value in os.environ.items() if key not in ("ADLS_URL", "AZURE_STORAGE_CONTAINER_NAME")}
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE.format(src=os.path.abspath(SRC))],
+        cwd=cwd, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+class TestColdImport:
+    """Test cases for the import-time budget."""
+
+    def test_no_heavy_imports_or_env_loading(self, tmp_path):
+        """Test that the SDK, requests, dotenv and asyncio are not imported and .env is not read."""
+        (tmp_path / ".env").write_text("ADLS_URL=https://fromdotenv.blob.core.windows.net\n")
+
+        result = cold_import(str(tmp_path))
+
+        assert result["heavy"] == []
+        assert result["adls_url"] is None
+
+    def test_import_within_budget(self, tmp_path):
+        """Test that a cold import stays within the budget."""
+        best = min(cold_import(str(tmp_path))["elapsed"] for _ in range(3))
+        assert best < IMPORT_BUDGET, f"cold import took {best:.3f}s (budget {IMPORT_BUDGET:.3f}s)"
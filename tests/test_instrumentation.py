@@ -0,0 +1,247 @@
+"""
+Unit tests for the instrumentation module.
+"""
+import os
+import sys
+import time
+import importlib.util
+import urllib.request
+import pytest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+spec = importlib.util.spec_from_file_location("adls_connection",
+                                              os.path.join(os.path.dirname(__file__), '..', 'src', 'adls-connection.py'))
+adls_module = importlib.util.module_from_spec(spec)
+sys.modules['adls_connection'] = adls_module
+spec.loader.exec_module(adls_module)
+
+from instrumentation import (
+    Histogram,
+    Instrumentation,
+    MetricsRegistry,
+    PrometheusExporter,
+    SpanRecorder,
+    get_instrumentation,
+    set_instrumentation,
+)
+from storage_backends import MemoryBackend
+
+
+@pytest.fixture
+def sinks():
+    """Registry and span recorder installed as the process-wide instrumentation."""
+    registry, recorder = MetricsRegistry(), SpanRecorder()
+    set_instrumentation(Instrumentation([registry, recorder]))
+    yield registry, recorder
+    set_instrumentation(None)
+
+
+@pytest.fixture
+def connection():
+    config = adls_module.ADLSConfig(container_name="papers", backend="memory")
+    store = MemoryBackend({"quant/paper.txt": "Momentum crashes", "quant/broken.txt": b"\xff\xfe"})
+    return adls_module.ADLSConnection(config, backend=store)
+
+
+class TestInstrumentation:
+    """Test cases for spans and the disabled fast path."""
+
+    def test_disabled_by_default(self):
+        """Test that the default instrumentation hands out one shared no-op span."""
+        instrumentation = Instrumentation()
+        assert not instrumentation.enabled
+        assert instrumentation.span("read") is instrumentation.span("download")
+        assert not get_instrumentation().enabled
+
+    def test_disabled_overhead_is_negligible(self):
+        """Test that a disabled span plus counter costs well under a microsecond or two."""
+        instrumentation = Instrumentation()
+        start = time.perf_counter()
+        for _ in range(100_000):
+            with instrumentation.span("download", blob="quant/paper.pdf"):
+                pass
+            instrumentation.count("adls_reads_total", outcome="ok")
+        assert (time.perf_counter() - start) / 100_000 < 5e-6
+
+    def test_spans_nest(self):
+        """Test parent/child links and error outcomes."""
+        recorder = SpanRecorder()
+        instrumentation = Instrumentation([recorder])
+        with instrumentation.span("read") as read:
+            with instrumentation.span("download"):
+                pass
+            with pytest.raises(ValueError):
+                with instrumentation.span("decode"):
+                    raise ValueError("bad bytes")
+
+        download, decode, outer = recorder.spans
+        assert outer is read and outer.parent_id is None
+        assert download.parent_id == read.span_id and download.trace_id == read.trace_id
+        assert decode.error == "ValueError"
+        assert outer.duration >= download.duration
+
+
+class TestMetrics:
+    """Test cases for histograms and the Prometheus exporter."""
+
+    def test_histogram_buckets_and_quantile(self):
+        """Test cumulative buckets and bucket-resolution quantiles."""
+        histogram = Histogram((0.01, 0.1, 1.0))
+        for value in (0.005, 0.05, 0.05, 0.5, 5.0):
+            histogram.observe(value)
+
+        assert histogram.cumulative() == [(0.01, 1), (0.1, 3), (1.0, 4), (float("inf"), 5)]
+        assert histogram.quantile(0.5) == 0.1
+        assert histogram.quantile(0.99) == float("inf")
+
+    def test_prometheus_text(self):
+        """Test the exposition format of counters and histograms."""
+        registry = MetricsRegistry(buckets=(0.1, 1.0))
+        instrumentation = Instrumentation([registry])
+        instrumentation.count("adls_cache_total", result="hit")
+        instrumentation.count("adls_cache_total", result="hit")
+        instrumentation.count("adls_bytes_transferred_total", 1024)
+        with instrumentation.span("download"):
+            pass
+
+        text = PrometheusExporter(registry).render()
+
+        assert "# TYPE adls_cache_total counter" in text
+        assert 'adls_cache_total{result="hit"} 2' in text
+        assert "adls_bytes_transferred_total 1024" in text
+        assert 'adls_phase_seconds_bucket{outcome="ok",phase="download",le="0.1"} 1' in text
+        assert 'adls_phase_seconds_bucket{outcome="ok",phase="download",le="+Inf"} 1' in text
+        assert 'adls_phase_seconds_count{outcome="ok",phase="download"} 1' in text
+
+    def test_prometheus_endpoint(self):
+        """Test that /metrics is served over HTTP, on the loopback interface by default."""
+        registry = MetricsRegistry()
+        Instrumentation([registry]).count("adls_reads_total", outcome="ok")
+        exporter = PrometheusExporter(registry)
+        port = exporter.serve(port=0)
+        try:
+            assert exporter._server.server_address[0] == "127.0.0.1"
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+                body = response.read().decode()
+        finally:
+            exporter.close()
+        assert 'adls_reads_total{outcome="ok"} 1' in body
+
+
+class TestConnectionInstrumentation:
+    """Test cases for the instrumented read path."""
+
+    def test_read_phases_and_counters(self, sinks, connection):
+        """Test that a read records its phases, bytes and outcome."""
+        registry, recorder = sinks
+
+        assert connection.read_blob_content("paper", "txt") == "Momentum crashes"
+
+        names = [span.name for span in recorder.spans]
+        assert names == ["download", "decode", "read"]
+        read = recorder.spans[-1]
+        assert all(span.parent_id == read.span_id for span in recorder.spans[:-1])
+        assert recorder.spans[0].attributes["bytes"] == 16
+        assert registry.counter("adls_bytes_transferred_total") == 16
+        assert registry.counter("adls_reads_total", outcome="ok") == 1
+        assert registry.histogram("download").count == 1
+
+    def test_failed_decode_is_counted(self, sinks, connection):
+        """Test that failures are attributed to the phase that raised."""
+        registry, recorder = sinks
+
+        assert connection.read_blob_content("broken", "txt") is None
+
+        assert registry.counter("adls_reads_total", outcome="error") == 1
+        assert registry.histogram("decode", outcome="UnicodeDecodeError").count == 1
+
+    def test_read_many_spans_nest_under_caller(self, sinks, connection):
+        """Test that each batch item is a counted read span whose worker-thread phases nest under the caller."""
+        registry, recorder = sinks
+        instrumentation = get_instrumentation()
+
+        with instrumentation.span("batch") as batch:
+            results = connection.read_many(["paper", "paper", "broken"], "txt")
+
+        assert [result.ok for result in results] == [True, True, False]
+        reads = {span.span_id: span for span in recorder.spans if span.name == "read"}
+        downloads = [span for span in recorder.spans if span.name == "download"]
+        assert len(reads) == 3 and len(downloads) == 3
+        assert all(span.parent_id == batch.span_id for span in reads.values())
+        assert all(span.parent_id in reads for span in downloads)
+        assert registry.counter("adls_reads_total", outcome="ok") == 2
+        assert registry.counter("adls_reads_total", outcome="error") == 1
+
+    def test_per_connection_instrumentation(self, connection):
+        """Test that a connection can report to its own sinks."""
+        registry = MetricsRegistry()
+        config = adls_module.ADLSConfig(container_name="papers", backend="memory")
+        own = adls_module.ADLSConnection(config, backend=connection.backend, instrumentation=Instrumentation([registry]))
+
+        own.read_blob_content("paper", "txt")
+
+        assert registry.counter("adls_reads_total", outcome="ok") == 1
+
+    def test_retries_counted_from_response_hook(self, connection):
+        """Test that retryable responses seen by the SDK pipeline are counted."""
+        registry = MetricsRegistry()
+        hook = connection._request_options(Instrumentation([registry]))["raw_response_hook"]
+
+        hook(SimpleNamespace(http_response=SimpleNamespace(status_code=503)))
+        hook(SimpleNamespace(http_response=SimpleNamespace(status_code=200)))
+
+        assert registry.counter("adls_retries_total", status="503") == 1
+        assert connection._request_options(Instrumentation()) == {}
+
+    def test_client_and_credential_phases(self, sinks, valid_adls_config):
+        """Test client construction, pool hits and token acquisition timing."""
+        registry, recorder = sinks
+        client_registry = adls_module.ClientRegistry()
+        with patch.object(adls_module, 'DefaultAzureCredential') as mock_credential, \
+             patch.object(adls_module, 'BlobServiceClient') as mock_blob_service:
+            adls_module.ADLSConnection(valid_adls_config, registry=client_registry)
+            adls_module.ADLSConnection(valid_adls_config, registry=client_registry)
+            credential = mock_blob_service.call_args.kwargs["credential"]
+            credential.get_token("https://storage.azure.com/.default")
+
+        mock_credential.return_value.get_token.assert_called_once()
+        assert registry.counter("adls_client_pool_total", result="miss") == 1
+        assert registry.counter("adls_client_pool_total", result="hit") == 1
+        assert [span.name for span in recorder.spans] == ["client", "credential"]
+
+    def test_legacy_function_spans(self, sinks):
+        """Test that the legacy entry point times connection setup and the read."""
+        _, recorder = sinks
+        with patch.object(adls_module, 'ADLSConnection') as mock_connection:
+            mock_connection.return_value.read_blob_content.return_value = "Paper"
+            assert adls_module.connected_agent_tool_read_json("paper") == "Paper"
+
+        assert [span.name for span in recorder.spans] == ["connect", "legacy_read"]
+
+
+class TestOpenTelemetrySink:
+    """Test cases for the OpenTelemetry bridge."""
+
+    def test_exports_nested_spans(self):
+        """Test that spans reach an OpenTelemetry tracer with their parents."""
+        pytest.importorskip("opentelemetry.sdk")
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+        from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+        from instrumentation import OpenTelemetrySink
+
+        exporter = InMemorySpanExporter()
+        provider = TracerProvider()
+        provider.add_span_processor(SimpleSpanProcessor(exporter))
+        instrumentation = Instrumentation([OpenTelemetrySink(provider.get_tracer("test"))])
+        with instrumentation.span("read", blob="paper.txt"):
+            with instrumentation.span("download"):
+                pass
+
+        download, read = exporter.get_finished_spans()
+        assert download.parent.span_id == read.context.span_id
+        assert read.attributes["blob"] == "paper.txt"
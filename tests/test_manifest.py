@@ -0,0 +1,123 @@
+"""
+Unit tests for the blob manifest module.
+"""
+import os
+import sys
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from manifest import BlobManifest, split_blob_name
+
+
+def blob(name, size=10, etag="etag", day=1):
+    """Listing entry shaped like azure BlobProperties."""
+    return SimpleNamespace(
+        name=name,
+        size=size,
+        etag=etag,
+        last_modified=datetime(2024, 1, day, tzinfo=timezone.utc),
+    )
+
+
+LISTING = [
+    blob("quant/momentum-crashes.pdf", day=1),
+    blob("quant/momentum-crashes.json", day=2),
+    blob("quant/value-factor.txt", day=3),
+    blob("quant/2024/fx.carry.pdf", day=4),
+    blob("other/ignored.pdf"),
+    blob("quant/no-extension"),
+]
+
+
+class TestSplitBlobName:
+    """Test cases for blob name parsing."""
+
+    def test_split(self):
+        """Test splitting names with dots and folders."""
+        assert split_blob_name("quant/paper.pdf") == ("paper", "pdf")
+        assert split_blob_name("quant/2024/fx.carry.pdf") == ("2024/fx.carry", "pdf")
+        assert split_blob_name("other/paper.pdf") is None
+        assert split_blob_name("quant/no-extension") is None
+
+
+class TestBlobManifest:
+    """Test cases for the SQLite manifest."""
+
+    def test_apply_listing_and_lookup(self):
+        """Test that only documents under quant/ with an extension are indexed."""
+        manifest = BlobManifest()
+        result = manifest.apply_listing(LISTING)
+
+        assert result.added == 4
+        assert len(manifest) == 4
+        entry = manifest.lookup("momentum-crashes", "pdf")
+        assert entry.blob_name == "quant/momentum-crashes.pdf"
+        assert entry.size == 10
+        assert manifest.lookup("momentum-crashes", "txt") is None
+
+    def test_incremental_refresh(self):
+        """Test that a refresh only rewrites changed rows and prunes deleted ones."""
+        manifest = BlobManifest()
+        manifest.apply_listing(LISTING)
+
+        result = manifest.apply_listing([
+            blob("quant/momentum-crashes.pdf", day=1),
+            blob("quant/momentum-crashes.json", etag="etag-2", day=5),
+            blob("quant/new-paper.pdf", day=6),
+        ])
+
+        assert (result.added, result.updated, result.removed, result.unchanged) == (1, 1, 2, 1)
+        assert manifest.lookup("value-factor", "txt") is None
+        assert manifest.lookup("momentum-crashes", "json").etag == "etag-2"
+        assert manifest.refreshed_at is not None
+
+    def test_refresh_from_connection(self):
+        """Test that refresh() pulls the listing from the connection."""
+        connection = SimpleNamespace(list_blobs=lambda: iter(LISTING))
+        manifest = BlobManifest()
+
+        assert manifest.refresh(connection).added == 4
+
+    def test_resolve_extension_preference(self):
+        """Test extension resolution order."""
+        manifest = BlobManifest()
+        manifest.apply_listing(LISTING)
+
+        assert manifest.resolve_extension("momentum-crashes") == "pdf"
+        assert manifest.resolve_extension("momentum-crashes", preferred=("json",)) == "json"
+        assert manifest.resolve_extension("value-factor", preferred=("pdf",)) == "txt"
+        assert manifest.resolve_extension("missing") is None
+
+    def test_prefix_and_modified_since_queries(self):
+        """Test metadata queries."""
+        manifest = BlobManifest()
+        manifest.apply_listing(LISTING + [blob("quant/momentum_x.pdf", day=9)])
+
+        names = [(entry.name, entry.extension) for entry in manifest.with_prefix("momentum-")]
+        assert names == [("momentum-crashes", "json"), ("momentum-crashes", "pdf")]
+        recent = manifest.modified_since(datetime(2024, 1, 3))
+        assert [entry.name for entry in recent] == ["value-factor", "2024/fx.carry", "momentum_x"]
+
+    def test_prefix_query_is_case_sensitive(self):
+        """Test that names differing only in case do not match each other's prefix."""
+        manifest = BlobManifest()
+        manifest.apply_listing([
+            blob("quant/macro/a.pdf"), blob("quant/Macro/a.pdf"), blob("quant/macro0.pdf"), blob("quant/100%.pdf"),
+        ])
+
+        assert [entry.name for entry in manifest.with_prefix("macro/")] == ["macro/a"]
+        assert [entry.name for entry in manifest.with_prefix("Macro/")] == ["Macro/a"]
+        assert [entry.name for entry in manifest.with_prefix("100%")] == ["100%"]
+        assert len(manifest.with_prefix("")) == 4
+
+    def test_persists_to_file(self, tmp_path):
+        """Test that a file-backed manifest survives reopening."""
+        path = str(tmp_path / "manifest.sqlite")
+        manifest = BlobManifest(path)
+        manifest.apply_listing(LISTING)
+        manifest.close()
+
+        assert len(BlobManifest(path)) == 4
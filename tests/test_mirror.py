@@ -0,0 +1,167 @@
+"""
+Unit tests for the container mirror module.
+"""
+import os
+import sys
+import importlib.util
+import pytest
+from unittest.mock import patch
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+spec = importlib.util.spec_from_file_location("adls_connection",
+                                              os.path.join(os.path.dirname(__file__), '..', 'src', 'adls-connection.py'))
+adls_module = importlib.util.module_from_spec(spec)
+sys.modules['adls_connection'] = adls_module
+spec.loader.exec_module(adls_module)
+
+from fake_blob_server import ACCOUNT_KEY, FakeBlobServer
+from mirror import ContainerMirror
+from storage_backends import MemoryBackend
+
+BLOBS = {
+    "quant/momentum.pdf": b"%PDF momentum " * 50,
+    "quant/value.txt": b"Value factor",
+    "quant/empty.txt": b"",
+    "raw/ignored.csv": b"a,b",
+}
+
+
+@pytest.fixture
+def store():
+    return MemoryBackend(BLOBS)
+
+
+@pytest.fixture
+def connection(store):
+    config = adls_module.ADLSConfig(container_name="papers", backend="memory", max_workers=4)
+    return adls_module.ADLSConnection(config, backend=store)
+
+
+def read(root, name):
+    with open(os.path.join(root, *name.split("/")), "rb") as handle:
+        return handle.read()
+
+
+class TestContainerMirror:
+    """Test cases for incremental syncs."""
+
+    def test_first_sync_downloads_prefix(self, connection, tmp_path):
+        """Test that every blob under the prefix is written to disk."""
+        with ContainerMirror(connection, str(tmp_path)) as mirror:
+            result = mirror.sync()
+
+        assert (result.downloaded, result.skipped, result.failed) == (3, 0, 0)
+        assert result.bytes_downloaded == sum(len(data) for name, data in BLOBS.items() if name.startswith("quant/"))
+        assert read(tmp_path, "quant/momentum.pdf") == BLOBS["quant/momentum.pdf"]
+        assert read(tmp_path, "quant/empty.txt") == b""
+        assert not os.path.exists(tmp_path / "raw")
+
+    def test_second_sync_moves_only_the_delta(self, connection, store, tmp_path):
+        """Test that unchanged blobs are skipped and changed ones downloaded again."""
+        ContainerMirror(connection, str(tmp_path)).sync()
+        store.put("quant/value.txt", b"Value factor, revised")
+        store.put("quant/carry.txt", b"Carry")
+
+        result = ContainerMirror(connection, str(tmp_path)).sync()
+
+        assert (result.downloaded, result.skipped) == (2, 2)
+        assert read(tmp_path, "quant/value.txt") == b"Value factor, revised"
+        assert read(tmp_path, "quant/carry.txt") == b"Carry"
+
+    def test_locally_deleted_file_is_restored(self, connection, tmp_path):
+        """Test that the checkpoint alone does not mark a missing file as synced."""
+        mirror = ContainerMirror(connection, str(tmp_path))
+        mirror.sync()
+        os.remove(tmp_path / "quant" / "value.txt")
+
+        assert mirror.sync().downloaded == 1
+        assert read(tmp_path, "quant/value.txt") == b"Value factor"
+
+    def test_prune_on_request(self, connection, store, tmp_path):
+        """Test that deleted blobs are removed only when pruning."""
+        mirror = ContainerMirror(connection, str(tmp_path))
+        mirror.sync()
+        (tmp_path / "quant" / "notes.txt").write_bytes(b"written by hand")
+        store.delete("quant/value.txt")
+
+        assert mirror.sync().pruned == 0
+        assert (tmp_path / "quant" / "value.txt").exists()
+        assert mirror.sync(prune=True).pruned == 1
+        assert not (tmp_path / "quant" / "value.txt").exists()
+        assert (tmp_path / "quant" / "notes.txt").exists()
+
+    def test_interrupted_sync_resumes(self, connection, store, tmp_path):
+        """Test that finished files are checkpointed and partial files are continued."""
+        mirror = ContainerMirror(connection, str(tmp_path), max_workers=1)
+        original = mirror._download
+
+        def fail_on_pdf(blob):
+            if blob.name.endswith(".pdf"):
+                part = mirror._part_path(mirror.path(blob.name), blob.etag)
+                os.makedirs(os.path.dirname(part), exist_ok=True)
+                with open(part, "wb") as out:
+                    out.write(BLOBS[blob.name][:100])
+                raise ConnectionError("connection reset")
+            return original(blob)
+
+        with patch.object(mirror, "_download", side_effect=fail_on_pdf):
+            first = mirror.sync()
+        assert (first.downloaded, first.failed) == (2, 1)
+        assert not (tmp_path / "quant" / "momentum.pdf").exists()
+
+        second = mirror.sync()
+
+        assert (second.downloaded, second.skipped) == (1, 2)
+        assert second.bytes_downloaded == len(BLOBS["quant/momentum.pdf"]) - 100
+        assert read(tmp_path, "quant/momentum.pdf") == BLOBS["quant/momentum.pdf"]
+        assert not [name for name in os.listdir(tmp_path / "quant") if name.endswith(".part")]
+
+    def test_partial_file_of_old_version_is_discarded(self, connection, store, tmp_path):
+        """Test that a blob replaced mid-download is fetched from the start."""
+        mirror = ContainerMirror(connection, str(tmp_path))
+        stale = mirror._part_path(mirror.path("quant/value.txt"), '"old-etag"')
+        os.makedirs(os.path.dirname(stale))
+        with open(stale, "wb") as out:
+            out.write(b"Stale")
+
+        mirror.sync()
+
+        assert read(tmp_path, "quant/value.txt") == b"Value factor"
+        assert not os.path.exists(stale)
+
+    def test_mirror_readable_by_local_backend(self, connection, tmp_path):
+        """Test that the mirror root serves as a local backend."""
+        ContainerMirror(connection, str(tmp_path)).sync()
+        config = adls_module.ADLSConfig(container_name="papers", backend="local", local_root=str(tmp_path))
+        local = adls_module.ADLSConnection(config)
+
+        assert local.read_blob_content("value", "txt") == "Value factor"
+        assert [blob.name for blob in local.list_blobs()] == ["quant/empty.txt", "quant/momentum.pdf", "quant/value.txt"]
+
+    def test_sync_through_the_sdk(self, tmp_path):
+        """Test ranged, ETag-pinned resumption against the fake blob server."""
+        with FakeBlobServer() as server:
+            server.create_container("papers")
+            server.put_blob("papers", "quant/paper.pdf", b"x" * 5000)
+            config = adls_module.ADLSConfig(
+                adls_url=server.url,
+                container_name="papers",
+                account_key=ACCOUNT_KEY,
+                allow_insecure_http=True,
+            )
+            registry = adls_module.ClientRegistry()
+            connection = adls_module.ADLSConnection(config, registry=registry)
+            mirror = ContainerMirror(connection, str(tmp_path))
+            blob = next(iter(connection.list_blobs()))
+            part = mirror._part_path(mirror.path(blob.name), blob.etag)
+            os.makedirs(os.path.dirname(part))
+            with open(part, "wb") as out:
+                out.write(b"x" * 1200)
+
+            result = mirror.sync()
+            registry.close()
+
+        assert result.bytes_downloaded == 3800
+        assert read(tmp_path, "quant/paper.pdf") == b"x" * 5000
@@ -0,0 +1,243 @@
+"""
+Unit tests for the PDF extraction module.
+"""
+import io
+import os
+import sys
+import time
+import threading
+import importlib.util
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+pytest.importorskip("pypdf")
+
+spec = importlib.util.spec_from_file_location("adls_connection",
+                                              os.path.join(os.path.dirname(__file__), '..', 'src', 'adls-connection.py'))
+adls_module = importlib.util.module_from_spec(spec)
+sys.modules['adls_connection'] = adls_module
+spec.loader.exec_module(adls_module)
+
+from pdf_extraction import ExtractedDocument, PdfTextExtractor
+from storage_backends import MemoryBackend
+
+
+def build_pdf(page_texts, group_size=None, title=None):
+    """
+    Build a minimal PDF with one line of Helvetica text per page.
+
+    With ``group_size`` the pages hang from intermediate /Pages nodes that carry the font
+    resources, which the pages then inherit. ``title`` adds a document information dictionary.
+    """
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    resources = b"/Resources << /Font << /F1 3 0 R >> >>"
+    kids = []
+    for text in page_texts:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode()
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"%s /Contents %d 0 R >>" % (b"" if group_size else resources, content_id)
+        )
+        kids.append(b"%d 0 R" % len(objects))
+    if group_size:
+        groups = [kids[start:start + group_size] for start in range(0, len(kids), group_size)]
+        kids = []
+        for group in groups:
+            objects.append(b"<< /Type /Pages /Parent 2 0 R %s /Kids [%s] /Count %d >>" % (resources, b" ".join(group), len(group)))
+            kids.append(b"%d 0 R" % len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(kids), len(page_texts))
+    info = b""
+    if title:
+        objects.append(b"<< /Title (%s) >>" % title.encode())
+        info = b" /Info %d 0 R" % len(objects)
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R%s >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, info, xref))
+    return out.getvalue()
+
+
+def fake_connection(payload, etag="etag-1"):
+    """Connection stand-in serving one PDF through get_blob_properties/open_blob."""
+    connection = Mock()
+    connection.get_blob_properties.return_value = SimpleNamespace(etag=etag)
+
+    def open_blob(name, extension):
+        reader = io.BytesIO(payload)
+        reader.etag = etag
+        reader.chunk_size = 1024
+        return reader
+
+    connection.open_blob.side_effect = open_blob
+    return connection
+
+
+class TestPdfTextExtractor:
+    """Test cases for the page-parallel extractor."""
+
+    def test_extracts_pages_in_process(self):
+        """Test per-page extraction of a short document."""
+        connection = fake_connection(build_pdf(["Momentum crashes", "Value factor"]))
+        extractor = PdfTextExtractor(connection, pages_per_task=8)
+
+        document = extractor.extract("paper")
+
+        assert [page.number for page in document.pages] == [0, 1]
+        assert "Momentum crashes" in document.pages[0].text
+        assert "Value factor" in document.pages[1].text
+        assert document.etag == "etag-1"
+        connection.open_blob.assert_called_once_with("paper", "pdf")
+
+    def test_memoized_by_etag(self):
+        """Test that the same version is parsed once and a new ETag is parsed again."""
+        connection = fake_connection(build_pdf(["First"]))
+        extractor = PdfTextExtractor(connection)
+
+        extractor.extract("paper")
+        extractor.extract("paper")
+        assert connection.open_blob.call_count == 1
+
+        connection.get_blob_properties.return_value = SimpleNamespace(etag="etag-2")
+        extractor.extract("paper")
+        assert connection.open_blob.call_count == 2
+
+    def test_concurrent_requests_parse_once(self):
+        """Test that sessions asking for a version being extracted wait for that extraction."""
+        connection = fake_connection(build_pdf(["Shared"]))
+        opened = threading.Event()
+        release = threading.Event()
+        open_blob = connection.open_blob.side_effect
+
+        def slow_open_blob(name, extension):
+            opened.set()
+            release.wait(5)
+            return open_blob(name, extension)
+
+        connection.open_blob.side_effect = slow_open_blob
+        extractor = PdfTextExtractor(connection)
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            first = pool.submit(extractor.extract, "paper")
+            assert opened.wait(5)
+            others = [pool.submit(extractor.extract, "paper") for _ in range(3)]
+            time.sleep(0.1)
+            release.set()
+            documents = [first.result()] + [future.result() for future in others]
+
+        assert connection.open_blob.call_count == 1
+        assert all("Shared" in document.text for document in documents)
+
+    def test_disk_memo_shared_between_extractors(self, tmp_path):
+        """Test that a second extractor reuses the persisted extraction."""
+        payload = build_pdf(["Shared"])
+        PdfTextExtractor(fake_connection(payload), cache_dir=str(tmp_path)).extract("paper")
+
+        connection = fake_connection(payload)
+        document = PdfTextExtractor(connection, cache_dir=str(tmp_path)).extract("paper")
+
+        assert "Shared" in document.text
+        connection.open_blob.assert_not_called()
+
+    def test_process_pool_keeps_page_order(self):
+        """Test that page ranges parsed on worker processes come back in order."""
+        texts = [f"Page {i}" for i in range(6)]
+        connection = fake_connection(build_pdf(texts))
+
+        with PdfTextExtractor(connection, max_workers=2, pages_per_task=2) as extractor:
+            document = extractor.extract("paper")
+
+        assert [page.number for page in document.pages] == list(range(6))
+        assert [page.text.strip() for page in document.pages] == texts
+
+    def test_document_roundtrip(self):
+        """Test serialisation used by the disk memo."""
+        document = ExtractedDocument("paper", "etag", [])
+        assert ExtractedDocument.from_dict(document.to_dict()) == document
+
+
+class RecordingConnection(adls_module.ADLSConnection):
+    """In-memory connection that keeps the readers it opens, to inspect what they fetched."""
+
+    def __init__(self, blobs):
+        config = adls_module.ADLSConfig(container_name="papers", backend="memory")
+        super().__init__(config, backend=MemoryBackend(blobs))
+        self.readers = []
+
+    def open_blob(self, *args, **kwargs):
+        reader = super().open_blob(*args, **kwargs)
+        self.readers.append(reader)
+        return reader
+
+
+class TestPartialReads:
+    """Test cases for page reads over range requests."""
+
+    # ~8 KiB of text per page puts the 300 pages at ~2.4 MB
+    TEXTS = [f"Page {i} " + "x" * 8000 for i in range(300)]
+
+    def test_skim_fetches_a_fraction_of_the_blob(self):
+        """Test that the first pages and title come from the head and tail blocks only."""
+        payload = build_pdf(self.TEXTS, title="Momentum Crashes")
+        connection = RecordingConnection({"quant/big.pdf": payload})
+
+        document = PdfTextExtractor(connection).skim("big", max_pages=2)
+
+        assert [page.text.split()[:2] for page in document.pages] == [["Page", "0"], ["Page", "1"]]
+        assert document.page_count == 300
+        assert document.title == "Momentum Crashes"
+        assert document.is_partial
+        reader = connection.readers[0]
+        assert reader.chunk_size == 64 * 1024
+        assert reader.fetch_count == 2
+        assert reader.bytes_fetched < len(payload) // 10
+
+    def test_arbitrary_pages_in_a_nested_tree(self):
+        """Test that pages under intermediate nodes inherit resources and skip other subtrees."""
+        payload = build_pdf(self.TEXTS, group_size=10)
+        connection = RecordingConnection({"quant/big.pdf": payload})
+
+        document = PdfTextExtractor(connection, range_block_size=16 * 1024).extract_pages("big", [299, 150, 150, 400])
+
+        assert [page.number for page in document.pages] == [150, 299]
+        assert [page.text.split()[1] for page in document.pages] == ["150", "299"]
+        assert connection.readers[0].bytes_fetched < len(payload) // 10
+        with pytest.raises(ValueError):
+            PdfTextExtractor(connection).extract_pages("big", [-1])
+
+    def test_served_from_memo_of_full_extraction(self):
+        """Test that a skim of an already extracted version is cut from the memo, title included."""
+        payload = build_pdf(["Abstract", "Body", "Refs"], title="Momentum Crashes")
+        connection = RecordingConnection({"quant/paper.pdf": payload})
+        extractor = PdfTextExtractor(connection)
+        assert extractor.extract("paper").title == "Momentum Crashes"
+
+        with patch("pdf_extraction._read_partial") as mock_read:
+            document = extractor.skim("paper")
+
+        mock_read.assert_not_called()
+        assert [page.text for page in document.pages] == ["Abstract"]
+        assert document.page_count == 3
+        assert document.title == "Momentum Crashes"
+
+    def test_falls_back_to_lenient_parsing(self):
+        """Test that a file with a broken startxref pointer is still read."""
+        payload = build_pdf(["First", "Second"]).replace(b"startxref\n", b"startxref\n1")
+        connection = RecordingConnection({"quant/broken.pdf": payload})
+
+        document = PdfTextExtractor(connection).skim("broken")
+
+        assert [page.text for page in document.pages] == ["First"]
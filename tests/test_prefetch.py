@@ -0,0 +1,222 @@
+"""
+Unit tests for the background prefetch queue.
+"""
+import os
+import sys
+import time
+import threading
+import importlib.util
+import pytest
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+spec = importlib.util.spec_from_file_location("adls_connection",
+                                              os.path.join(os.path.dirname(__file__), '..', 'src', 'adls-connection.py'))
+adls_module = importlib.util.module_from_spec(spec)
+sys.modules['adls_connection'] = adls_module
+spec.loader.exec_module(adls_module)
+
+from blob_cache import BlobCache
+from fake_blob_server import ACCOUNT_KEY, FakeBlobServer, FaultProfile
+from instrumentation import Instrumentation, MetricsRegistry
+from manifest import BlobManifest
+from prefetch import Prefetcher
+
+PAPER = b"Momentum crashes " * 1000
+
+
+class GatedConnection:
+    """Connection whose prefetches record their order and block until released."""
+
+    def __init__(self, size=1000, gated=True):
+        self.cache = BlobCache()
+        self.manifest = None
+        self.instrumentation = Instrumentation([])
+        self.prefetcher = None
+        self.size = size
+        self.fetched = []
+        self.started = threading.Semaphore(0)
+        self.release = threading.Event()
+        if not gated:
+            self.release.set()
+
+    def cache_blob(self, blob_path, file_extension="pdf"):
+        self.fetched.append(blob_path)
+        self.started.release()
+        self.release.wait(5)
+        return self.size
+
+
+@pytest.fixture
+def server():
+    """Fake server holding five papers, each answered after 200 ms."""
+    with FakeBlobServer(faults=FaultProfile(latency=0.2)) as running:
+        running.create_container("papers")
+        for i in range(5):
+            running.put_blob("papers", f"quant/paper-{i}.txt", PAPER)
+        yield running
+
+
+@pytest.fixture
+def metrics():
+    return MetricsRegistry()
+
+
+@pytest.fixture
+def connection(server, metrics):
+    """Cached ADLSConnection to the fake server through a private registry."""
+    config = adls_module.ADLSConfig(
+        adls_url=server.url,
+        container_name="papers",
+        account_key=ACCOUNT_KEY,
+        allow_insecure_http=True,
+        adaptive_reads=False,
+    )
+    registry = adls_module.ClientRegistry()
+    yield adls_module.ADLSConnection(
+        config, registry=registry, cache=BlobCache(ttl=60), instrumentation=Instrumentation([metrics])
+    )
+    registry.close()
+
+
+class TestPrefetcher:
+    """Test cases for prefetching into the read cache of a real connection."""
+
+    def test_prefetched_reads_cost_no_request(self, connection, server, metrics):
+        """Test that hinted papers are cached ahead and reads of them count as hits."""
+        with Prefetcher(connection, max_concurrency=2) as prefetcher:
+            assert prefetcher.hint([f"paper-{i}" for i in range(3)], "txt") == 3
+            assert prefetcher.wait(5)
+            requests = server.request_count
+            start = time.perf_counter()
+            contents = [connection.read_blob_content(f"paper-{i}", "txt") for i in (0, 1)]
+            elapsed = time.perf_counter() - start
+            stats = prefetcher.stats()
+
+        assert contents == [PAPER.decode()] * 2
+        assert server.request_count == requests
+        assert elapsed < 0.2
+        assert (stats.completed, stats.hits, stats.taken_over) == (3, 2, 0)
+        assert stats.hit_rate == pytest.approx(2 / 3)
+        assert stats.wasted_bytes == len(PAPER)
+        assert metrics.counter("prefetch_total", outcome="hit") == 2
+        assert metrics.counter("prefetch_bytes_total", use="fetched") == 3 * len(PAPER)
+        assert connection.prefetcher is None
+
+    def test_read_takes_over_in_flight_prefetch(self, connection, server):
+        """Test that a read of a document being prefetched joins its download."""
+        with Prefetcher(connection, max_concurrency=1) as prefetcher:
+            prefetcher.hint(["paper-0"], "txt")
+            deadline = time.monotonic() + 5
+            while prefetcher.pending and server.request_count == 0 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            time.sleep(0.05)
+
+            assert connection.read_blob_content("paper-0", "txt") == PAPER.decode()
+            prefetcher.wait(5)
+            stats = prefetcher.stats()
+
+        assert server.request_count == 1
+        assert (stats.completed, stats.taken_over, stats.hits) == (1, 1, 0)
+        assert stats.hit_rate == 1.0 and stats.wasted_bytes == 0
+
+    def test_read_of_queued_hint_cancels_it(self, connection, server):
+        """Test that a read of a document still queued removes it from the queue."""
+        with Prefetcher(connection, max_concurrency=1) as prefetcher:
+            prefetcher.hint(["paper-0", "paper-1"], "txt")
+            connection.read_blob_content("paper-1", "txt")
+            prefetcher.wait(5)
+            stats = prefetcher.stats()
+
+        assert stats.cancelled == 1
+        assert stats.completed == 1
+        assert server.request_count == 2
+
+    def test_cached_and_evicted_blobs(self, connection, server):
+        """Test that cached blobs are skipped and evicted prefetches are not hits."""
+        connection.read_blob_content("paper-0", "txt")
+        with Prefetcher(connection) as prefetcher:
+            prefetcher.hint(["paper-0", "paper-1"], "txt")
+            prefetcher.wait(5)
+            connection.cache.clear()
+            connection.read_blob_content("paper-1", "txt")
+            stats = prefetcher.stats()
+
+        assert (stats.cached, stats.completed, stats.hits) == (1, 1, 0)
+        assert stats.wasted_bytes == len(PAPER)
+
+    def test_hint_prefix_uses_manifest(self, connection, server):
+        """Test that a manifest query is turned into hints."""
+        manifest = BlobManifest()
+        manifest.apply_listing([
+            SimpleNamespace(name=f"quant/paper-{i}.txt", size=len(PAPER), etag="e",
+                            last_modified=datetime(2024, 1, 1, tzinfo=timezone.utc))
+            for i in range(5)
+        ])
+        connection.manifest = manifest
+        with Prefetcher(connection) as prefetcher:
+            assert prefetcher.hint_prefix("paper-", limit=2) == 2
+            prefetcher.wait(5)
+            assert connection.read_blob_content("paper-1", None) == PAPER.decode()
+            stats = prefetcher.stats()
+
+        assert (stats.completed, stats.hits) == (2, 1)
+
+
+class TestQueue:
+    """Test cases for ordering and caps of the queue."""
+
+    def test_priority_order(self):
+        """Test that higher priorities go first, ties in hint order, and re-hints raise priority."""
+        connection = GatedConnection()
+        with Prefetcher(connection, max_concurrency=1) as prefetcher:
+            prefetcher.hint(["first"])
+            assert connection.started.acquire(timeout=5)
+            prefetcher.hint(["low-a", "low-b"], priority=0)
+            prefetcher.hint(["high"], priority=5)
+            prefetcher.hint(["low-b"], priority=1)
+            prefetcher.hint(["high"], priority=1)
+            connection.release.set()
+            prefetcher.wait(5)
+
+        assert connection.fetched == ["first", "high", "low-b", "low-a"]
+        assert prefetcher.stats().hinted == 5
+
+    def test_full_queue_and_close_drop_hints(self):
+        """Test that hints beyond max_queued and hints left at close are dropped."""
+        connection = GatedConnection()
+        prefetcher = Prefetcher(connection, max_concurrency=1, max_queued=2)
+        prefetcher.hint(["running"])
+        assert connection.started.acquire(timeout=5)
+
+        assert prefetcher.hint(["a", "b", "c"]) == 2
+        # close() stops the queue at once, then waits for the running download
+        threading.Timer(0.1, connection.release.set).start()
+        prefetcher.close()
+
+        assert prefetcher.stats().dropped == 3
+        assert connection.fetched == ["running"]
+        assert prefetcher.hint(["late"]) == 0
+
+    def test_bandwidth_cap_paces_downloads(self):
+        """Test that downloads start only once the previous bytes fit in the budget."""
+        connection = GatedConnection(size=50_000, gated=False)
+        with Prefetcher(connection, max_concurrency=2, max_bytes_per_second=500_000) as prefetcher:
+            start = time.perf_counter()
+            prefetcher.hint([f"paper-{i}" for i in range(4)])
+            prefetcher.wait(5)
+            elapsed = time.perf_counter() - start
+
+        # The first download is free; each of the other three waits for 50 KB at 500 KB/s
+        assert len(connection.fetched) == 4
+        assert elapsed >= 0.25
+
+    def test_requires_cache(self):
+        """Test that a connection without a read cache is rejected."""
+        connection = GatedConnection()
+        connection.cache = None
+        with pytest.raises(ValueError):
+            Prefetcher(connection)
@@ -0,0 +1,282 @@
+"""
+Unit tests for the hedged, adaptive read policy.
+"""
+import os
+import sys
+import time
+import threading
+import importlib.util
+import pytest
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+spec = importlib.util.spec_from_file_location("adls_connection",
+                                              os.path.join(os.path.dirname(__file__), '..', 'src', 'adls-connection.py'))
+adls_module = importlib.util.module_from_spec(spec)
+sys.modules['adls_connection'] = adls_module
+spec.loader.exec_module(adls_module)
+
+from azure.core.exceptions import HttpResponseError
+from fake_blob_server import ACCOUNT_KEY, FakeBlobServer
+from instrumentation import Instrumentation, MetricsRegistry
+import read_policy
+from read_policy import ANY_SIZE, LatencyTracker, ReadPolicy, is_transient, size_class
+
+
+def warm_tracker(seconds=0.001, count=20, blob_name="quant/paper.txt", size=1024):
+    tracker = LatencyTracker()
+    for _ in range(count):
+        tracker.record(blob_name, size, seconds)
+    return tracker
+
+
+def http_error(status):
+    error = HttpResponseError(message=f"status {status}")
+    error.status_code = status
+    return error
+
+
+class TestLatencyTracker:
+    """Test cases for the rolling latency distribution."""
+
+    def test_size_classes(self):
+        """Test the boundaries of the size classes."""
+        assert size_class(None) == ANY_SIZE
+        assert size_class(64 * 1024) == "<=64KiB"
+        assert size_class(64 * 1024 + 1) == "<=1MiB"
+        assert size_class(1024 ** 3) == ">16MiB"
+
+    def test_quantile_needs_samples_and_falls_back(self):
+        """Test that classes without enough samples answer from the pooled window."""
+        tracker = LatencyTracker()
+        assert tracker.quantile("<=64KiB", 0.95, min_samples=5) is None
+        for i in range(10):
+            tracker.record(f"quant/{i}.txt", 1024, (i + 1) / 100)
+
+        assert tracker.quantile("<=64KiB", 0.5, min_samples=5) == pytest.approx(0.06)
+        assert tracker.quantile("<=16MiB", 0.95, min_samples=5) == pytest.approx(0.10)
+        assert tracker.size_class_of("quant/3.txt") == "<=64KiB"
+        assert tracker.size_class_of("quant/unknown.txt") == ANY_SIZE
+
+    def test_window_is_rolling(self):
+        """Test that only the most recent samples are kept."""
+        tracker = LatencyTracker(window=3, max_blobs=2)
+        for i in range(5):
+            tracker.record(f"quant/{i}.txt", 10, float(i))
+
+        assert tracker.counts() == {"<=64KiB": 3, ANY_SIZE: 3}
+        assert tracker.quantile(ANY_SIZE, 0.0) == 2.0
+        assert tracker.size_class_of("quant/0.txt") == ANY_SIZE
+
+
+class TestReadPolicy:
+    """Test cases for hedging, timeouts and retries."""
+
+    def test_cold_policy_runs_one_plain_attempt(self):
+        """Test that without enough samples the SDK defaults apply."""
+        policy = ReadPolicy(LatencyTracker())
+        timeouts = []
+
+        result = policy.run("quant/paper.txt", lambda timeout: timeouts.append(timeout) or b"x", len, Instrumentation())
+
+        assert result == b"x"
+        assert timeouts == [None]
+        assert policy.tracker.counts() == {"<=64KiB": 1, ANY_SIZE: 1}
+
+    def test_timeout_is_clamped_multiple_of_p99(self):
+        """Test the adaptive per-attempt timeout."""
+        policy = ReadPolicy(warm_tracker(0.1), timeout_factor=4.0, min_timeout=0.05, max_timeout=0.3)
+        assert policy.attempt_timeout("<=64KiB") == pytest.approx(0.3)
+        policy = ReadPolicy(warm_tracker(0.01), timeout_factor=4.0, min_timeout=0.05, max_timeout=0.3)
+        assert policy.attempt_timeout("<=64KiB") == pytest.approx(0.05)
+
+    def test_slow_attempt_is_hedged(self):
+        """Test that a request past the hedge quantile is duplicated and the first answer wins."""
+        metrics = MetricsRegistry()
+        policy = ReadPolicy(warm_tracker(0.01), min_timeout=2.0)
+        calls = []
+        lock = threading.Lock()
+
+        def attempt(timeout):
+            with lock:
+                calls.append(timeout)
+                first = len(calls) == 1
+            time.sleep(1.0 if first else 0.01)
+            return b"first" if first else b"hedge"
+
+        start = time.perf_counter()
+        result = policy.run("quant/paper.txt", attempt, len, Instrumentation([metrics]))
+
+        assert result == b"hedge"
+        assert time.perf_counter() - start < 0.5
+        assert calls == [2.0, 2.0]
+        assert metrics.counter("adls_hedges_total", outcome="sent") == 1
+        assert metrics.counter("adls_hedges_total", outcome="won") == 1
+
+    def test_stalled_attempt_times_out_and_retries(self):
+        """Test that a stalled attempt is abandoned at its deadline and retried after backoff."""
+        metrics = MetricsRegistry()
+        policy = ReadPolicy(warm_tracker(0.01), hedge=False, min_timeout=0.05, backoff=0.01)
+        calls = []
+
+        def attempt(timeout):
+            calls.append(timeout)
+            if len(calls) == 1:
+                raise TimeoutError("socket stalled")
+            return b"x"
+
+        assert policy.run("quant/paper.txt", attempt, len, Instrumentation([metrics])) == b"x"
+        assert calls == [0.05, 0.05]
+        assert metrics.counter("adls_retries_total", status="timeout") == 1
+
+    def test_hedged_deadline_abandons_stalled_requests(self):
+        """Test that hedged requests past their deadline count as timeouts and are retried."""
+        metrics = MetricsRegistry()
+        policy = ReadPolicy(warm_tracker(0.01), min_timeout=0.1, backoff=0.0)
+        calls = []
+        lock = threading.Lock()
+
+        def attempt(timeout):
+            with lock:
+                calls.append(timeout)
+                stalled = len(calls) <= 2
+            time.sleep(0.5 if stalled else 0.0)
+            return b"x"
+
+        assert policy.run("quant/paper.txt", attempt, len, Instrumentation([metrics])) == b"x"
+        assert metrics.counter("adls_read_timeouts_total") == 2
+        assert metrics.counter("adls_retries_total", status="timeout") == 1
+
+    def test_more_concurrent_reads_than_hedge_threads(self):
+        """Test that reads queued behind a busy hedge pool are neither timed out nor hedged."""
+        metrics = MetricsRegistry()
+        policy = ReadPolicy(warm_tracker(0.1), min_timeout=0.2, timeout_factor=2.0, backoff=0.0)
+        calls = []
+        lock = threading.Lock()
+
+        def attempt(timeout):
+            with lock:
+                calls.append(timeout)
+            time.sleep(0.05)
+            return b"x"
+
+        readers = 4 * read_policy.HEDGE_WORKERS
+        barrier = threading.Barrier(readers)
+        results = []
+
+        def read(i):
+            barrier.wait()
+            results.append(policy.run(f"quant/{i}.txt", attempt, len, Instrumentation([metrics])))
+
+        threads = [threading.Thread(target=read, args=(i,)) for i in range(readers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert results == [b"x"] * readers
+        assert len(calls) == readers
+        assert metrics.counter("adls_read_timeouts_total") == 0
+        assert metrics.counter("adls_hedges_total", outcome="sent") == 0
+
+    def test_permanent_errors_are_not_retried(self):
+        """Test that 404/304-style answers propagate from the first attempt."""
+        policy = ReadPolicy(warm_tracker(0.01), hedge=False)
+        calls = []
+
+        def attempt(timeout):
+            calls.append(timeout)
+            raise http_error(404)
+
+        with pytest.raises(HttpResponseError):
+            policy.run("quant/paper.txt", attempt, len, Instrumentation())
+        assert len(calls) == 1
+
+    def test_transient_errors_exhaust_attempts(self):
+        """Test that throttling is retried max_attempts times before giving up."""
+        policy = ReadPolicy(warm_tracker(0.01), hedge=False, max_attempts=3, backoff=0.0)
+        calls = []
+
+        def attempt(timeout):
+            calls.append(timeout)
+            raise http_error(503)
+
+        with pytest.raises(HttpResponseError):
+            policy.run("quant/paper.txt", attempt, len, Instrumentation())
+        assert len(calls) == 3
+        assert is_transient(http_error(429)) and not is_transient(http_error(412))
+
+
+class TestHedgedReadsAgainstServer:
+    """Test cases against the fake server injecting stalls."""
+
+    @pytest.fixture
+    def server(self):
+        with FakeBlobServer(seed=1) as running:
+            running.create_container("papers")
+            running.put_blob("papers", "quant/paper.txt", b"Momentum crashes " * 64)
+            yield running
+
+    def _connection(self, server, **settings):
+        config = adls_module.ADLSConfig(
+            adls_url=server.url,
+            container_name="papers",
+            account_key=ACCOUNT_KEY,
+            allow_insecure_http=True,
+            coalesce_reads=False,
+            min_latency_samples=5,
+            min_attempt_timeout=0.2,
+            **settings
+        )
+        registry = adls_module.ClientRegistry()
+        connection = adls_module.ADLSConnection(config, registry=registry)
+        for _ in range(5):
+            assert connection.read_blob_content("paper", "txt") is not None
+        return connection, registry
+
+    def test_stalled_request_is_hedged(self, server):
+        """Test that a stalled read is answered by its hedge long before the stall ends."""
+        connection, registry = self._connection(server)
+        try:
+            requests_before = server.request_count
+            server.stall_next(1, 2.0)
+            start = time.perf_counter()
+            content = connection.read_blob_content("paper", "txt")
+            elapsed = time.perf_counter() - start
+        finally:
+            registry.close()
+
+        assert content.startswith("Momentum crashes")
+        assert elapsed < 1.0
+        assert server.request_count - requests_before == 2
+
+    def test_stalled_request_times_out_without_hedging(self, server):
+        """Test that the adaptive timeout cuts a stall short and the retry succeeds."""
+        connection, registry = self._connection(server, hedge_reads=False, retry_backoff=0.01)
+        try:
+            server.stall_next(1, 2.0)
+            start = time.perf_counter()
+            content = connection.read_blob_content("paper", "txt")
+            elapsed = time.perf_counter() - start
+        finally:
+            registry.close()
+
+        assert content.startswith("Momentum crashes")
+        assert elapsed < 1.0
+
+    def test_adaptive_reads_can_be_disabled(self, server):
+        """Test that adaptive_reads=False leaves reads to the SDK retry policy."""
+        config = adls_module.ADLSConfig(
+            adls_url=server.url,
+            container_name="papers",
+            account_key=ACCOUNT_KEY,
+            allow_insecure_http=True,
+            adaptive_reads=False,
+        )
+        assert adls_module.ADLSConnection(config, registry=adls_module.ClientRegistry()).read_policy is None
+        with pytest.raises(ValueError):
+            adls_module.ADLSConfig(
+                adls_url=server.url, container_name="papers", allow_insecure_http=True,
+                min_attempt_timeout=5.0, max_attempt_timeout=1.0,
+            )
@@ -0,0 +1,355 @@
+"""
+Unit tests for multi-account routing.
+"""
+import os
+import sys
+import json
+import asyncio
+import time
+import importlib.util
+import pytest
+from collections import Counter
+from unittest.mock import patch
+from pydantic import ValidationError
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+spec = importlib.util.spec_from_file_location("adls_connection",
+                                              os.path.join(os.path.dirname(__file__), '..', 'src', 'adls-connection.py'))
+adls_module = importlib.util.module_from_spec(spec)
+sys.modules['adls_connection'] = adls_module
+spec.loader.exec_module(adls_module)
+
+from fake_blob_server import ACCOUNT_KEY, FakeBlobServer, FaultProfile
+from instrumentation import Instrumentation, MetricsRegistry
+from routing import Endpoint, EndpointState, Route, RoutingTable, document_name, shard_of
+
+
+def endpoint(url, container="papers", **settings):
+    return Endpoint(adls_url=url, container_name=container, account_key=ACCOUNT_KEY, **settings)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestRoutingTable:
+    """Test cases for resolving blobs to endpoints."""
+
+    def test_longest_prefix_and_shards(self):
+        """Test that the most specific route wins and shards split documents stably."""
+        table = RoutingTable([
+            Route(prefix="", endpoints=[endpoint("https://all.blob.core.windows.net")]),
+            Route(prefix="macro/", shards=2, endpoints=[
+                endpoint("https://shard0.blob.core.windows.net", shard=0),
+                endpoint("https://shard1.blob.core.windows.net", shard=1),
+            ]),
+        ])
+
+        assert table.locate("quant/momentum.pdf") == (0, 0)
+        assert table.locate("quant/macro/rates.pdf")[0] == 1
+        shards = Counter(table.locate(f"quant/macro/paper-{i}.pdf")[1] for i in range(200))
+        assert 60 < shards[0] < 140 and shards[0] + shards[1] == 200
+        # The extension does not move a document: its PDF and JSON share a shard
+        assert table.locate("quant/macro/paper-7.pdf") == table.locate("quant/macro/paper-7.json")
+        assert shard_of("macro/paper-7", 2) == table.locate("quant/macro/paper-7.pdf")[1]
+        assert document_name("quant/macro/paper-7.pdf") == "macro/paper-7"
+
+    def test_nearest_replica_first_and_primary(self):
+        """Test that replicas in the process region come first while writes go to the first configured."""
+        route = Route(endpoints=[
+            endpoint("https://east.blob.core.windows.net", region="eastus"),
+            endpoint("https://brazil.blob.core.windows.net", region="brazilsouth"),
+        ])
+        table = RoutingTable([route], region="brazilsouth")
+
+        assert [e.region for e in table.replicas("quant/paper.pdf")] == ["brazilsouth", "eastus"]
+        assert table.primary("quant/paper.pdf").region == "eastus"
+        assert RoutingTable([Route(prefix="macro/", endpoints=route.endpoints)]).replicas("quant/paper.pdf") == []
+
+    def test_route_validation(self):
+        """Test rejected shard layouts and endpoints."""
+        with pytest.raises(ValidationError):
+            Route(shards=2, endpoints=[endpoint("https://a.blob.core.windows.net", shard=0)])
+        with pytest.raises(ValidationError):
+            Route(endpoints=[endpoint("https://a.blob.core.windows.net", shard=1)])
+        with pytest.raises(ValidationError):
+            Route(endpoints=[])
+        with pytest.raises(ValidationError):
+            endpoint("ftp://a.blob.core.windows.net")
+
+
+class TestEndpointState:
+    """Test cases for the per-endpoint slots and cooldown."""
+
+    def test_throttle_cooldown(self):
+        """Test that a throttled endpoint recovers after the cooldown."""
+        clock = FakeClock()
+        state = EndpointState(2, clock=clock)
+        state.throttle(5)
+        assert state.throttled
+        clock.now = 5
+        assert not state.throttled
+
+    def test_slots_count_in_flight(self):
+        """Test that slots are counted while held."""
+        state = EndpointState(2)
+        with state.slot():
+            with state.slot():
+                assert state.in_flight == 2
+        assert state.in_flight == 0
+
+
+class TestRoutingConfig:
+    """Test cases for routes in ADLSConfig."""
+
+    def test_routes_follow_backend_and_http_rules(self):
+        """Test that routes need the adls backend and https unless insecure http is allowed."""
+        route = {"prefix": "macro/", "endpoints": [{"adls_url": "http://127.0.0.1:1/acct", "container_name": "c"}]}
+        with pytest.raises(ValidationError):
+            adls_module.ADLSConfig(adls_url="https://a.blob.core.windows.net", container_name="c", routes=[route])
+        with pytest.raises(ValidationError):
+            adls_module.ADLSConfig(container_name="c", backend="memory", routes=[route])
+        config = adls_module.ADLSConfig(
+            adls_url="https://a.blob.core.windows.net", container_name="c", routes=[route], allow_insecure_http=True
+        )
+        assert config.routes[0].endpoints[0].max_concurrency == 16
+
+    @patch.dict(os.environ, {
+        "ADLS_URL": "https://a.blob.core.windows.net",
+        "AZURE_STORAGE_CONTAINER_NAME": "papers",
+        "ADLS_REGION": "brazilsouth",
+        "ADLS_ROUTES": json.dumps([{"prefix": "macro/", "endpoints": [
+            {"adls_url": "https://b.blob.core.windows.net", "container_name": "macro", "region": "brazilsouth"},
+        ]}]),
+    }, clear=True)
+    def test_routes_from_environment(self):
+        """Test that ADLS_ROUTES (JSON) and ADLS_REGION are read from the environment."""
+        with patch("dotenv.load_dotenv"):
+            config = adls_module._config_from_env()
+
+        assert config.region == "brazilsouth"
+        assert config.routes[0].endpoints[0].container_name == "macro"
+
+
+@pytest.fixture
+def servers():
+    """Three fake accounts: the default one and two routed ones."""
+    with FakeBlobServer() as default, FakeBlobServer() as first, FakeBlobServer() as second:
+        for server in (default, first, second):
+            server.create_container("papers")
+        yield default, first, second
+
+
+def routed_connection(default, routes, metrics=None, **settings):
+    config = adls_module.ADLSConfig(
+        adls_url=default.url,
+        container_name="papers",
+        account_key=ACCOUNT_KEY,
+        allow_insecure_http=True,
+        adaptive_reads=settings.pop("adaptive_reads", False),
+        routes=routes,
+        **settings,
+    )
+    instrumentation = Instrumentation([metrics]) if metrics is not None else None
+    return adls_module.ADLSConnection(config, registry=adls_module.ClientRegistry(), instrumentation=instrumentation)
+
+
+class TestRoutedConnection:
+    """Test cases for reads, writes and listings across several fake accounts."""
+
+    def test_shards_serve_reads_writes_and_listing(self, servers):
+        """Test that documents are read from, written to and listed at the endpoint of their shard."""
+        default, first, second = servers
+        default.put_blob("papers", "quant/momentum.txt", b"Momentum crashes")
+        route = Route(prefix="macro/", shards=2, endpoints=[
+            endpoint(first.url, shard=0),
+            endpoint(second.url, shard=1),
+        ])
+        connection = routed_connection(default, [route])
+        try:
+            names = [f"macro/paper-{i}" for i in range(6)]
+            for name in names:
+                connection.upload_blob(name, f"text of {name}")
+            contents = [connection.read_blob_content(name, "txt") for name in names]
+            listed = sorted(blob.name for blob in connection.list_blobs())
+            size = connection.get_blob_properties("macro/paper-0", "txt").size
+            unrouted = connection.read_blob_content("momentum", "txt")
+        finally:
+            connection.registry.close()
+
+        assert contents == [f"text of {name}" for name in names]
+        for name in names:
+            shard = shard_of(name, 2)
+            assert (first, second)[shard].get_blob("papers", f"quant/{name}.txt") is not None
+            assert (second, first)[shard].get_blob("papers", f"quant/{name}.txt") is None
+        assert listed == sorted(["quant/momentum.txt"] + [f"quant/{name}.txt" for name in names])
+        assert unrouted == "Momentum crashes"
+        assert size == len("text of macro/paper-0")
+
+    def test_throttled_replica_fails_over(self, servers):
+        """Test that a 503 moves the read to the next replica at once and cools the first one down."""
+        default, near, far = servers
+        for server in (near, far):
+            server.put_blob("papers", "quant/paper.txt", b"replicated paper")
+        near.faults = FaultProfile(error_rate=1.0)
+        metrics = MetricsRegistry()
+        route = Route(endpoints=[
+            endpoint(far.url, region="eastus"),
+            endpoint(near.url, region="brazilsouth"),
+        ])
+        connection = routed_connection(default, [route], metrics, region="brazilsouth")
+        try:
+            start = time.perf_counter()
+            first = connection.read_blob_content("paper", "txt")
+            elapsed = time.perf_counter() - start
+            throttled_requests = near.request_count
+            second = connection.read_blob_content("paper", "txt")
+        finally:
+            connection.registry.close()
+
+        assert first == second == "replicated paper"
+        # The near replica was asked once, without SDK retries, then skipped during its cooldown
+        assert throttled_requests == 1 and near.request_count == 1
+        assert far.request_count == 2
+        assert elapsed < 1.0
+        assert metrics.counter("adls_failovers_total", account=near.url, container="papers") == 1
+
+    def test_latencies_are_tracked_per_answering_account(self, servers):
+        """Test that the read policy learns from the account that answered, not the default one."""
+        default, near, far = servers
+        for server in (near, far):
+            server.put_blob("papers", "quant/paper.txt", b"replicated paper")
+        near.faults = FaultProfile(error_rate=1.0)
+        route = Route(endpoints=[endpoint(near.url), endpoint(far.url)])
+        connection = routed_connection(default, [route], adaptive_reads=True)
+        registry = connection.registry
+        try:
+            assert connection.read_blob_content("paper", "txt") == "replicated paper"
+            counts = {server: registry.latency_tracker(server.url).counts() for server in (default, near, far)}
+        finally:
+            registry.close()
+
+        assert counts[far].get("any") == 1
+        assert counts[near] == {} and counts[default] == {}
+
+    def test_other_errors_do_not_fail_over(self, servers):
+        """Test that only throttling moves a read to another replica."""
+        default, near, far = servers
+        far.put_blob("papers", "quant/paper.txt", b"only on the far replica")
+        route = Route(endpoints=[endpoint(near.url), endpoint(far.url)])
+        connection = routed_connection(default, [route])
+        try:
+            with pytest.raises(adls_module.HttpResponseError) as exc_info:
+                connection.read_blob_range("paper", "txt", 0, 10)
+        finally:
+            connection.registry.close()
+
+        assert exc_info.value.status_code == 404
+        assert far.request_count == 0
+
+    def test_endpoint_concurrency_cap(self, servers):
+        """Test that reads of one endpoint never exceed its cap, even from a wide pool."""
+        default, slow, _ = servers
+        slow.faults = FaultProfile(latency=0.15)
+        for i in range(6):
+            slow.put_blob("papers", f"quant/paper-{i}.txt", b"paper")
+        route = Route(endpoints=[endpoint(slow.url, max_concurrency=2)])
+        connection = routed_connection(default, [route], max_workers=6, coalesce_reads=False)
+        try:
+            start = time.perf_counter()
+            results = connection.read_many([f"paper-{i}" for i in range(6)], "txt")
+            elapsed = time.perf_counter() - start
+        finally:
+            connection.registry.close()
+
+        assert all(result.ok for result in results)
+        # Six 150 ms reads two at a time take three rounds
+        assert elapsed >= 0.42
+
+    def test_streams_listings_and_writes_fail_over(self, servers):
+        """Test that open_blob, list_blobs and uploads also move off a throttled replica."""
+        default, near, far = servers
+        for server in (near, far):
+            server.put_blob("papers", "quant/paper.txt", b"replicated paper")
+        near.faults = FaultProfile(error_rate=1.0)
+        metrics = MetricsRegistry()
+        route = Route(endpoints=[endpoint(near.url), endpoint(far.url)])
+        connection = routed_connection(default, [route], metrics)
+        try:
+            with connection.open_blob("paper", "txt") as reader:
+                streamed = reader.read()
+            # The near replica is cooling down now, so the listing and the write start at the far one
+            listed = [blob.name for blob in connection.list_blobs()]
+            connection.upload_blob("report", "weekly report")
+        finally:
+            connection.registry.close()
+
+        assert streamed == b"replicated paper"
+        assert listed == ["quant/paper.txt"]
+        assert far.get_blob("papers", "quant/report.txt") is not None
+        assert near.request_count == 1
+        assert metrics.counter("adls_failovers_total", account=near.url, container="papers") == 1
+
+    def test_cap_covers_streams_and_uploads(self, servers):
+        """Test that streamed reads and uploads count against the endpoint's cap."""
+        default, slow, _ = servers
+        slow.put_blob("papers", "quant/paper.txt", b"paper")
+        route = Route(endpoints=[endpoint(slow.url, max_concurrency=1)])
+        connection = routed_connection(default, [route], max_workers=4)
+        try:
+            slow.faults = FaultProfile(latency=0.15)
+            state = connection.registry.endpoint_state(route.endpoints[0])
+            start = time.perf_counter()
+            with connection.open_blob("paper", "txt") as reader:
+                results = connection.upload_many({f"report-{i}": "report" for i in range(3)})
+                assert state.in_flight == 0
+                assert reader.read() == b"paper"
+            elapsed = time.perf_counter() - start
+        finally:
+            connection.registry.close()
+
+        assert all(result.ok for result in results)
+        # One open and three uploads, one request at a time
+        assert elapsed >= 0.58
+
+
+class TestAsyncRoutedConnection:
+    """Test cases for routed reads of the asyncio connection."""
+
+    def test_async_reads_fail_over_within_the_cap(self, servers):
+        """Test that async reads of a routed blob skip a throttled replica and respect the endpoint cap."""
+        pytest.importorskip("aiohttp")
+        default, near, far = servers
+        for server in (near, far):
+            for i in range(3):
+                server.put_blob("papers", f"quant/paper-{i}.txt", b"replicated paper")
+        near.faults = FaultProfile(error_rate=1.0)
+        far.faults = FaultProfile(latency=0.15)
+        config = adls_module.ADLSConfig(
+            adls_url=default.url,
+            container_name="papers",
+            account_key=ACCOUNT_KEY,
+            allow_insecure_http=True,
+            routes=[Route(endpoints=[endpoint(near.url), endpoint(far.url, max_concurrency=1)])],
+        )
+        registry = adls_module.ClientRegistry()
+
+        async def read():
+            async with adls_module.AsyncADLSConnection(config, registry=registry) as connection:
+                start = time.perf_counter()
+                contents = await connection.read_blob_contents([f"paper-{i}" for i in range(3)], "txt")
+                return contents, time.perf_counter() - start
+
+        contents, elapsed = asyncio.run(read())
+
+        assert contents == ["replicated paper"] * 3
+        assert default.request_count == 0
+        # The near replica is skipped once cooling down; the far one serves one read at a time
+        assert near.request_count <= 3
+        assert elapsed >= 0.44
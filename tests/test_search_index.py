@@ -0,0 +1,174 @@
+"""
+Unit tests for the search index module.
+"""
+import os
+import sys
+import time
+import threading
+import pytest
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from search_index import SearchIndex, chunk_text, tokenize
+
+
+CORPUS = {
+    "quant/momentum-crashes.txt": (
+        "etag-1",
+        "Momentum strategies experience infrequent but severe crashes. "
+        "Momentum crashes occur in panic states following market declines.",
+    ),
+    "quant/value-factor.txt": (
+        "etag-1",
+        "The value factor buys cheap stocks and sells expensive stocks based on book to market.",
+    ),
+    "quant/carry.json": (
+        "etag-1",
+        '{"title": "Carry trades across asset classes", "abstract": "Carry predicts returns"}',
+    ),
+}
+
+
+def fake_connection(corpus):
+    """Connection stand-in listing and reading an in-memory corpus."""
+    connection = Mock()
+    connection.list_blobs.side_effect = lambda: iter([
+        SimpleNamespace(name=name, etag=etag, last_modified=datetime(2024, 1, 1, tzinfo=timezone.utc))
+        for name, (etag, _) in corpus.items()
+    ])
+
+    def read_blob_content(name, extension):
+        return corpus[f"quant/{name}.{extension}"][1]
+
+    connection.read_blob_content.side_effect = read_blob_content
+    return connection
+
+
+class TestTextHelpers:
+    """Test cases for tokenization and chunking."""
+
+    def test_tokenize_drops_stopwords(self):
+        """Test lowercasing and stopword removal."""
+        assert tokenize("The Momentum of the 12-1 Factor") == ["momentum", "12", "1", "factor"]
+
+    def test_chunk_text_overlap(self):
+        """Test overlapping passages cover the text."""
+        words = [f"w{i}" for i in range(25)]
+        passages = chunk_text(" ".join(words), passage_words=10, overlap=2)
+
+        assert passages[0].split() == words[:10]
+        assert passages[1].split()[0] == "w8"
+        assert passages[-1].split()[-1] == "w24"
+
+    def test_chunk_text_invalid_overlap(self):
+        """Test that overlap must be smaller than a passage."""
+        with pytest.raises(ValueError):
+            chunk_text("text", passage_words=5, overlap=5)
+
+
+class TestSearchIndex:
+    """Test cases for building and querying the index."""
+
+    def test_build_and_search(self, tmp_path):
+        """Test that the most relevant passage ranks first."""
+        index = SearchIndex(str(tmp_path / "index"))
+        result = index.update(fake_connection(CORPUS))
+
+        hits = index.search("momentum crashes", k=2)
+
+        assert result.added == 3
+        assert hits[0].name == "momentum-crashes"
+        assert "panic states" in hits[0].text
+        assert len(hits) == 1
+        assert index.search("unknown words") == []
+        index.close()
+
+    def test_reopen_from_disk(self, tmp_path):
+        """Test that a reopened index answers the same queries."""
+        directory = str(tmp_path / "index")
+        with SearchIndex(directory) as index:
+            index.update(fake_connection(CORPUS))
+
+        with SearchIndex(directory) as reopened:
+            hits = reopened.search("carry returns")
+            assert hits[0].name == "carry"
+            assert hits[0].extension == "json"
+
+    def test_incremental_update_fetches_only_changes(self, tmp_path):
+        """Test that unchanged documents are not read again."""
+        index = SearchIndex(str(tmp_path / "index"))
+        index.update(fake_connection(CORPUS))
+
+        corpus = dict(CORPUS)
+        corpus["quant/value-factor.txt"] = ("etag-2", "Value investing with quality screens.")
+        del corpus["quant/carry.json"]
+        connection = fake_connection(corpus)
+        result = index.update(connection)
+
+        assert (result.added, result.updated, result.removed, result.unchanged) == (0, 1, 1, 1)
+        connection.read_blob_content.assert_called_once_with("value-factor", "txt")
+        assert index.search("quality screens")[0].name == "value-factor"
+        assert index.search("carry") == []
+        assert index.search("momentum")[0].name == "momentum-crashes"
+        index.close()
+
+    def test_failed_load_keeps_previous_version(self, tmp_path):
+        """Test that a document that cannot be read keeps its indexed passages."""
+        index = SearchIndex(str(tmp_path / "index"))
+        index.update(fake_connection(CORPUS))
+
+        corpus = dict(CORPUS)
+        corpus["quant/value-factor.txt"] = ("etag-2", None)
+        result = index.update(fake_connection(corpus))
+
+        assert result.failed == 1
+        assert index.search("book market")[0].name == "value-factor"
+        index.close()
+
+    def test_search_answers_during_slow_update(self, tmp_path):
+        """Test that queries are served from the current files while an update fetches documents."""
+        index = SearchIndex(str(tmp_path / "index"))
+        index.update(fake_connection(CORPUS))
+
+        corpus = dict(CORPUS)
+        corpus["quant/value-factor.txt"] = ("etag-2", "Value investing with quality screens.")
+        connection = fake_connection(corpus)
+        fetching, release = threading.Event(), threading.Event()
+
+        def slow_read(name, extension):
+            fetching.set()
+            release.wait(5)
+            return corpus[f"quant/{name}.{extension}"][1]
+
+        connection.read_blob_content.side_effect = slow_read
+        updater = threading.Thread(target=index.update, args=(connection,))
+        updater.start()
+        try:
+            assert fetching.wait(5)
+            start = time.perf_counter()
+            hits = index.search("book market")
+            elapsed = time.perf_counter() - start
+        finally:
+            release.set()
+            updater.join()
+
+        assert elapsed < 0.5
+        assert hits[0].name == "value-factor"
+        assert index.search("quality screens")[0].name == "value-factor"
+        index.close()
+
+    def test_pdfs_need_extractor(self, tmp_path):
+        """Test that PDFs are indexed through the extractor only."""
+        corpus = {"quant/paper.pdf": ("etag-1", None)}
+        extractor = Mock()
+        extractor.extract.return_value = SimpleNamespace(text="Betting against beta")
+        index = SearchIndex(str(tmp_path / "index"))
+
+        assert index.update(fake_connection(corpus)).added == 0
+        assert index.update(fake_connection(corpus), extractor=extractor).added == 1
+        assert index.search("beta")[0].name == "paper"
+        index.close()
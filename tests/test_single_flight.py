@@ -0,0 +1,143 @@
+"""
+Unit tests for the single-flight module.
+"""
+import os
+import sys
+import time
+import asyncio
+import threading
+import pytest
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from single_flight import AsyncSingleFlight, SingleFlight
+
+
+def run_concurrently(count, target):
+    """Start ``count`` threads on ``target`` and wait for all of them."""
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+class TestSingleFlight:
+    """Test cases for the thread-based group."""
+
+    def test_concurrent_callers_share_one_call(self):
+        """Test that callers arriving during a call receive its result."""
+        group = SingleFlight()
+        calls = []
+        results = []
+        started = threading.Event()
+
+        def work():
+            calls.append(1)
+            started.set()
+            time.sleep(0.05)
+            return b"paper"
+
+        def caller():
+            results.append(group.do("quant/paper.pdf", work))
+
+        leader = threading.Thread(target=caller)
+        leader.start()
+        started.wait()
+        run_concurrently(5, caller)
+        leader.join()
+
+        assert len(calls) == 1
+        assert sorted(shared for _, shared in results) == [False] + [True] * 5
+        assert all(value == b"paper" for value, _ in results)
+        assert group.stats().as_dict() == {"calls": 6, "coalesced": 5, "in_flight": 0}
+
+    def test_error_is_shared(self):
+        """Test that followers see the leader's exception."""
+        group = SingleFlight()
+        started = threading.Event()
+        errors = []
+
+        def work():
+            started.set()
+            time.sleep(0.05)
+            raise ConnectionError("throttled")
+
+        def caller():
+            try:
+                group.do("key", work)
+            except ConnectionError as e:
+                errors.append(e)
+
+        leader = threading.Thread(target=caller)
+        leader.start()
+        started.wait()
+        run_concurrently(3, caller)
+        leader.join()
+
+        assert len(errors) == 4
+        assert len({id(error) for error in errors}) == 1
+
+    def test_completed_calls_are_not_remembered(self):
+        """Test that sequential calls run the function every time."""
+        group = SingleFlight()
+        assert group.do("key", lambda: 1) == (1, False)
+        assert group.do("key", lambda: 2) == (2, False)
+        assert group.stats().coalesced == 0
+
+
+class TestAsyncSingleFlight:
+    """Test cases for the asyncio group."""
+
+    def test_concurrent_awaits_share_one_task(self):
+        """Test that concurrent awaits of a key run the coroutine once."""
+        group = AsyncSingleFlight()
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "paper"
+
+        async def run():
+            return await asyncio.gather(*(group.do("key", work) for _ in range(4)))
+
+        results = asyncio.run(run())
+
+        assert len(calls) == 1
+        assert [value for value, _ in results] == ["paper"] * 4
+        assert [shared for _, shared in results] == [False, True, True, True]
+        assert group.stats().in_flight == 0
+
+    def test_cancelled_caller_does_not_cancel_others(self):
+        """Test that cancelling one waiter leaves the shared work running."""
+        group = AsyncSingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.02)
+            return "paper"
+
+        async def run():
+            first = asyncio.ensure_future(group.do("key", work))
+            second = asyncio.ensure_future(group.do("key", work))
+            await asyncio.sleep(0)
+            first.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await first
+            return await second
+
+        assert asyncio.run(run()) == ("paper", True)
+
+    def test_error_is_shared(self):
+        """Test that every waiter receives the error."""
+        group = AsyncSingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.01)
+            raise ConnectionError("throttled")
+
+        async def run():
+            return await asyncio.gather(*(group.do("key", work) for _ in range(3)), return_exceptions=True)
+
+        assert all(isinstance(result, ConnectionError) for result in asyncio.run(run()))
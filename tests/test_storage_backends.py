@@ -0,0 +1,182 @@
+"""
+Unit tests for the storage backends module.
+"""
+import os
+import sys
+import asyncio
+import importlib.util
+import pytest
+
+from azure.core import MatchConditions
+from azure.core.exceptions import (
+    HttpResponseError,
+    ResourceExistsError,
+    ResourceModifiedError,
+    ResourceNotFoundError,
+    ResourceNotModifiedError,
+)
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+spec = importlib.util.spec_from_file_location("adls_connection",
+                                              os.path.join(os.path.dirname(__file__), '..', 'src', 'adls-connection.py'))
+adls_module = importlib.util.module_from_spec(spec)
+sys.modules['adls_connection'] = adls_module
+spec.loader.exec_module(adls_module)
+
+from storage_backends import LocalBackend, MemoryBackend, shared_memory_backend
+
+
+@pytest.fixture
+def local_root(tmp_path):
+    """Directory laid out like the container."""
+    (tmp_path / "quant").mkdir()
+    (tmp_path / "quant" / "momentum.txt").write_bytes("Momentum crashes – Daniel & Moskowitz".encode("utf-8"))
+    (tmp_path / "quant" / "empty.txt").write_bytes(b"")
+    (tmp_path / "other.txt").write_bytes(b"outside quant")
+    return tmp_path
+
+
+@pytest.fixture(params=["local", "memory"])
+def backend(request, local_root):
+    """Each backend holding the same blobs."""
+    if request.param == "local":
+        return LocalBackend(str(local_root))
+    return MemoryBackend({
+        "quant/momentum.txt": "Momentum crashes – Daniel & Moskowitz",
+        "quant/empty.txt": b"",
+        "other.txt": b"outside quant",
+    })
+
+
+class TestBackends:
+    """Test cases shared by the local and in-memory backends."""
+
+    def test_download_returns_zero_copy_view(self, backend):
+        """Test that full downloads are memoryviews with the blob's properties."""
+        downloader = backend.get_blob_client("c", "quant/momentum.txt").download_blob()
+
+        data = downloader.readall()
+        assert isinstance(data, memoryview)
+        assert str(data, "utf-8") == "Momentum crashes – Daniel & Moskowitz"
+        assert downloader.properties.size == len(data)
+        assert downloader.properties.etag
+
+    def test_ranged_download(self, backend):
+        """Test that ranges report the total size in their Content-Range."""
+        downloader = backend.get_blob_client("c", "quant/momentum.txt").download_blob(offset=9, length=7)
+
+        assert bytes(downloader.readall()) == b"crashes"
+        assert downloader.properties.size == 7
+        assert downloader.properties.content_range.endswith(f"/{len('Momentum crashes – Daniel & Moskowitz'.encode())}")
+
+    def test_conditional_downloads(self, backend):
+        """Test If-None-Match (304) and If-Match (412) semantics."""
+        blob_client = backend.get_blob_client("c", "quant/momentum.txt")
+        etag = blob_client.get_blob_properties().etag
+
+        with pytest.raises(ResourceNotModifiedError) as exc_info:
+            blob_client.download_blob(etag=etag, match_condition=MatchConditions.IfModified)
+        assert exc_info.value.status_code == 304
+        with pytest.raises(ResourceModifiedError):
+            blob_client.download_blob(offset=0, etag='"stale"', match_condition=MatchConditions.IfNotModified)
+
+    def test_missing_and_empty_blobs(self, backend):
+        """Test 404 for missing blobs and 416 for ranges on empty ones."""
+        with pytest.raises(ResourceNotFoundError):
+            backend.get_blob_client("c", "quant/missing.txt").download_blob()
+        with pytest.raises(HttpResponseError) as exc_info:
+            backend.get_blob_client("c", "quant/empty.txt").download_blob(offset=0, length=10)
+        assert exc_info.value.status_code == 416
+        assert bytes(backend.get_blob_client("c", "quant/empty.txt").download_blob().readall()) == b""
+
+    def test_list_blobs_by_prefix(self, backend):
+        """Test that listings are sorted and filtered by prefix."""
+        names = [blob.name for blob in backend.get_container_client("c").list_blobs(name_starts_with="quant/")]
+        assert names == ["quant/empty.txt", "quant/momentum.txt"]
+
+    def test_upload_respects_overwrite(self, backend):
+        """Test uploads and the 409 raised when overwriting is not allowed."""
+        blob_client = backend.get_blob_client("c", "quant/new.txt")
+        blob_client.upload_blob(b"first")
+        with pytest.raises(ResourceExistsError):
+            blob_client.upload_blob(b"second")
+        blob_client.upload_blob("second", overwrite=True)
+        assert bytes(blob_client.download_blob().readall()) == b"second"
+
+    def test_staged_blocks_commit_in_list_order(self, backend):
+        """Test that a block list commits in its own order and drops leftover blocks."""
+        blob_client = backend.get_blob_client("c", "quant/staged.txt")
+        for block_id, data in (("b2", b"world"), ("b1", b"hello "), ("unused", b"!")):
+            blob_client.stage_block(block_id, data)
+        with pytest.raises(HttpResponseError) as exc_info:
+            blob_client.commit_block_list(["b1", "missing"])
+        assert exc_info.value.status_code == 400
+
+        blob_client.commit_block_list(["b1", "b2"])
+
+        assert bytes(blob_client.download_blob().readall()) == b"hello world"
+        blob_client.stage_block("b3", b"again")
+        with pytest.raises(ResourceExistsError):
+            blob_client.commit_block_list(["b3"], if_none_match="*")
+        with pytest.raises(HttpResponseError):
+            blob_client.commit_block_list(["unused"])
+
+
+class TestLocalBackend:
+    """Test cases specific to the local filesystem backend."""
+
+    def test_rejects_names_outside_root(self, local_root):
+        """Test that blob names cannot escape the root directory."""
+        with pytest.raises(ValueError):
+            LocalBackend(str(local_root)).path("../secrets.txt")
+
+    def test_etag_changes_with_content(self, local_root):
+        """Test that rewriting a file changes its ETag."""
+        backend = LocalBackend(str(local_root))
+        before = backend.properties("quant/momentum.txt").etag
+        backend.get_blob_client("c", "quant/momentum.txt").upload_blob(b"rewritten", overwrite=True)
+        assert backend.properties("quant/momentum.txt").etag != before
+
+
+class TestConnectionBackends:
+    """Test cases for ADLSConnection over the configured backend."""
+
+    def test_config_requires_backend_settings(self):
+        """Test that each backend asks for its own settings."""
+        with pytest.raises(ValueError, match="ADLS URL is required"):
+            adls_module.ADLSConfig(container_name="papers")
+        with pytest.raises(ValueError, match="local_root is required"):
+            adls_module.ADLSConfig(container_name="papers", backend="local")
+
+    def test_local_connection_reads_without_credentials(self, local_root):
+        """Test reads, streaming and listing through the local backend."""
+        config = adls_module.ADLSConfig(container_name="papers", backend="local", local_root=str(local_root))
+        connection = adls_module.ADLSConnection(config)
+
+        assert connection.blob_service_client is None
+        assert connection.read_blob_content("momentum", "txt") == "Momentum crashes – Daniel & Moskowitz"
+        assert connection.read_blob_content("missing", "txt") is None
+        assert b"".join(connection.iter_blob_chunks("momentum", "txt", chunk_size=4)).startswith(b"Mome")
+        assert list(connection.iter_blob_chunks("empty", "txt")) == []
+        assert [blob.name for blob in connection.list_blobs()] == ["quant/empty.txt", "quant/momentum.txt"]
+
+    def test_memory_backend_shared_per_container(self):
+        """Test that connections to the same container share one in-memory store."""
+        config = adls_module.ADLSConfig(container_name="memory-test", backend="memory")
+        shared_memory_backend("memory-test").put("quant/paper.txt", "Carry")
+
+        results = adls_module.ADLSConnection(config).read_many(["paper"], "txt")
+
+        assert results[0].content == "Carry"
+
+    def test_async_connection_over_local_backend(self, local_root):
+        """Test that the async connection reads local files on worker threads."""
+        config = adls_module.ADLSConfig(container_name="papers", backend="local", local_root=str(local_root))
+
+        async def run():
+            async with adls_module.AsyncADLSConnection(config) as connection:
+                return await connection.read_blob_contents(["momentum", "missing"], "txt")
+
+        assert asyncio.run(run()) == ["Momentum crashes – Daniel & Moskowitz", None]